@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+SAÍDA COLUNAR (PARQUET / ARROW IPC) - GL GARANTIAS
+
+O backup processed_backup_<ts>.csv perdia os tipos (datas viravam texto,
+booleanos 'True'/'False') e era lido de volta com parsing de CSV. Aqui os dados
+processados podem ser gravados como:
+- Parquet com compressão zstd (.parquet)
+- Arrow IPC em arquivo, compressão zstd (.arrow / .feather / .ipc)
+- CSV, como antes (.csv)
+
+O formato sai da extensão do arquivo. Datas, booleanos e números mantêm o tipo,
+e as colunas Categorical viram colunas de dicionário (dictionary<int32, string>).
+
+Requer pyarrow (pip install pyarrow) para Parquet e Arrow; CSV funciona sem.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FORMAT_BY_SUFFIX = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+}
+SUFFIX_BY_FORMAT = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+
+COMPRESSION = 'zstd'
+
+# Envelope JSON da troca com o Node: {"arrow": {"format": HANDOFF_FORMAT, "path": ...}}
+HANDOFF_FORMAT = 'arrow-ipc-file'
+
+# Chave dos metadados do schema com informações extras (ex. resumo do processamento)
+METADATA_KEY = b'glg_metadata'
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Saída Parquet/Arrow requer pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def format_for_path(path: str) -> str:
+    """Formato de saída pela extensão do arquivo ('csv', 'parquet' ou 'arrow')"""
+    suffix = Path(path).suffix.lower()
+    if suffix not in FORMAT_BY_SUFFIX:
+        raise ValueError(f"Extensão '{suffix}' sem formato conhecido; use {sorted(FORMAT_BY_SUFFIX)}")
+    return FORMAT_BY_SUFFIX[suffix]
+
+
+def processed_schema(df: pd.DataFrame):
+    """Schema Arrow do DataFrame processado, com tipos fixos para as colunas conhecidas
+
+    Fixar os tipos garante o mesmo schema em todos os blocos do modo streaming
+    (um bloco só com nulos seria inferido como tipo null).
+    """
+    pa = _pyarrow()
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    known = {
+        'order_number': pa.string(),
+        'order_date': pa.timestamp('ms'),
+        'order_status': dictionary,
+        'engine_manufacturer': dictionary,
+        'engine_description': dictionary,
+        'vehicle_model': dictionary,
+        'defect_description': pa.string(),
+        'raw_defect_description': pa.string(),
+        'mechanic': dictionary,
+        'responsible_mechanic': dictionary,
+        'original_parts_value': pa.float64(),
+        'parts_total': pa.float64(),
+        'labor_total': pa.float64(),
+        'grand_total': pa.float64(),
+        'calculation_verified': pa.bool_(),
+    }
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    return pa.schema([pa.field(f.name, known.get(f.name, f.type)) for f in inferred])
+
+
+class ProcessedDataWriter:
+    """Grava os dados processados num arquivo, em um ou mais blocos
+
+    Parquet e Arrow mantêm o arquivo aberto entre os blocos (o modo streaming
+    grava bloco a bloco); close() finaliza o arquivo. append=True (só CSV)
+    acrescenta a um arquivo existente, sem cabeçalho.
+    """
+
+    def __init__(self, output_path: str, metadata: Optional[Dict] = None, append: bool = False):
+        self.output_path = output_path
+        self.format = format_for_path(output_path)
+        if append and self.format != 'csv':
+            raise ValueError("Parquet/Arrow não aceitam acréscimo a arquivo fechado; "
+                             "grave os blocos com um único ProcessedDataWriter")
+        self.metadata = metadata
+        self.append = append
+        self.rows_written = 0
+        self._writer = None
+        self._schema = None
+        # Categorias já gravadas por coluna: blocos seguintes só acrescentam valores
+        # novos ao fim, o que permite deltas de dicionário no Arrow IPC
+        self._categories: Dict[str, List] = {}
+
+    def _to_table(self, df: pd.DataFrame):
+        pa = _pyarrow()
+        df = self._extend_categories(df)
+        if self._schema is None:
+            schema = processed_schema(df)
+            if self.metadata is not None:
+                schema = schema.with_metadata({
+                    **(schema.metadata or {}),
+                    METADATA_KEY: json.dumps(self.metadata, ensure_ascii=False, default=str).encode('utf-8'),
+                })
+            self._schema = schema
+        return pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+
+    def _extend_categories(self, df: pd.DataFrame) -> pd.DataFrame:
+        categorical = [column for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)]
+        if not categorical:
+            return df
+        df = df.copy(deep=False)
+        for column in categorical:
+            known = self._categories.setdefault(column, [])
+            seen = set(known)
+            known.extend(value for value in df[column].cat.categories if value not in seen)
+            df[column] = df[column].cat.set_categories(known)
+        return df
+
+    def write(self, df: pd.DataFrame):
+        if self.format == 'csv':
+            # Datas como AAAA-MM-DD no CSV, como o backup sempre foi gravado
+            df_save = df.copy()
+            if 'order_date' in df_save.columns:
+                df_save['order_date'] = df_save['order_date'].dt.strftime('%Y-%m-%d')
+            first = self.rows_written == 0 and not self.append
+            df_save.to_csv(self.output_path, index=False, encoding='utf-8',
+                           mode='w' if first else 'a', header=first)
+        else:
+            pa = _pyarrow()
+            table = self._to_table(df)
+            if self._writer is None:
+                if self.format == 'parquet':
+                    self._writer = pa.parquet.ParquetWriter(self.output_path, table.schema,
+                                                            compression=COMPRESSION)
+                else:
+                    options = pa.ipc.IpcWriteOptions(compression=COMPRESSION, emit_dictionary_deltas=True)
+                    self._writer = pa.ipc.new_file(self.output_path, table.schema, options=options)
+            self._writer.write_table(table)
+        self.rows_written += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_processed_data(df: pd.DataFrame, output_path: str, metadata: Optional[Dict] = None) -> int:
+    """Gravar um DataFrame processado inteiro (formato pela extensão)"""
+    with ProcessedDataWriter(output_path, metadata) as writer:
+        writer.write(df)
+    return writer.rows_written
+
+
+def write_arrow_table(table, output_path: str, metadata: Optional[Dict] = None,
+                      compression: Optional[str] = COMPRESSION):
+    """Gravar uma tabela Arrow já montada em Parquet ou Arrow IPC
+
+    compression=None grava o IPC sem compressão: o leitor pode mapear o arquivo
+    em memória e usar os buffers das colunas direto, sem descompactar.
+    """
+    pa = _pyarrow()
+    if metadata is not None:
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            METADATA_KEY: json.dumps(metadata, ensure_ascii=False, default=str).encode('utf-8'),
+        })
+    output_format = format_for_path(output_path)
+    if output_format == 'parquet':
+        pa.parquet.write_table(table, output_path, compression=compression or 'none')
+    elif output_format == 'arrow':
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_file(output_path, table.schema, options=options) as writer:
+            writer.write_table(table)
+    else:
+        raise ValueError("write_arrow_table grava apenas Parquet ou Arrow IPC")
+
+
+def read_arrow_table(path: str, memory_map: bool = True):
+    """Tabela Arrow de um arquivo Parquet ou Arrow IPC (IPC mapeado em memória)"""
+    pa = _pyarrow()
+    if format_for_path(path) == 'parquet':
+        return pa.parquet.read_table(path, memory_map=memory_map)
+    source = pa.memory_map(path, 'r') if memory_map else pa.OSFile(path, 'rb')
+    return pa.ipc.open_file(source).read_all()
+
+
+def read_metadata(path: str) -> Optional[Dict]:
+    """Metadados extras gravados junto dos dados (None se não houver)"""
+    pa = _pyarrow()
+    if format_for_path(path) == 'parquet':
+        schema = pa.parquet.read_schema(path)
+    else:
+        with pa.memory_map(path, 'r') as source:
+            schema = pa.ipc.open_file(source).schema
+    raw = (schema.metadata or {}).get(METADATA_KEY)
+    return json.loads(raw) if raw else None
+
+
+def handoff_directory() -> str:
+    """Diretório para a troca de arquivos Arrow entre processos
+
+    /dev/shm (memória compartilhada) quando existir; senão o temporário do sistema.
+    """
+    shm = Path('/dev/shm')
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return str(shm)
+    return tempfile.gettempdir()
+
+
+def arrow_schema_description(schema) -> List[Dict[str, str]]:
+    """Schema em JSON simples ([{name, type}]) para o envelope da troca"""
+    return [{'name': field.name, 'type': str(field.type)} for field in schema]
+
+
+def load_handoff(envelope: Dict):
+    """Tabela Arrow de um envelope de troca (mapeada em memória, sem cópia)"""
+    arrow = envelope.get('arrow') or {}
+    if arrow.get('format') != HANDOFF_FORMAT or not arrow.get('path'):
+        raise ValueError("Envelope sem arquivo Arrow IPC")
+    return read_arrow_table(arrow['path'], memory_map=True)
+
+
+def read_processed_data(path: str) -> pd.DataFrame:
+    """Ler dados processados de volta (CSV, Parquet ou Arrow IPC)"""
+    if format_for_path(path) == 'csv':
+        df = pd.read_csv(path, dtype={'order_number': str})
+        if 'order_date' in df.columns:
+            df['order_date'] = pd.to_datetime(df['order_date'])
+        return df
+    # Colunas de dicionário voltam como Categorical
+    return read_arrow_table(path).to_pandas()
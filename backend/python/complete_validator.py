@@ -17,6 +17,8 @@ from datetime import datetime
 from collections import defaultdict
 import re
 
+from name_canonicalizer import NameCanonicalizer
+
 class CompleteDataValidator:
     """
     Validador completo que confirma TODOS os aspectos dos dados
@@ -46,6 +48,15 @@ class CompleteDataValidator:
         
         print(f"Total de linhas lidas: {len(df)}")
         
+        # Fabricante/motor/modelo canônicos: variações de grafia não dividem as contagens
+        canonicalizer = NameCanonicalizer()
+        canonicalizer.canonicalize_frame(df, {
+            'Fabricante_Mot': 'engine_manufacturer',
+            'Descricao_Mot': 'engine_description',
+            'ModeloVei_Osv': 'vehicle_model',
+        })
+        canonicalizer.save()
+        
         # 2. PROCESSAR DADOS VÁLIDOS
         valid_records = []
         
@@ -78,9 +89,9 @@ class CompleteDataValidator:
                 continue
             
             # Extrair outros campos
-            engine_manufacturer = str(row.get('Fabricante_Mot', '')).strip() or None
-            engine_description = str(row.get('Descricao_Mot', '')).strip() or None
-            vehicle_model = str(row.get('ModeloVei_Osv', '')).strip() or None
+            engine_manufacturer = row.get('Fabricante_Mot') if pd.notna(row.get('Fabricante_Mot')) else None
+            engine_description = row.get('Descricao_Mot') if pd.notna(row.get('Descricao_Mot')) else None
+            vehicle_model = row.get('ModeloVei_Osv') if pd.notna(row.get('ModeloVei_Osv')) else None
             defect_description = str(row.get('ObsCorpo_OSv', '')).strip() or None
             mechanic = str(row.get('RazaoSocial_Cli', '')).strip() or None
             
@@ -26,14 +26,18 @@ from pathlib import Path
 from typing import Dict, List, Any, Tuple, Optional
 import argparse
 import logging
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field, fields
+
+from stage_timer import StageTimer
+from profiling import profile_run, profile_base_path
+from metrics import REGISTRY, record_processing, record_run
+from log_setup import setup_logging, flush_logging
+from trace_context import set_trace_id
+from name_canonicalizer import CANONICAL_COLUMNS, NameCanonicalizer
+from processed_batch import ProcessedBatch, ProcessedBatchBuilder
+from columnar_io import (FORMAT_BY_SUFFIX, HANDOFF_FORMAT, arrow_schema_description,
+                         handoff_directory, write_arrow_table)
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
 # Suprimir warnings desnecessários do pandas
@@ -44,7 +48,7 @@ warnings.filterwarnings('ignore', category=FutureWarning)
 class ProcessingResult:
     """Resultado do processamento com todas as informações necessárias"""
     success: bool
-    data: List[Dict[str, Any]]
+    data: ProcessedBatch
     total_rows_excel: int
     valid_rows: int
     rejected_rows: int
@@ -52,30 +56,70 @@ class ProcessingResult:
     summary: Dict[str, Any]
     errors: List[str]
     warnings: List[str]
+    timings: Dict[str, Any] = field(default_factory=dict)
+    trace: Dict[str, Any] = field(default_factory=dict)
     
     def to_json(self) -> str:
         """Converte para JSON serializável"""
-        def convert_value(obj):
-            if isinstance(obj, (datetime, date)):
-                return obj.isoformat()
-            elif isinstance(obj, np.integer):
-                return int(obj)
-            elif isinstance(obj, np.floating):
-                return float(obj)
-            elif isinstance(obj, np.ndarray):
-                return obj.tolist()
-            elif pd.isna(obj):
-                return None
-            return obj
-        
-        # Converter dados recursivamente
-        result_dict = asdict(self)
-        result_dict['data'] = [
-            {k: convert_value(v) for k, v in row.items()}
-            for row in self.data
-        ]
+        # Converter dados (medido como etapa "serialization"; o json.dumps final
+        # não entra na medição). Os dados saem coluna a coluna do ProcessedBatch,
+        # já como valores Python, sem a cópia profunda do asdict.
+        timer = StageTimer(self.timings, self.trace.get('spans'), self.trace.get('trace_id'))
+        with timer.stage('serialization'):
+            result_dict = self.metadata_dict()
+            result_dict['data'] = self.data.to_records()
+        result_dict['timings'] = timer.as_dict()
+        result_dict['trace'] = timer.trace_dict()
         
         return json.dumps(result_dict, ensure_ascii=False, indent=2)
+    
+    def metadata_dict(self) -> Dict[str, Any]:
+        """Tudo menos os dados (vai nos metadados dos arquivos Parquet/Arrow)"""
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name != 'data'}
+    
+    def save(self, output_path: str):
+        """Gravar o resultado: .parquet/.arrow com os dados em colunas tipadas e o
+        restante do resultado nos metadados do schema; outras extensões em JSON"""
+        if FORMAT_BY_SUFFIX.get(Path(output_path).suffix.lower()) not in ('parquet', 'arrow'):
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_json())
+            return
+        timer = StageTimer(self.timings, self.trace.get('spans'), self.trace.get('trace_id'))
+        with timer.stage('serialization'):
+            table = self.data.to_arrow()
+        write_arrow_table(table, output_path, metadata={
+            **self.metadata_dict(), 'timings': timer.as_dict(), 'trace': timer.trace_dict()
+        })
+    
+    def handoff(self, directory: Optional[str] = None) -> Dict[str, Any]:
+        """Gravar os dados em Arrow IPC (sem compressão) e devolver o envelope JSON
+        
+        O envelope tem o resultado sem os dados ("data": []) e, em "arrow", o
+        caminho, o número de linhas e o schema do arquivo. Quem recebe mapeia o
+        arquivo em memória e lê as colunas sem parsing de texto; apagar o arquivo
+        depois de ler é responsabilidade de quem recebe.
+        """
+        directory = directory or handoff_directory()
+        trace_id = self.trace.get('trace_id') or datetime.now().strftime('%Y%m%d%H%M%S%f')
+        path = str(Path(directory) / f"glg_result_{trace_id}.arrow")
+        
+        timer = StageTimer(self.timings, self.trace.get('spans'), self.trace.get('trace_id'))
+        with timer.stage('serialization'):
+            table = self.data.to_arrow()
+            write_arrow_table(table, path, compression=None)
+        
+        envelope = self.metadata_dict()
+        envelope['data'] = []
+        envelope['timings'] = timer.as_dict()
+        envelope['trace'] = timer.trace_dict()
+        envelope['arrow'] = {
+            'format': HANDOFF_FORMAT,
+            'path': path,
+            'rows': table.num_rows,
+            'bytes': Path(path).stat().st_size,
+            'schema': arrow_schema_description(table.schema),
+        }
+        return envelope
 
 class DefinitiveExcelProcessor:
     """
@@ -122,6 +166,8 @@ class DefinitiveExcelProcessor:
             'year_distribution': {},
             'processing_errors': []
         }
+        self.timer = StageTimer()
+        self.canonicalizer = NameCanonicalizer()
     
     def process_excel_file(self, file_path: str) -> ProcessingResult:
         """
@@ -134,6 +180,7 @@ class DefinitiveExcelProcessor:
             ProcessingResult com todos os dados processados
         """
         start_time = datetime.now()
+        self.timer = StageTimer()
         logger.info(f"🚀 Iniciando processamento definitivo: {file_path}")
         
         try:
@@ -142,7 +189,8 @@ class DefinitiveExcelProcessor:
                 return self._create_error_result("Arquivo não encontrado", start_time)
             
             # 2. LER PLANILHA COM PANDAS (ROBUSTO)
-            df = self._read_excel_robust(file_path)
+            with self.timer.stage('read'):
+                df = self._read_excel_robust(file_path)
             if df is None:
                 return self._create_error_result("Falha ao ler planilha Excel", start_time)
             
@@ -150,14 +198,23 @@ class DefinitiveExcelProcessor:
             logger.info(f"📊 Total de linhas lidas: {len(df)}")
             
             # 3. VALIDAR ESTRUTURA DE COLUNAS
-            validation_result = self._validate_columns(df)
+            with self.timer.stage('column_validation'):
+                validation_result = self._validate_columns(df)
             if not validation_result['valid']:
                 return self._create_error_result(validation_result['error'], start_time)
             
-            # 4. PROCESSAR DADOS LINHA POR LINHA
-            processed_data = self._process_all_rows(df)
+            # 4. CANONICALIZAR FABRICANTE / MOTOR / MODELO (uma vez por valor distinto)
+            with self.timer.stage('canonicalization'):
+                self.canonicalizer.canonicalize_frame(
+                    df, {self.REQUIRED_COLUMNS[column]: column for column in CANONICAL_COLUMNS}
+                )
+                self.canonicalizer.save()
+            
+            # 5. PROCESSAR DADOS LINHA POR LINHA
+            with self.timer.stage('row_processing'):
+                processed_data = self._process_all_rows(df)
             
-            # 5. GERAR RELATÓRIO FINAL
+            # 6. GERAR RELATÓRIO FINAL
             processing_time = (datetime.now() - start_time).total_seconds()
             
             return ProcessingResult(
@@ -169,7 +226,9 @@ class DefinitiveExcelProcessor:
                 processing_time_seconds=processing_time,
                 summary=self._generate_summary(),
                 errors=[],
-                warnings=[]
+                warnings=[],
+                timings=self.timer.as_dict(),
+                trace=self.timer.trace_dict()
             )
             
         except Exception as e:
@@ -245,13 +304,13 @@ class DefinitiveExcelProcessor:
         logger.info("✅ Todas as colunas obrigatórias encontradas")
         return {'valid': True, 'error': None}
     
-    def _process_all_rows(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def _process_all_rows(self, df: pd.DataFrame) -> ProcessedBatch:
         """
         PROCESSAMENTO LINHA POR LINHA
-        Aplicar todos os filtros e validações
+        Aplicar todos os filtros e validações; as linhas válidas vão para colunas
         """
         logger.info("🔄 Iniciando processamento linha por linha...")
-        processed_rows = []
+        processed_rows = ProcessedBatchBuilder()
         
         for index, row in df.iterrows():
             try:
@@ -264,7 +323,7 @@ class DefinitiveExcelProcessor:
                 self.stats['processing_errors'].append(f"Linha {index + 2}: {str(e)}")
         
         logger.info(f"✅ Processamento concluído: {len(processed_rows)} linhas válidas")
-        return processed_rows
+        return processed_rows.finish()
     
     def _process_single_row(self, row: pd.Series, index: int) -> Optional[Dict[str, Any]]:
         """
@@ -322,9 +381,11 @@ class DefinitiveExcelProcessor:
             grand_total = self._safe_float_conversion(row.get(self.REQUIRED_COLUMNS['grand_total'], 0))
             
             # 8. CONSTRUIR REGISTRO FINAL
+            # (dict temporário: o ProcessedBatchBuilder grava os campos em colunas e
+            # codifica os de baixa cardinalidade em dicionário)
             processed_row = {
                 'order_number': order_number,
-                'order_date': parsed_date.isoformat(),
+                'order_date': parsed_date,
                 'order_status': status,
                 'engine_manufacturer': self._safe_string_conversion(row.get(self.REQUIRED_COLUMNS['engine_manufacturer'])),
                 'engine_description': self._safe_string_conversion(row.get(self.REQUIRED_COLUMNS['engine_description'])),
@@ -462,57 +523,91 @@ class DefinitiveExcelProcessor:
         
         return ProcessingResult(
             success=False,
-            data=[],
+            data=ProcessedBatch.empty(),
             total_rows_excel=0,
             valid_rows=0,
             rejected_rows=0,
             processing_time_seconds=processing_time,
             summary={},
             errors=[error_message],
-            warnings=[]
+            warnings=[],
+            timings=self.timer.as_dict(),
+            trace=self.timer.trace_dict()
         )
 
+def _print_handoff(result: ProcessingResult, directory: str) -> bool:
+    """Imprimir o envelope da troca Arrow; False (volta ao JSON completo) sem pyarrow"""
+    try:
+        envelope = result.handoff(directory or None)
+    except ImportError as e:
+        logger.warning(f"⚠️ {e}; enviando os dados em JSON")
+        return False
+    logger.info(f"📦 {envelope['arrow']['rows']} linhas em Arrow IPC: {envelope['arrow']['path']}")
+    print(json.dumps(envelope, ensure_ascii=False, separators=(',', ':')))
+    return True
+
 def main():
     """Função principal para execução via linha de comando"""
     parser = argparse.ArgumentParser(description='Processador Definitivo de Excel - GL Garantias')
     parser.add_argument('file_path', help='Caminho para o arquivo Excel')
-    parser.add_argument('--output', '-o', help='Arquivo de saída JSON (opcional)')
+    parser.add_argument('--output', '-o',
+                        help='Arquivo de saída (opcional): .json, ou .parquet / .arrow com colunas tipadas (requer pyarrow)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Modo verboso')
     parser.add_argument('--summary-only', action='store_true', help='Retornar apenas resumo (para Node.js)')
+    parser.add_argument('--arrow-handoff', nargs='?', const='', metavar='DIR',
+                        help='Gravar os dados em Arrow IPC (em DIR; padrão /dev/shm ou temporário) e '
+                             'imprimir só um envelope JSON com caminho e schema (requer pyarrow)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Gravar perfil cProfile (.prof) e resumo das funções mais custosas ao lado da saída')
+    parser.add_argument('--profile-top', type=int, default=25, help='Quantidade de funções no resumo do perfil')
+    parser.add_argument('--metrics-file', help='Gravar métricas Prometheus (textfile collector) neste arquivo')
+    parser.add_argument('--trace-id', help='Identificador do upload para logs e spans (padrão: GLG_TRACE_ID ou novo)')
     
     args = parser.parse_args()
     
-    if args.verbose:
-        logging.getLogger().setLevel(logging.DEBUG)
-    
-    # Processar arquivo
-    processor = DefinitiveExcelProcessor()
-    result = processor.process_excel_file(args.file_path)
+    set_trace_id(args.trace_id)
+    # Logs em JSON no stderr, escritos por uma thread separada
+    setup_logging(level=logging.DEBUG if args.verbose else logging.INFO)
     
-    # Salvar resultado
-    if args.output:
-        with open(args.output, 'w', encoding='utf-8') as f:
-            f.write(result.to_json())
-        logger.info(f"📄 Resultado salvo em: {args.output}")
-    else:
-        # Para Node.js, retornar dados completos ou apenas resumo
-        if args.summary_only:
-            summary = {
-                "success": result.success,
-                "data": [],  # Dados vazios para evitar broken pipe
-                "total_rows_excel": result.total_rows_excel,
-                "valid_rows": result.valid_rows,
-                "rejected_rows": result.rejected_rows,
-                "processing_time_seconds": result.processing_time_seconds,
-                "summary": result.summary,
-                "errors": result.errors,
-                "warnings": result.warnings
-            }
-            print(json.dumps(summary, ensure_ascii=False, separators=(',', ':')))
+    with profile_run(args.profile, profile_base_path(args.output, args.file_path), args.profile_top):
+        # Processar arquivo
+        processor = DefinitiveExcelProcessor()
+        result = processor.process_excel_file(args.file_path)
+        
+        # Salvar resultado
+        if args.output:
+            result.save(args.output)
+            logger.info(f"📄 Resultado salvo em: {args.output}")
+        elif args.arrow_handoff is not None and result.success and _print_handoff(result, args.arrow_handoff):
+            pass  # dados no arquivo Arrow; stdout levou só o envelope
         else:
-            print(result.to_json())
+            # Para Node.js, retornar dados completos ou apenas resumo
+            if args.summary_only:
+                summary = {
+                    "success": result.success,
+                    "data": [],  # Dados vazios para evitar broken pipe
+                    "total_rows_excel": result.total_rows_excel,
+                    "valid_rows": result.valid_rows,
+                    "rejected_rows": result.rejected_rows,
+                    "processing_time_seconds": result.processing_time_seconds,
+                    "summary": result.summary,
+                    "errors": result.errors,
+                    "warnings": result.warnings,
+                    "timings": result.timings,
+                    "trace": result.trace
+                }
+                print(json.dumps(summary, ensure_ascii=False, separators=(',', ':')))
+            else:
+                print(result.to_json())
+    
+    # Métricas
+    if args.metrics_file:
+        record_processing(result.summary, result.processing_time_seconds)
+        record_run('excel_processor', result.success)
+        REGISTRY.write_textfile(args.metrics_file)
     
     # Exit code baseado no sucesso
+    flush_logging()
     sys.exit(0 if result.success else 1)
 
 if __name__ == '__main__':
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+CONFIGURAÇÃO DE LOGGING COMPARTILHADA - GL GARANTIAS
+
+Os módulos só chamam logging.getLogger(__name__); quem configura é o ponto de
+entrada (main) com setup_logging(). A escrita em arquivo/stderr acontece numa
+thread separada (QueueHandler + QueueListener), então logar dentro de laços
+não bloqueia o processamento.
+
+- Formato: uma linha JSON por registro (GLG_LOG_FORMAT=text volta ao formato antigo)
+- Amostragem por nível: GLG_LOG_SAMPLE_DEBUG=0.01 mantém 1 a cada 100 mensagens DEBUG
+- Todo registro leva o trace id do processo (ver trace_context.py)
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from trace_context import TraceIdFilter
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - [%(trace_id)s] %(message)s'
+
+# Atributos padrão de LogRecord (o resto é tratado como campo extra)
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[QueueListener] = None
+_atexit_registered = False
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+
+        # Campos passados via extra={...}
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Mantém só uma fração das mensagens de cada nível (determinístico: 1 a cada N)"""
+
+    def __init__(self, rates: Dict[int, float]):
+        super().__init__()
+        self.intervals = {level: max(1, round(1 / rate)) for level, rate in rates.items() if rate > 0}
+        self.dropped_levels = {level for level, rate in rates.items() if rate <= 0}
+        self._counters: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno in self.dropped_levels:
+            return False
+        interval = self.intervals.get(record.levelno)
+        if interval is None or interval == 1:
+            return True
+        with self._lock:
+            count = self._counters.get(record.levelno, 0)
+            self._counters[record.levelno] = count + 1
+        return count % interval == 0
+
+
+def _sample_rates_from_env() -> Dict[int, float]:
+    rates = {}
+    for level_name in ('DEBUG', 'INFO'):
+        value = os.getenv(f'GLG_LOG_SAMPLE_{level_name}')
+        if value:
+            rates[getattr(logging, level_name)] = float(value)
+    return rates
+
+
+def setup_logging(log_file: Optional[str] = None, level: int = logging.INFO,
+                  json_format: Optional[bool] = None, sample_rates: Dict[int, float] = None,
+                  stream=None) -> QueueListener:
+    """Configurar o logging do processo (chamar uma vez, no ponto de entrada)
+
+    Args:
+        log_file: arquivo de log adicional (além de stderr)
+        level: nível mínimo do logger raiz
+        json_format: linhas JSON (padrão) ou texto; GLG_LOG_FORMAT=text força texto
+        sample_rates: fração mantida por nível, ex. {logging.DEBUG: 0.01}
+        stream: destino do console (padrão: stderr)
+    """
+    global _listener, _atexit_registered
+
+    flush_logging()
+
+    if json_format is None:
+        json_format = os.getenv('GLG_LOG_FORMAT', 'json').lower() != 'text'
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+
+    handlers = [logging.StreamHandler(stream or sys.stderr)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(TraceIdFilter())
+    rates = {**_sample_rates_from_env(), **(sample_rates or {})}
+    if rates:
+        queue_handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    if not _atexit_registered:
+        atexit.register(flush_logging)
+        _atexit_registered = True
+    return _listener
+
+
+def flush_logging():
+    """Esvaziar a fila de logs (útil antes de sys.exit)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+MÉTRICAS NO FORMATO PROMETHEUS - GL GARANTIAS
+
+Contadores e histogramas do processamento e do upload (linhas lidas, linhas
+rejeitadas por motivo, lotes enviados, latência por lote, novas tentativas,
+bytes enviados). Podem ser gravados num arquivo texto para o textfile
+collector do node_exporter ou servidos em /metrics por um servidor HTTP local.
+
+Sem dependências externas: implementa só o formato de exposição em texto.
+"""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name}: labels esperados {self.label_names}, recebidos {tuple(labels)}")
+        return tuple((name, str(labels[name])) for name in self.label_names)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+
+class Counter(_Metric):
+    """Contador monotônico"""
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        if amount < 0:
+            raise ValueError("Contador não pode diminuir")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Valor que pode subir e descer"""
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Histograma com buckets cumulativos"""
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series: Dict[Tuple, Dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = sorted((k, {'counts': list(v['counts']), 'sum': v['sum'], 'count': v['count']})
+                           for k, v in self._series.items())
+        for key, series in items:
+            for bound, count in zip(self.buckets, series['counts']):
+                labels = key + (('le', _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(labels)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas exportadas juntas"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica já registrada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        """Todas as métricas no formato de exposição em texto"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """Gravar para o textfile collector (escrita atômica via arquivo temporário)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+        logger.info(f"📈 Métricas gravadas em: {path}")
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """Servir /metrics numa thread em segundo plano"""
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True).start()
+        logger.info(f"📈 Métricas disponíveis em http://{host}:{port}/metrics")
+        return self._server
+
+    def stop(self):
+        """Parar o servidor HTTP, se estiver rodando"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+# Registro padrão e métricas do sistema
+REGISTRY = MetricsRegistry()
+
+ROWS_READ = REGISTRY.counter('glg_rows_read_total', 'Linhas lidas das planilhas Excel')
+ROWS_VALID = REGISTRY.counter('glg_rows_valid_total', 'Linhas válidas após o processamento')
+ROWS_REJECTED = REGISTRY.counter('glg_rows_rejected_total', 'Linhas rejeitadas por motivo', ('reason',))
+PROCESSING_SECONDS = REGISTRY.histogram(
+    'glg_processing_duration_seconds', 'Duração do processamento de uma planilha',
+    buckets=(1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+)
+UPLOAD_BATCHES = REGISTRY.counter('glg_upload_batches_total', 'Lotes enviados ao banco', ('backend', 'status'))
+UPLOAD_RECORDS = REGISTRY.counter('glg_upload_records_total', 'Registros enviados ao banco', ('backend', 'status'))
+UPLOAD_BATCH_SECONDS = REGISTRY.histogram(
+    'glg_upload_batch_duration_seconds', 'Latência de envio por lote', ('backend',)
+)
+UPLOAD_RETRIES = REGISTRY.counter('glg_upload_retries_total', 'Novas tentativas de envio de lote')
+UPLOAD_BYTES = REGISTRY.counter('glg_upload_bytes_sent_total', 'Bytes enviados ao banco', ('backend',))
+LAST_RUN_TIMESTAMP = REGISTRY.gauge(
+    'glg_last_run_timestamp_seconds', 'Horário (epoch) do fim da última execução', ('job', 'success')
+)
+
+# Motivos de rejeição: chaves de estatística dos dois processadores -> label
+REJECTION_REASONS = {
+    'rejected_by_missing_fields': 'missing_fields',
+    'rejected_by_invalid_status': 'invalid_status',
+    'rejected_by_invalid_date': 'invalid_date',
+    'rejected_by_year_range': 'year_range',
+    'removed_by_missing_data': 'missing_fields',
+    'removed_by_status': 'invalid_status',
+    'removed_by_invalid_date': 'invalid_date',
+    'removed_by_year_range': 'year_range',
+}
+
+
+def record_processing(stats: Dict, duration_seconds: float = None):
+    """Registrar as estatísticas de processamento de uma planilha"""
+    ROWS_READ.inc(stats.get('total_rows', 0) or 0)
+    ROWS_VALID.inc(stats.get('valid_rows', stats.get('final_valid_rows', 0)) or 0)
+    for key, reason in REJECTION_REASONS.items():
+        if stats.get(key):
+            ROWS_REJECTED.inc(stats[key], reason=reason)
+    if duration_seconds is not None:
+        PROCESSING_SECONDS.observe(duration_seconds)
+
+
+def record_run(job: str, success: bool):
+    """Marcar o fim de uma execução (para alertas de execução parada)"""
+    LAST_RUN_TIMESTAMP.set(time.time(), job=job, success=str(bool(success)).lower())
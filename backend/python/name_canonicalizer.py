@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+CANONICALIZAÇÃO DE FABRICANTE / MOTOR / MODELO - GL GARANTIAS
+
+Fabricante_Mot, Descricao_Mot e ModeloVei_Osv chegam digitados de várias formas
+("Mercedes Benz", "MERCEDES-BENZ ", "mercedes  benz"), o que divide contagens
+como top_manufacturers e qualquer agrupamento posterior.
+
+Cada valor DISTINTO da coluna é normalizado uma única vez:
+1. dobra Unicode (NFKD, sem acentos) e maiúsculas
+2. espaços colapsados (inclusive em volta de '-' e '/')
+3. tabela de apelidos (name_aliases.json), ex. 'VW' -> 'VOLKSWAGEN'
+
+O mapeamento bruto -> canônico fica num cache JSON entre execuções, e a coluna
+é devolvida como Categorical (códigos inteiros + categorias canônicas): os
+agrupamentos passam a rodar sobre inteiros pequenos em vez de strings.
+
+O cache pode ser apontado pela variável GLG_NAME_CACHE.
+"""
+
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, Optional
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CANONICAL_COLUMNS = ('engine_manufacturer', 'engine_description', 'vehicle_model')
+
+CACHE_ENV_VAR = 'GLG_NAME_CACHE'
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent / 'name_canonical_cache.json'
+DEFAULT_ALIASES_PATH = Path(__file__).resolve().parent / 'name_aliases.json'
+
+_SPACES_RE = re.compile(r'\s+')
+_SEPARATOR_RE = re.compile(r'\s*([-/])\s*')
+
+
+def fold_name(value) -> str:
+    """Forma dobrada de um nome: maiúsculas, sem acentos, espaços colapsados"""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    text = ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).upper()
+    text = _SPACES_RE.sub(' ', text).strip()
+    return _SEPARATOR_RE.sub(r'\1', text)
+
+
+class NameCanonicalizer:
+    """Normaliza valores distintos uma vez e mantém o mapeamento em cache"""
+
+    def __init__(self, cache_path: Optional[str] = None, aliases_path: Optional[str] = None):
+        self.cache_path = Path(cache_path or os.getenv(CACHE_ENV_VAR) or DEFAULT_CACHE_PATH)
+        self.aliases = self._load_aliases(Path(aliases_path or DEFAULT_ALIASES_PATH))
+        # Mudou a tabela de apelidos: o cache antigo não vale mais
+        self.aliases_version = hashlib.sha1(
+            json.dumps(self.aliases, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
+        self.mappings: Dict[str, Dict[str, str]] = self._load_cache()
+        self._dirty = False
+        self.stats = {'cache_hits': 0, 'cache_misses': 0}
+
+    @staticmethod
+    def _load_aliases(path: Path) -> Dict[str, Dict[str, str]]:
+        if not path.exists():
+            return {}
+        with open(path, encoding='utf-8') as f:
+            raw = json.load(f)
+        # Chaves dobradas, para casar com o valor já normalizado
+        return {
+            column: {fold_name(alias): fold_name(canonical) for alias, canonical in table.items()}
+            for column, table in raw.items() if not column.startswith('_')
+        }
+
+    def _load_cache(self) -> Dict[str, Dict[str, str]]:
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                cached = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Cache de nomes ilegível, recomeçando: {e}")
+            return {}
+        if cached.get('aliases_version') != self.aliases_version:
+            logger.info("🔁 Tabela de apelidos alterada: cache de nomes descartado")
+            return {}
+        return cached.get('mappings', {})
+
+    def canonical(self, value, column: str) -> str:
+        """Valor canônico de um único valor bruto ('' para ausente)"""
+        folded = fold_name(value)
+        return self.aliases.get(column, {}).get(folded, folded)
+
+    def canonicalize(self, values: pd.Series, column: str) -> pd.Series:
+        """Coluna canônica como Categorical (ausentes/vazios viram NaN)
+
+        Só os valores distintos passam pela normalização; as linhas recebem o
+        resultado por lookup de códigos inteiros.
+        """
+        codes, uniques = pd.factorize(values, sort=False)
+        mapping = self.mappings.setdefault(column, {})
+
+        canonical_values = []
+        for raw in uniques:
+            key = str(raw)
+            cached = mapping.get(key)
+            if cached is None:
+                cached = self.canonical(raw, column)
+                mapping[key] = cached
+                self._dirty = True
+                self.stats['cache_misses'] += 1
+            else:
+                self.stats['cache_hits'] += 1
+            canonical_values.append(cached)
+
+        categories = sorted({value for value in canonical_values if value})
+        category_code = {value: i for i, value in enumerate(categories)}
+        # código do valor distinto -> código da categoria canônica (-1 = ausente)
+        lookup = np.array([category_code.get(value, -1) for value in canonical_values] + [-1], dtype=np.int32)
+        category_codes = lookup[codes]  # códigos -1 de factorize caem no último slot (-1)
+
+        logger.debug(f"🏷️ {column}: {len(uniques)} valores distintos -> {len(categories)} canônicos")
+        return pd.Series(
+            pd.Categorical.from_codes(category_codes, categories=categories),
+            index=values.index, name=values.name
+        )
+
+    def canonicalize_frame(self, df: pd.DataFrame, columns: Dict[str, str]) -> pd.DataFrame:
+        """Canonicalizar colunas do DataFrame no lugar ({coluna no df: coluna lógica})"""
+        for df_column, column in columns.items():
+            if df_column in df.columns:
+                df[df_column] = self.canonicalize(df[df_column], column)
+        return df
+
+    def save(self):
+        """Gravar o cache se houve valores novos (escrita atômica)"""
+        if not self._dirty:
+            return
+        payload = {'aliases_version': self.aliases_version, 'mappings': self.mappings}
+        tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
+        except OSError as e:
+            # Sem cache a execução continua correta, só refaz a normalização depois
+            logger.warning(f"⚠️ Não foi possível gravar o cache de nomes: {e}")
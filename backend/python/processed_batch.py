@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+LOTE PROCESSADO EM COLUNAS - GL GARANTIAS
+
+ProcessingResult.data era uma List[Dict]: cada linha repetia as 12 chaves e o
+overhead de um dict, e to_json ainda copiava tudo com asdict. ProcessedBatch
+guarda uma coluna NumPy tipada por campo:
+- valores (float64), calculation_verified (bool) e order_date (datetime64[s])
+- colunas de baixa cardinalidade codificadas em dicionário: códigos int32 +
+  lista com um único str por valor distinto (código -1 = ausente)
+- order_number e raw_defect_description como arrays de objetos
+
+Quem itera as linhas como dicts continua funcionando: cada linha é uma visão
+leve (ProcessedRow, com __slots__) que lê as colunas no índice pedido.
+Consumidores em massa usam column()/codes()/to_dataframe()/to_arrow() sem cópia
+por linha.
+"""
+
+import sys
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+FIELDS = (
+    'order_number',
+    'order_date',
+    'order_status',
+    'engine_manufacturer',
+    'engine_description',
+    'vehicle_model',
+    'raw_defect_description',
+    'responsible_mechanic',
+    'parts_total',
+    'labor_total',
+    'grand_total',
+    'calculation_verified',
+)
+
+DICTIONARY_FIELDS = ('order_status', 'engine_manufacturer', 'engine_description',
+                     'vehicle_model', 'responsible_mechanic')
+FLOAT_FIELDS = ('parts_total', 'labor_total', 'grand_total')
+
+
+class ProcessedRow(Mapping):
+    """Visão somente leitura de uma linha do lote (funciona como dict)"""
+
+    __slots__ = ('_batch', '_index')
+
+    def __init__(self, batch: 'ProcessedBatch', index: int):
+        self._batch = batch
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any:
+        return self._batch.value(key, self._index)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __repr__(self) -> str:
+        return f"ProcessedRow({dict(self)!r})"
+
+
+class ProcessedBatch:
+    """Linhas processadas em colunas tipadas"""
+
+    __slots__ = ('_columns', '_dictionaries', '_length')
+
+    def __init__(self, columns: Dict[str, np.ndarray], dictionaries: Dict[str, List[str]]):
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Colunas com tamanhos diferentes: {sorted(lengths)}")
+        self._columns = columns
+        self._dictionaries = dictionaries
+        self._length = lengths.pop() if lengths else 0
+
+    @classmethod
+    def empty(cls) -> 'ProcessedBatch':
+        return ProcessedBatchBuilder().finish()
+
+    # --- acesso por linha (compatível com List[Dict]) -------------------------
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def __iter__(self) -> Iterator[ProcessedRow]:
+        return (ProcessedRow(self, i) for i in range(self._length))
+
+    def __getitem__(self, index: int) -> ProcessedRow:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('índice fora do lote')
+        return ProcessedRow(self, index)
+
+    def value(self, field: str, index: int) -> Any:
+        """Valor Python de um campo numa linha (mesmo formato dos antigos dicts)"""
+        if field not in self._columns:
+            raise KeyError(field)
+        raw = self._columns[field][index]
+        if field in DICTIONARY_FIELDS:
+            return self._dictionaries[field][raw] if raw >= 0 else None
+        if field == 'order_date':
+            return str(np.datetime_as_string(raw, unit='s'))
+        return raw.item() if isinstance(raw, np.generic) else raw
+
+    # --- acesso em massa ------------------------------------------------------
+
+    def column(self, field: str) -> np.ndarray:
+        """Array da coluna (códigos int32 nas colunas de dicionário; sem cópia)"""
+        return self._columns[field]
+
+    def codes(self, field: str) -> np.ndarray:
+        return self._columns[field]
+
+    def dictionary(self, field: str) -> List[str]:
+        """Valores distintos de uma coluna de dicionário, na ordem dos códigos"""
+        return self._dictionaries[field]
+
+    def python_column(self, field: str) -> List[Any]:
+        """Coluna como lista de valores Python (None para ausentes)"""
+        values = self._columns[field]
+        if field in DICTIONARY_FIELDS:
+            lookup = self._dictionaries[field] + [None]  # código -1 cai no último item
+            return [lookup[code] for code in values.tolist()]
+        if field == 'order_date':
+            return np.datetime_as_string(values, unit='s').tolist()
+        return values.tolist()
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Lista de dicts serializáveis em JSON (montada coluna a coluna)"""
+        columns = [self.python_column(field) for field in FIELDS]
+        return [dict(zip(FIELDS, row)) for row in zip(*columns)]
+
+    def to_dataframe(self):
+        """DataFrame com colunas de dicionário como Categorical (códigos reaproveitados)"""
+        import pandas as pd
+
+        data = {}
+        for field in FIELDS:
+            values = self._columns[field]
+            if field in DICTIONARY_FIELDS:
+                data[field] = pd.Categorical.from_codes(values, categories=self._dictionaries[field])
+            else:
+                data[field] = values
+        return pd.DataFrame(data, copy=False)
+
+    def to_arrow(self):
+        """Tabela Arrow: colunas de dicionário viram DictionaryArray com os mesmos códigos"""
+        import pyarrow as pa
+
+        arrays = []
+        for field in FIELDS:
+            values = self._columns[field]
+            if field in DICTIONARY_FIELDS:
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(values, mask=values < 0),
+                    pa.array(self._dictionaries[field], type=pa.string())
+                ))
+            elif field == 'order_date':
+                arrays.append(pa.array(values, type=pa.timestamp('s')))
+            elif values.dtype == object:
+                arrays.append(pa.array(values, type=pa.string()))
+            else:
+                arrays.append(pa.array(values))
+        return pa.Table.from_arrays(arrays, names=list(FIELDS))
+
+    def nbytes(self) -> int:
+        """Memória das colunas em bytes (objetos str do dicionário contados uma vez)"""
+        total = 0
+        for values in self._columns.values():
+            total += values.nbytes
+            if values.dtype == object:
+                total += sum(sys.getsizeof(v) for v in values if v is not None)
+        total += sum(sys.getsizeof(v) for values in self._dictionaries.values() for v in values)
+        return total
+
+
+class ProcessedBatchBuilder:
+    """Acumula linhas válidas e monta o ProcessedBatch ao final"""
+
+    def __init__(self):
+        self._values: Dict[str, list] = {field: [] for field in FIELDS}
+        self._dictionaries: Dict[str, List[str]] = {field: [] for field in DICTIONARY_FIELDS}
+        self._code_of: Dict[str, Dict[str, int]] = {field: {} for field in DICTIONARY_FIELDS}
+
+    def __len__(self) -> int:
+        return len(self._values['order_number'])
+
+    def _encode(self, field: str, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code_of = self._code_of[field]
+        code = code_of.get(value)
+        if code is None:
+            code = code_of[value] = len(self._dictionaries[field])
+            self._dictionaries[field].append(value)
+        return code
+
+    def append(self, row: Dict[str, Any]):
+        """Acrescentar uma linha (dict com os campos de FIELDS)"""
+        for field in FIELDS:
+            value = row[field]
+            if field in DICTIONARY_FIELDS:
+                value = self._encode(field, value)
+            elif field == 'order_date' and isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            self._values[field].append(value)
+
+    def finish(self) -> ProcessedBatch:
+        columns = {}
+        for field in FIELDS:
+            values = self._values[field]
+            if field in DICTIONARY_FIELDS:
+                columns[field] = np.array(values, dtype=np.int32)
+            elif field in FLOAT_FIELDS:
+                columns[field] = np.array(values, dtype=np.float64)
+            elif field == 'calculation_verified':
+                columns[field] = np.array(values, dtype=bool)
+            elif field == 'order_date':
+                columns[field] = np.array(values, dtype='datetime64[s]')
+            else:
+                array = np.empty(len(values), dtype=object)
+                array[:] = values
+                columns[field] = array
+        return ProcessedBatch(columns, self._dictionaries)
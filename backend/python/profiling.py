@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+PERFIL DE EXECUÇÃO (--profile) - GL GARANTIAS
+
+Liga o cProfile durante a execução e grava, ao lado do JSON de saída:
+- <base>.prof          perfil completo (abrir com snakeviz ou pstats)
+- <base>.profile.txt   resumo das N funções mais custosas
+
+Quando a opção está desligada nada é instalado, então o custo é zero.
+
+A partir do Python 3.12 o cProfile usa sys.monitoring e só um perfilador pode
+estar ativo por vez: um cProfile por thread falha na inicialização da thread
+(ValueError) e a thread morre sem concluir. Nessas versões só a thread
+principal é perfilada.
+
+Verificação: python profiling.py (threads de um executor precisam concluir
+dentro de um bloco perfilado).
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# cProfile sobre sys.monitoring (3.12+): um único perfilador ativo no processo
+PER_THREAD_PROFILERS = sys.version_info < (3, 12)
+
+
+def profile_base_path(output_path: Optional[str], fallback_path: Optional[str] = None,
+                      prefix: str = 'profile') -> str:
+    """Caminho base dos arquivos de perfil: ao lado da saída JSON (ou do arquivo de entrada)"""
+    reference = output_path or fallback_path
+    if reference:
+        base = Path(reference)
+        return str(base.with_name(f"{base.stem}_{prefix}"))
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+
+def hot_functions_summary(stats: pstats.Stats, top_n: int = 25) -> str:
+    """Resumo textual das funções mais custosas (tempo acumulado e tempo próprio)"""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.strip_dirs()
+
+    stream.write(f"=== Top {top_n} por tempo acumulado ===\n")
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+    stream.write(f"\n=== Top {top_n} por tempo próprio ===\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(top_n)
+
+    return stream.getvalue()
+
+
+@contextmanager
+def profile_run(enabled: bool, base_path: str, top_n: int = 25):
+    """Perfilar o bloco quando enabled; grava .prof e .profile.txt ao final
+
+    Até o Python 3.11, threads criadas durante o bloco (pré-verificações,
+    produtor do modo streaming) ganham um perfilador próprio, somado ao da
+    thread principal; a partir do 3.12 só a thread principal entra no perfil.
+    """
+    if not enabled:
+        yield None
+        return
+
+    thread_profilers = []
+
+    def start_thread_profiler(frame, event, arg):
+        # Chamado no primeiro evento de cada nova thread: troca o gancho
+        # por um cProfile dedicado àquela thread
+        profiler = cProfile.Profile()
+        thread_profilers.append(profiler)
+        profiler.enable()
+
+    main_profiler = cProfile.Profile()
+    if PER_THREAD_PROFILERS:
+        threading.setprofile(start_thread_profiler)
+    else:
+        logger.info("🔬 Python 3.12+: perfil apenas da thread principal")
+    main_profiler.enable()
+    try:
+        yield main_profiler
+    finally:
+        main_profiler.disable()
+        if PER_THREAD_PROFILERS:
+            threading.setprofile(None)
+            for profiler in thread_profilers:
+                profiler.disable()
+
+        prof_path = f"{base_path}.prof"
+        summary_path = f"{base_path}.profile.txt"
+        try:
+            stats = pstats.Stats(main_profiler)
+            for profiler in thread_profilers:
+                stats.add(profiler)
+            stats.dump_stats(prof_path)
+            with open(summary_path, 'w', encoding='utf-8') as f:
+                f.write(hot_functions_summary(stats, top_n))
+            logger.info(f"🔬 Perfil salvo em: {prof_path} (resumo: {summary_path})")
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar perfil: {e}")
+
+
+def check_thread_profiling(base_path: str, timeout: float = 10.0) -> bool:
+    """Conferir que threads de um executor concluem dentro de um bloco perfilado"""
+    with profile_run(True, base_path, top_n=5):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(sum, range(1000)) for _ in range(4)]
+            try:
+                return all(future.result(timeout=timeout) == 499500 for future in futures)
+            except Exception as e:
+                logger.error(f"❌ Threads não concluíram sob o perfilador: {e}")
+                return False
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = check_thread_profiling(str(Path(tmp) / 'check'))
+    print("✅ Threads concluem sob --profile" if ok else "❌ Threads travaram sob --profile")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+INSTRUMENTAÇÃO POR ETAPA - GL GARANTIAS
+
+Mede, para cada etapa do processamento (leitura, validação de colunas,
+processamento de linhas, serialização, backup, upload, verificação):
+- tempo de relógio (wall)
+- tempo de CPU da thread que executou a etapa
+- pico de memória residente (RSS) do processo ao fim da etapa
+
+O resultado vai para a seção "timings" do JSON de saída. Cada execução de
+etapa também vira um span (início em epoch, duração, thread, trace id) na
+seção "trace", para cruzar com os logs do Node e do Python do mesmo upload.
+"""
+
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from trace_context import get_trace_id
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pico de memória residente do processo até agora, em MB"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss vem em KB no Linux e em bytes no macOS
+        divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        return round(peak / divisor, 1)
+    except ImportError:
+        pass
+
+    try:
+        # Windows: psutil expõe o pico do working set
+        import psutil
+        info = psutil.Process().memory_info()
+        peak = getattr(info, 'peak_wset', None) or info.rss
+        return round(peak / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+class StageTimer:
+    """Acumula tempo e memória por etapa nomeada"""
+
+    def __init__(self, stages: Dict[str, Dict[str, Any]] = None,
+                 spans: List[Dict[str, Any]] = None, trace_id: str = None):
+        self.stages: Dict[str, Dict[str, Any]] = stages if stages is not None else {}
+        self.spans: List[Dict[str, Any]] = spans if spans is not None else []
+        self.trace_id = trace_id or get_trace_id()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Medir o bloco como uma etapa (chamadas repetidas são somadas)"""
+        start_time = time.time()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - wall_start, time.thread_time() - cpu_start,
+                        start_time=start_time)
+
+    def time_call(self, name: str, func: Callable, *args, **kwargs):
+        """Executar func medindo-a como uma etapa"""
+        with self.stage(name):
+            return func(*args, **kwargs)
+
+    def record(self, name: str, wall_seconds: float, cpu_seconds: float, start_time: float = None):
+        """Registrar uma medição já feita (start_time em epoch; padrão: agora - duração)"""
+        if start_time is None:
+            start_time = time.time() - wall_seconds
+        rss = peak_rss_mb()
+
+        # Etapas de preflight rodam em threads paralelas
+        with self._lock:
+            entry = self.stages.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0})
+            entry['wall_seconds'] = round(entry['wall_seconds'] + wall_seconds, 4)
+            entry['cpu_seconds'] = round(entry['cpu_seconds'] + cpu_seconds, 4)
+            entry['calls'] += 1
+            entry['peak_rss_mb'] = rss
+            self.spans.append({
+                'name': name,
+                'trace_id': self.trace_id,
+                'thread': threading.current_thread().name,
+                'start_time': round(start_time, 4),
+                'duration_seconds': round(wall_seconds, 4),
+            })
+
+        logger.debug(f"⏱️ Etapa {name}: {wall_seconds:.3f}s",
+                     extra={'stage': name, 'duration_seconds': round(wall_seconds, 4)})
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Cópia das medições, pronta para JSON"""
+        return {name: dict(entry) for name, entry in self.stages.items()}
+
+    def trace_dict(self) -> Dict[str, Any]:
+        """Trace id e spans na ordem em que terminaram, prontos para JSON"""
+        return {'trace_id': self.trace_id, 'spans': [dict(span) for span in self.spans]}
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+IDENTIFICADOR DE RASTREAMENTO (TRACE ID) - GL GARANTIAS
+
+Um upload passa por UploadControllerV2 -> PythonExcelService -> excel_processor.py
+-> banco. O trace id liga esses saltos: o Node repassa o uploadId na variável
+GLG_TRACE_ID (ou o script recebe --trace-id) e ele aparece em toda linha de log
+e em todo span do StageTimer.
+
+Cada processo Python atende um único upload, então o id é global do processo
+(vale também para as threads de trabalho, onde contextvars não chegariam).
+"""
+
+import logging
+import os
+import uuid
+from typing import Optional
+
+TRACE_ENV_VAR = 'GLG_TRACE_ID'
+
+_trace_id: Optional[str] = None
+
+
+def set_trace_id(trace_id: Optional[str] = None) -> str:
+    """Definir o trace id do processo (argumento > GLG_TRACE_ID > novo uuid)"""
+    global _trace_id
+    _trace_id = trace_id or os.getenv(TRACE_ENV_VAR) or uuid.uuid4().hex
+    return _trace_id
+
+
+def get_trace_id() -> str:
+    """Trace id atual (gerado na primeira chamada, se ninguém definiu)"""
+    return _trace_id or set_trace_id()
+
+
+class TraceIdFilter(logging.Filter):
+    """Anexa o trace id a cada registro de log (campo trace_id)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'trace_id'):
+            record.trace_id = get_trace_id()
+        return True
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Benchmarks do processador e do uploader com portão de regressão
+
+Cada repetição roda num subprocesso próprio, para que o pico de RSS medido seja
+só daquela execução. Mede:
+- processor: DefinitiveExcelProcessor.process_excel_file sobre --excel
+- uploader: SupabaseUploader.upload_dataframe de --upload-rows linhas sintéticas
+  contra o PostgREST local (local_postgrest.py), com latência configurável
+- memory: memória (deep) das --upload-rows linhas sintéticas com as colunas de
+  baixa cardinalidade como Categorical, comparada com as mesmas colunas em str
+
+Modos:
+    python benchmark_runner.py --excel planilha.xlsx --save-baseline
+        grava benchmark_baselines/<label>-vN.json (N = última versão + 1)
+    python benchmark_runner.py --excel planilha.xlsx --compare
+        compara com a última versão do baseline; sai com código 1 se houver regressão
+
+Os limites levam o ruído em conta: a variação tolerada é o maior valor entre
+--threshold e --noise-factor vezes o coeficiente de variação das repetições
+(baseline e execução atual).
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+# Módulos compartilhados com o processador definitivo (backend/python)
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'python'))
+
+from log_setup import setup_logging
+from stage_timer import peak_rss_mb
+
+logger = logging.getLogger(__name__)
+
+BASELINE_SCHEMA_VERSION = 1
+DEFAULT_BASELINE_DIR = Path(__file__).resolve().parent / 'benchmark_baselines'
+
+# Métrica -> sentido de melhora (maior é melhor / menor é melhor)
+METRICS = {
+    'rows_per_second': 'higher',
+    'peak_rss_mb': 'lower',
+    'frame_memory_mb': 'lower',
+}
+
+# Folga absoluta de memória (MB): evita alarmes por variações pequenas do interpretador
+RSS_ABSOLUTE_SLACK_MB = 5.0
+
+
+# ---------------------------------------------------------------------------
+# Execuções isoladas (subprocesso)
+# ---------------------------------------------------------------------------
+
+def _load_definitive_processor():
+    """backend/python/excel_processor.py (o excel_processor.py desta pasta tem o mesmo nome)"""
+    import importlib.util
+
+    path = Path(__file__).resolve().parent.parent / 'python' / 'excel_processor.py'
+    spec = importlib.util.spec_from_file_location('definitive_excel_processor', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.DefinitiveExcelProcessor
+
+
+def _worker_processor(excel_file: str) -> Dict:
+    processor = _load_definitive_processor()()
+    start = time.perf_counter()
+    result = processor.process_excel_file(excel_file)
+    wall = time.perf_counter() - start
+    if not result.success:
+        raise RuntimeError(f"Processamento falhou: {result.errors}")
+    return {'rows': result.total_rows_excel, 'wall_seconds': wall}
+
+
+def _synthetic_orders(rows: int):
+    """DataFrame no formato do processador, com valores determinísticos"""
+    import pandas as pd
+
+    statuses = ['G', 'GO', 'GU']
+    dates = pd.date_range('2019-01-01', '2025-12-31', freq='D')
+    return pd.DataFrame({
+        'order_number': [f"{100000 + i}" for i in range(rows)],
+        'order_date': [dates[i % len(dates)] for i in range(rows)],
+        'order_status': [statuses[i % len(statuses)] for i in range(rows)],
+        'engine_manufacturer': ['MWM' if i % 2 else 'Cummins' for i in range(rows)],
+        'engine_description': [f"Motor {i % 40}" for i in range(rows)],
+        'vehicle_model': [f"Modelo {i % 120}" for i in range(rows)],
+        'raw_defect_description': [f"Vazamento de óleo no cabeçote {i % 300}" for i in range(rows)],
+        'responsible_mechanic': [f"Mecânico {i % 25}" for i in range(rows)],
+        'parts_total': [round((i % 997) * 1.37, 2) for i in range(rows)],
+        'labor_total': [round((i % 311) * 2.11, 2) for i in range(rows)],
+        'grand_total': [round((i % 997) * 1.37 + (i % 311) * 2.11, 2) for i in range(rows)],
+        'calculation_verified': [True] * rows,
+    })
+
+
+def _worker_uploader(rows: int, latency_ms: float, batch_size: int) -> Dict:
+    from local_postgrest import LocalPostgrest, LOCAL_SERVICE_KEY
+
+    df = _synthetic_orders(rows)
+    with LocalPostgrest(latency_ms=latency_ms, seed=0) as server:
+        os.environ['SUPABASE_URL'] = server.url
+        os.environ['SUPABASE_SERVICE_ROLE_KEY'] = LOCAL_SERVICE_KEY
+        from supabase_uploader import SupabaseUploader
+
+        uploader = SupabaseUploader()
+        uploader.batch_size = batch_size
+        start = time.perf_counter()
+        stats = uploader.upload_dataframe(df)
+        wall = time.perf_counter() - start
+    if stats['failed_uploads']:
+        raise RuntimeError(f"Upload com {stats['failed_uploads']} falhas: {stats['errors'][:3]}")
+    return {'rows': rows, 'wall_seconds': wall}
+
+
+def _worker_memory(rows: int) -> Dict:
+    from excel_processor import categorize_columns
+
+    df = _synthetic_orders(rows)
+    object_bytes = df.memory_usage(deep=True).sum()
+    start = time.perf_counter()
+    categorize_columns(df)
+    wall = time.perf_counter() - start
+    frame_bytes = df.memory_usage(deep=True).sum()
+    return {
+        'rows': rows,
+        'wall_seconds': wall,
+        'frame_memory_mb': round(frame_bytes / 1024 ** 2, 3),
+        'object_frame_memory_mb': round(object_bytes / 1024 ** 2, 3),
+    }
+
+
+def run_worker(args) -> int:
+    """Executar uma repetição e imprimir o resultado em JSON no stdout"""
+    setup_logging(level=logging.WARNING)
+    if args.worker == 'processor':
+        result = _worker_processor(args.excel)
+    elif args.worker == 'memory':
+        result = _worker_memory(args.upload_rows)
+    else:
+        result = _worker_uploader(args.upload_rows, args.latency_ms, args.batch_size)
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+    return 0
+
+
+def _run_isolated(benchmark: str, args) -> Dict:
+    command = [sys.executable, str(Path(__file__).resolve()), '--worker', benchmark,
+               '--upload-rows', str(args.upload_rows), '--latency-ms', str(args.latency_ms),
+               '--batch-size', str(args.batch_size)]
+    if args.excel:
+        command += ['--excel', args.excel]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark {benchmark} falhou:\n{completed.stderr.strip()[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# ---------------------------------------------------------------------------
+# Agregação, baselines e comparação
+# ---------------------------------------------------------------------------
+
+def _summary(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None  # ex. pico de RSS indisponível na plataforma
+    mean = statistics.fmean(values)
+    stdev = statistics.stdev(values) if len(values) > 1 else 0.0
+    return {
+        'median': round(statistics.median(values), 3),
+        'mean': round(mean, 3),
+        'min': round(min(values), 3),
+        'max': round(max(values), 3),
+        'cv': round(stdev / mean, 4) if mean else 0.0,
+    }
+
+
+def run_benchmark(benchmark: str, args) -> Dict:
+    """Aquecimento + repetições isoladas de um benchmark"""
+    for _ in range(args.warmup):
+        _run_isolated(benchmark, args)
+
+    runs = []
+    for i in range(args.repeat):
+        run = _run_isolated(benchmark, args)
+        run['rows_per_second'] = run['rows'] / run['wall_seconds'] if run['wall_seconds'] else 0.0
+        runs.append(run)
+        logger.info(f"   {benchmark} #{i + 1}: {run['rows_per_second']:.0f} linhas/s, "
+                    f"pico RSS {run['peak_rss_mb']} MB")
+
+    if 'object_frame_memory_mb' in runs[0]:
+        logger.info(f"   {benchmark}: {runs[0]['object_frame_memory_mb']} MB em str -> "
+                    f"{runs[0]['frame_memory_mb']} MB com Categorical "
+                    f"({1 - runs[0]['frame_memory_mb'] / runs[0]['object_frame_memory_mb']:.0%} a menos)")
+
+    return {
+        'rows': runs[0]['rows'],
+        'runs': [{k: round(v, 4) if isinstance(v, float) else v for k, v in run.items()} for run in runs],
+        **{metric: _summary([run[metric] for run in runs if run.get(metric) is not None])
+           for metric in METRICS},
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _baseline_versions(baseline_dir: Path, label: str) -> List[Tuple[int, Path]]:
+    pattern = re.compile(rf'^{re.escape(label)}-v(\d+)\.json$')
+    versions = []
+    for path in baseline_dir.glob(f'{label}-v*.json'):
+        match = pattern.match(path.name)
+        if match:
+            versions.append((int(match.group(1)), path))
+    return sorted(versions)
+
+
+def save_baseline(results: Dict, baseline_dir: Path, label: str) -> Path:
+    """Gravar como nova versão do baseline"""
+    baseline_dir.mkdir(parents=True, exist_ok=True)
+    versions = _baseline_versions(baseline_dir, label)
+    version = versions[-1][0] + 1 if versions else 1
+    path = baseline_dir / f'{label}-v{version}.json'
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({**results, 'baseline_version': version}, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def load_baseline(baseline_dir: Path, label: str, version: int = None) -> Tuple[Optional[Dict], Optional[Path]]:
+    """Carregar uma versão do baseline (padrão: a mais recente)"""
+    versions = dict(_baseline_versions(baseline_dir, label))
+    if not versions:
+        return None, None
+    path = versions.get(version) if version else versions[max(versions)]
+    if path is None:
+        return None, None
+    with open(path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('schema_version') != BASELINE_SCHEMA_VERSION:
+        raise ValueError(f"Baseline {path.name} com schema {baseline.get('schema_version')}, "
+                         f"esperado {BASELINE_SCHEMA_VERSION}")
+    return baseline, path
+
+
+def compare(baseline: Dict, current: Dict, threshold: float, noise_factor: float) -> Tuple[List[Dict], bool]:
+    """Comparar medianas por métrica; retorna (linhas do relatório, houve regressão)"""
+    rows = []
+    regressed = False
+    for name, result in current['benchmarks'].items():
+        base_result = baseline['benchmarks'].get(name)
+        if base_result is None:
+            rows.append({'benchmark': name, 'metric': '-', 'status': 'SEM BASELINE'})
+            continue
+        for metric, direction in METRICS.items():
+            base, new = base_result.get(metric), result.get(metric)
+            if not base or not new or not base['median']:
+                continue
+            tolerance = max(threshold, noise_factor * max(base['cv'], new['cv']))
+            change = (new['median'] - base['median']) / base['median']
+            worse = -change if direction == 'higher' else change
+            allowed = tolerance
+            if metric == 'peak_rss_mb':
+                allowed = max(tolerance, RSS_ABSOLUTE_SLACK_MB / base['median'])
+            status = 'REGRESSÃO' if worse > allowed else ('MELHORA' if worse < -allowed else 'ok')
+            regressed = regressed or status == 'REGRESSÃO'
+            rows.append({
+                'benchmark': name, 'metric': metric, 'baseline': base['median'], 'current': new['median'],
+                'change': change, 'tolerance': allowed, 'status': status,
+            })
+    return rows, regressed
+
+
+def format_report(rows: List[Dict], baseline_path: Path) -> str:
+    lines = [f"Comparação com {baseline_path.name}",
+             f"{'benchmark':<10} {'métrica':<16} {'baseline':>12} {'atual':>12} {'variação':>9} "
+             f"{'tolerância':>10}  status"]
+    for row in rows:
+        if 'change' not in row:
+            lines.append(f"{row['benchmark']:<10} {row['metric']:<16} {'':>12} {'':>12} {'':>9} {'':>10}  "
+                         f"{row['status']}")
+            continue
+        lines.append(f"{row['benchmark']:<10} {row['metric']:<16} {row['baseline']:>12.1f} {row['current']:>12.1f} "
+                     f"{row['change']:>+8.1%} {row['tolerance']:>9.1%}  {row['status']}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do processador/uploader com portão de regressão')
+    parser.add_argument('--excel', help='Planilha para o benchmark do processador')
+    parser.add_argument('--benchmarks', default='processor,uploader,memory',
+                        help='Lista separada por vírgula: processor, uploader, memory')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetições medidas por benchmark')
+    parser.add_argument('--warmup', type=int, default=1, help='Repetições descartadas antes das medidas')
+    parser.add_argument('--upload-rows', type=int, default=20000,
+                        help='Linhas sintéticas dos benchmarks de upload e de memória')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Latência do PostgREST local por requisição')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Tamanho do lote no benchmark de upload')
+    parser.add_argument('--baseline-dir', default=str(DEFAULT_BASELINE_DIR))
+    parser.add_argument('--label', default='default', help='Nome do baseline (ex. máquina de CI)')
+    parser.add_argument('--baseline-version', type=int, help='Comparar com esta versão (padrão: a mais recente)')
+    parser.add_argument('--save-baseline', action='store_true', help='Gravar o resultado como nova versão')
+    parser.add_argument('--compare', action='store_true', help='Comparar com o baseline e falhar em regressão')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Variação mínima tolerada (fração)')
+    parser.add_argument('--noise-factor', type=float, default=3.0,
+                        help='Tolerância adicional em múltiplos do coeficiente de variação')
+    parser.add_argument('--output', '-o', help='Gravar o resultado desta execução em JSON')
+    parser.add_argument('--worker', choices=['processor', 'uploader', 'memory'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args)
+
+    setup_logging()
+
+    benchmarks = [name.strip() for name in args.benchmarks.split(',') if name.strip()]
+    if 'processor' in benchmarks and not args.excel:
+        logger.warning("⚠️ Sem --excel: benchmark do processador ignorado")
+        benchmarks.remove('processor')
+    if not benchmarks:
+        logger.error("❌ Nenhum benchmark a executar")
+        return 2
+
+    results = {
+        'schema_version': BASELINE_SCHEMA_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'machine': platform.node()},
+        'config': {'repeat': args.repeat, 'warmup': args.warmup, 'excel': args.excel,
+                   'upload_rows': args.upload_rows, 'latency_ms': args.latency_ms,
+                   'batch_size': args.batch_size},
+        'benchmarks': {},
+    }
+    for name in benchmarks:
+        logger.info(f"⏱️ Benchmark {name} ({args.repeat} repetições)")
+        try:
+            results['benchmarks'][name] = run_benchmark(name, args)
+        except RuntimeError as e:
+            logger.error(f"❌ {e}")
+            return 2
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    baseline_dir = Path(args.baseline_dir)
+    exit_code = 0
+    if args.compare:
+        baseline, baseline_path = load_baseline(baseline_dir, args.label, args.baseline_version)
+        if baseline is None:
+            logger.error(f"❌ Baseline '{args.label}' não encontrado em {baseline_dir}")
+            return 2
+        if baseline.get('config') != results['config']:
+            logger.warning("⚠️ Configuração diferente da do baseline; comparação pode não ser válida")
+        rows, regressed = compare(baseline, results, args.threshold, args.noise_factor)
+        print(format_report(rows, baseline_path))
+        if regressed:
+            logger.error("❌ Regressão de desempenho detectada")
+            exit_code = 1
+        else:
+            logger.info("✅ Sem regressão de desempenho")
+
+    if args.save_baseline:
+        path = save_baseline(results, baseline_dir, args.label)
+        logger.info(f"💾 Baseline gravado: {path}")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
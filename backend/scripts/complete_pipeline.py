@@ -7,66 +7,83 @@ Combina o processamento de Excel (excel_processor.py) com upload para Supabase (
 import os
 import sys
 import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from pathlib import Path
 import logging
 import argparse
 
+# Módulos compartilhados com o processador definitivo (backend/python)
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'python'))
+
 # Importar nossas classes
+from stage_timer import StageTimer
+from profiling import profile_run, profile_base_path
+from metrics import REGISTRY, record_processing, record_run
+from log_setup import setup_logging
+from trace_context import set_trace_id
+from columnar_io import SUFFIX_BY_FORMAT, read_processed_data
 from excel_processor import ExcelProcessor
 from supabase_uploader import SupabaseUploader
+from upload_journal import UploadJournal
+from order_cube import build_cube, merge_cubes, save_cube
+from defect_index import DefectIndex
+from order_mirror import OrderMirror
+from defect_clusters import cluster_defects, cluster_sizes_by_year
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('complete_pipeline.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 class CompletePipeline:
     """Pipeline completo de processamento de dados"""
     
-    def __init__(self, env_path: str = None):
+    def __init__(self, env_path: str = None, journal_path: str = None, upload_backend: str = "rest",
+                 defect_index_path: str = None, mirror_path: str = None):
         """Inicializar pipeline"""
-        self.excel_processor = ExcelProcessor()
-        self.supabase_uploader = SupabaseUploader(env_path)
+        self.timer = StageTimer()
+        self.excel_processor = ExcelProcessor(timer=self.timer)
+        self.supabase_uploader = SupabaseUploader(env_path, upload_backend)
+        self.journal = UploadJournal(journal_path) if journal_path else None
+        self.defect_index = DefectIndex(defect_index_path) if defect_index_path else None
+        self.mirror = OrderMirror(mirror_path) if mirror_path else None
+        self.cluster_defects = False  # agrupamento MinHash das descrições (--defect-clusters)
+        self.backup_format = "csv"  # csv, parquet ou arrow (--backup-format)
         self.results = {
             "processing_stats": {},
             "upload_stats": {},
             "verification": {},
+            "cube": {},
+            "timings": self.timer.stages,
+            "trace": {"trace_id": self.timer.trace_id, "spans": self.timer.spans},
             "start_time": datetime.now(),
             "end_time": None,
             "success": False
         }
     
-    def run_pipeline(self, excel_file_path: str, clear_existing: bool = True) -> dict:
-        """Executar pipeline completo"""
+    def run_pipeline(self, excel_file_path: str, clear_existing: bool = True,
+                     resume_run_id: str = None, reload_mode: str = "delete",
+                     verify_mode: str = "count") -> dict:
+        """Executar pipeline completo
+        
+        reload_mode (quando clear_existing): "delete" apaga e reinsere em lotes;
+        "swap" carrega numa tabela de staging e troca numa única transação.
+        """
         logger.info("🚀 Iniciando pipeline completo de processamento de dados")
         logger.info(f"   Arquivo Excel: {excel_file_path}")
         logger.info(f"   Limpar dados existentes: {clear_existing}")
+        if resume_run_id:
+            logger.info(f"   Retomando execução: {resume_run_id}")
         
         try:
             # 1. Verificar arquivo Excel
             if not os.path.exists(excel_file_path):
                 raise FileNotFoundError(f"Arquivo Excel não encontrado: {excel_file_path}")
             
-            # 2. Testar conexão Supabase
-            logger.info("🔗 Testando conexão com Supabase...")
-            if not self.supabase_uploader.test_connection():
-                raise ConnectionError("Falha na conexão com Supabase")
-            
-            # 3. Obter informações da tabela atual
-            logger.info("📋 Obtendo informações da tabela atual...")
-            table_info = self.supabase_uploader.get_table_info()
+            # 2-4. Conexão, informações da tabela e processamento do Excel em paralelo
+            table_info, (df_processed, processing_stats) = self.run_preflight(excel_file_path)
             logger.info(f"   Registros existentes: {table_info.get('total_records', 0)}")
-            
-            # 4. Processar arquivo Excel
-            logger.info("📊 Processando arquivo Excel...")
-            df_processed, processing_stats = self.excel_processor.process_excel_file(excel_file_path)
             self.results["processing_stats"] = processing_stats
             
             if len(df_processed) == 0:
@@ -75,22 +92,41 @@ class CompletePipeline:
             logger.info(f"✅ Processamento Excel concluído: {len(df_processed)} registros válidos")
             
             # 5. Salvar dados processados (backup)
-            backup_file = f"processed_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            self.excel_processor.save_processed_data(df_processed, backup_file)
+            backup_file = self.backup_path()
+            self.timer.time_call("backup", self.excel_processor.save_processed_data, df_processed, backup_file)
             logger.info(f"💾 Backup salvo: {backup_file}")
             
+            # 5b. Cubo pré-agregado (ano x mês x status x fabricante x modelo)
+            cube = self.timer.time_call("cube", build_cube, df_processed)
+            save_cube(cube, self.derived_path(backup_file, "service_orders_cube_"))
+            self.save_defect_clusters(df_processed, backup_file)
+            
             # 6. Upload para Supabase
             logger.info("⬆️ Enviando dados para Supabase...")
-            upload_stats = self.supabase_uploader.upload_dataframe(df_processed, clear_existing)
+            if clear_existing and reload_mode == "swap" and not resume_run_id:
+                upload_stats = self.timer.time_call("upload", self.supabase_uploader.upload_dataframe_staged, df_processed)
+            else:
+                upload_stats = self.timer.time_call(
+                    "upload", self.supabase_uploader.upload_dataframe,
+                    df_processed, clear_existing, journal=self.journal, resume_run_id=resume_run_id
+                )
             self.results["upload_stats"] = upload_stats
             
             # 7. Verificar upload
             logger.info("🔍 Verificando upload...")
-            verification = self.supabase_uploader.verify_upload(len(df_processed))
+            verification = self.verify_upload(len(df_processed), table_info, clear_existing, upload_stats,
+                                              df_processed, verify_mode)
             self.results["verification"] = verification
             
+            # 7b. Publicar o cubo, indexar defeitos e atualizar o espelho (só depois de o upload conferir)
+            upload_confirmed = self.upload_confirmed(upload_stats, verification)
+            if upload_confirmed:
+                self.publish_cube(cube, replaces_table=clear_existing)
+                self.update_defect_index(df_processed, replace=clear_existing)
+                self.update_mirror(df_processed, replace=clear_existing)
+            
             # 8. Obter amostra dos dados
-            sample_data = self.supabase_uploader.get_sample_data(5)
+            sample_data = self.timer.time_call("sample", self.get_sample_data, 5)
             
             # 9. Relatório final
             self.results["end_time"] = datetime.now()
@@ -111,6 +147,290 @@ class CompletePipeline:
             self.results["success"] = False
             return self.results
     
+    def run_preflight(self, excel_file_path: str):
+        """Testar conexão, obter informações da tabela e processar o Excel em paralelo
+        
+        As verificações de rede não dependem do Excel, então rodam ao mesmo
+        tempo que o processamento. Se alguma falhar, o pipeline para sem
+        esperar o fim do processamento.
+        """
+        logger.info("🔗 Testando conexão, lendo tabela e processando Excel em paralelo...")
+        preflight_start = time.perf_counter()
+        
+        executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="preflight")
+        try:
+            connection_future = executor.submit(self.timer.time_call, "preflight_connection",
+                                                self.supabase_uploader.test_connection)
+            table_future = executor.submit(self.timer.time_call, "preflight_table_info",
+                                           self.supabase_uploader.get_table_info)
+            excel_future = executor.submit(self.timer.time_call, "excel_processing",
+                                           self.excel_processor.process_excel_file, excel_file_path)
+            
+            pending = {connection_future, table_future, excel_future}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                
+                if connection_future in done and not connection_future.result():
+                    raise ConnectionError("Falha na conexão com Supabase")
+                if table_future in done and not table_future.result().get("table_exists", False):
+                    raise ConnectionError(f"Falha ao obter informações da tabela: {table_future.result().get('error')}")
+                if excel_future in done:
+                    excel_future.result()  # propaga erro do processamento
+            
+            return table_future.result(), excel_future.result()
+            
+        finally:
+            # Em caso de falha, não espera o processamento do Excel terminar
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.timer.record("preflight_total", time.perf_counter() - preflight_start, 0.0)
+    
+    def run_streaming_pipeline(self, excel_file_path: str, clear_existing: bool = True,
+                               chunk_size: int = 5000, queue_size: int = 4) -> dict:
+        """Executar pipeline em streaming: processamento e upload sobrepostos
+        
+        Uma thread lê e processa a planilha em blocos e os coloca numa fila
+        limitada; o upload consome a fila enquanto os próximos blocos ainda estão
+        sendo processados. Com a fila cheia o processamento espera, então a
+        memória fica estável. Verificação apenas por contagem.
+        """
+        logger.info("🚀 Iniciando pipeline em streaming (processamento e upload sobrepostos)")
+        logger.info(f"   Arquivo Excel: {excel_file_path}")
+        logger.info(f"   Limpar dados existentes: {clear_existing}")
+        logger.info(f"   Blocos de {chunk_size} linhas, fila de {queue_size} blocos")
+        
+        self.results["mode"] = "streaming"
+        
+        try:
+            if not os.path.exists(excel_file_path):
+                raise FileNotFoundError(f"Arquivo Excel não encontrado: {excel_file_path}")
+            
+            logger.info("🔗 Testando conexão com Supabase...")
+            if not self.supabase_uploader.test_connection():
+                raise ConnectionError("Falha na conexão com Supabase")
+            
+            table_info = self.supabase_uploader.get_table_info()
+            logger.info(f"   Registros existentes: {table_info.get('total_records', 0)}")
+            
+            chunk_queue = queue.Queue(maxsize=queue_size)
+            stop = threading.Event()
+            producer_state = {"stats": {}, "valid_rows": 0, "error": None, "cubes": []}
+            backup_file = self.backup_path()
+            backup_writer = self.excel_processor.open_processed_writer(backup_file)
+            
+            def put(item) -> bool:
+                # put com timeout para não travar se o consumidor parar
+                while not stop.is_set():
+                    try:
+                        chunk_queue.put(item, timeout=0.5)
+                        return True
+                    except queue.Full:
+                        continue
+                return False
+            
+            def produce():
+                try:
+                    with self.timer.stage("excel_processing"):
+                        for chunk_df, chunk_stats in self.excel_processor.process_excel_chunks(excel_file_path, chunk_size):
+                            ExcelProcessor.merge_stats(producer_state["stats"], chunk_stats)
+                            if len(chunk_df) == 0:
+                                continue
+                            with self.timer.stage("backup"):
+                                backup_writer.write(chunk_df)
+                            with self.timer.stage("cube"):
+                                producer_state["cubes"].append(build_cube(chunk_df))
+                            producer_state["valid_rows"] += len(chunk_df)
+                            if not put(chunk_df):
+                                return
+                except Exception as e:
+                    producer_state["error"] = e
+                finally:
+                    put(None)
+            
+            def consume():
+                first = True
+                while True:
+                    chunk_df = chunk_queue.get()
+                    if chunk_df is None:
+                        return
+                    # Só limpa a tabela quando o primeiro bloco válido existe
+                    if first and clear_existing:
+                        logger.info("🗑️ Limpando dados existentes...")
+                        self.supabase_uploader.clear_table(confirm=True)
+                    first = False
+                    yield chunk_df
+            
+            producer = threading.Thread(target=produce, name="excel-producer", daemon=True)
+            producer.start()
+            
+            try:
+                upload_stats = self.timer.time_call("upload", self.supabase_uploader.upload_stream, consume())
+            finally:
+                stop.set()
+                producer.join()
+                backup_writer.close()
+            
+            self.results["processing_stats"] = producer_state["stats"]
+            self.results["upload_stats"] = upload_stats
+            
+            if producer_state["error"] is not None:
+                raise producer_state["error"]
+            
+            valid_rows = producer_state["valid_rows"]
+            if valid_rows == 0:
+                raise ValueError("Nenhum registro válido encontrado após processamento")
+            
+            logger.info(f"💾 Backup salvo: {backup_file}")
+            
+            cube = merge_cubes(producer_state["cubes"])
+            save_cube(cube, self.derived_path(backup_file, "service_orders_cube_"))
+            if self.cluster_defects:
+                self.save_defect_clusters(read_processed_data(backup_file), backup_file)
+            
+            logger.info("🔍 Verificando upload...")
+            verification = self.verify_upload(valid_rows, table_info, clear_existing, upload_stats)
+            self.results["verification"] = verification
+            
+            upload_confirmed = self.upload_confirmed(upload_stats, verification)
+            if upload_confirmed:
+                self.publish_cube(cube, replaces_table=clear_existing)
+                if self.defect_index is not None or self.mirror is not None:
+                    # Os blocos não ficam em memória: indexa a partir do backup completo
+                    backup_df = read_processed_data(backup_file)
+                    self.update_defect_index(backup_df, replace=clear_existing)
+                    self.update_mirror(backup_df, replace=clear_existing)
+            
+            sample_data = self.get_sample_data(5)
+            
+            self.results["end_time"] = datetime.now()
+            self.results["success"] = (
+                upload_stats["successful_uploads"] > 0 and
+                verification.get("match", False)
+            )
+            
+            self.log_final_report(sample_data)
+            
+            return self.results
+            
+        except Exception as e:
+            logger.error(f"❌ Erro crítico no pipeline: {e}")
+            self.results["end_time"] = datetime.now()
+            self.results["error"] = str(e)
+            self.results["success"] = False
+            return self.results
+    
+    def verify_upload(self, expected_count: int, table_info: dict, clear_existing: bool, upload_stats: dict,
+                      df=None, verify_mode: str = "count") -> dict:
+        """Conferir o upload: contagem total numa recarga, delta sobre o existente com --no-clear
+        
+        Com --no-clear a tabela já tinha table_info["total_records"] registros
+        antes da carga (menos os lotes de uma execução retomada, que já estavam
+        lá e fazem parte desta carga); o esperado é esse valor + os enviados.
+        """
+        baseline = 0
+        if not clear_existing:
+            if "total_records" not in table_info:
+                logger.error("❌ Contagem anterior ao upload indisponível: delta não pode ser conferido")
+                return {"match": False, "error": "contagem anterior ao upload indisponível"}
+            baseline = table_info["total_records"] - upload_stats.get("resumed_records", 0)
+        return self.timer.time_call(
+            "verification", self.supabase_uploader.verify_upload, expected_count, df, verify_mode, baseline
+        )
+    
+    @staticmethod
+    def upload_confirmed(upload_stats: dict, verification: dict) -> bool:
+        """Upload sem falhas e conferido: só então o cubo e os derivados são publicados
+        
+        A contagem sozinha não basta: numa troca via staging que falhou,
+        service_orders mantém as linhas antigas e a contagem pode bater.
+        """
+        if upload_stats.get("failed_uploads", 0) or upload_stats.get("errors"):
+            logger.warning("⚠️ Upload com falhas: cubo e derivados não publicados")
+            return False
+        return bool(verification.get("match", False))
+    
+    def publish_cube(self, cube, replaces_table: bool):
+        """Gravar o cubo em service_orders_cube
+        
+        Quando o upload substituiu a tabela, o cubo do pipeline é exatamente o
+        conteúdo do banco e é enviado pronto; senão (--no-clear) todas as linhas
+        foram inseridas além das existentes, então o cubo do pipeline é o delta
+        a somar (a verificação confere esse delta: contagem depois - antes =
+        inseridos). O pipeline só insere linhas, então o delta de inserção é o
+        delta completo; alterações e exclusões feitas fora dele não geram delta
+        e aparecem em get_cube_drift (cube_maintenance.py --rebuild corrige).
+        Falhas aqui não invalidam o upload: ficam registradas em results["cube"].
+        """
+        self.results["cube"] = {"rows": len(cube), "mode": "replace" if replaces_table else "delta"}
+        try:
+            with self.timer.stage("cube_publish"):
+                if replaces_table:
+                    self.results["cube"]["result"] = self.supabase_uploader.replace_cube(cube)
+                else:
+                    self.results["cube"]["result"] = self.supabase_uploader.apply_cube_delta(cube)
+            self.results["cube"]["published"] = True
+        except Exception as e:
+            logger.error(f"❌ Erro ao publicar cubo (execute create_service_orders_cube.sql): {e}")
+            self.results["cube"].update({"published": False, "error": str(e)})
+    
+    def update_defect_index(self, df, replace: bool):
+        """Atualizar o índice local de descrições de defeito (falhas não invalidam o upload)"""
+        if self.defect_index is None:
+            return
+        try:
+            self.results["defect_index"] = self.timer.time_call(
+                "defect_index", self.defect_index.update_dataframe, df, replace
+            )
+        except Exception as e:
+            logger.error(f"❌ Erro ao atualizar índice de defeitos: {e}")
+            self.results["defect_index"] = {"error": str(e)}
+    
+    def update_mirror(self, df, replace: bool):
+        """Atualizar o espelho local de service_orders (falhas não invalidam o upload)"""
+        if self.mirror is None:
+            return
+        try:
+            self.results["mirror"] = self.timer.time_call(
+                "mirror", self.mirror.sync_dataframe, df, replace,
+                self.results["upload_stats"].get("run_id")
+            )
+        except Exception as e:
+            logger.error(f"❌ Erro ao atualizar espelho local: {e}")
+            self.results["mirror"] = {"error": str(e)}
+    
+    def get_sample_data(self, limit: int = 5) -> list:
+        """Amostra do espelho local quando ele acabou de ser sincronizado; senão do banco"""
+        synced = self.results.get("mirror")
+        if self.mirror is not None and synced and "error" not in synced:
+            return self.mirror.sample(limit)
+        return self.supabase_uploader.get_sample_data(limit)
+    
+    def backup_path(self) -> str:
+        """Nome do backup processado desta execução, com a extensão do formato escolhido"""
+        return f"processed_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}{SUFFIX_BY_FORMAT[self.backup_format]}"
+    
+    @staticmethod
+    def derived_path(backup_file: str, prefix: str) -> str:
+        """Arquivo CSV derivado do backup (cubo, clusters), com o mesmo carimbo de data"""
+        return str(Path(backup_file.replace("processed_backup_", prefix)).with_suffix(".csv"))
+    
+    def save_defect_clusters(self, df, backup_file: str):
+        """Agrupar descrições de defeito quase iguais e gravar os CSVs ao lado do backup"""
+        if not self.cluster_defects:
+            return
+        try:
+            clusters = self.timer.time_call("defect_clusters", cluster_defects, df)
+            clusters_file = self.derived_path(backup_file, "defect_clusters_")
+            sizes_file = self.derived_path(backup_file, "defect_cluster_sizes_")
+            clusters.to_csv(clusters_file, index=False, encoding="utf-8")
+            cluster_sizes_by_year(clusters).to_csv(sizes_file, index=False, encoding="utf-8")
+            self.results["defect_clusters"] = {
+                "clusters": int(clusters["cluster_id"].max() + 1), "file": clusters_file, "sizes_file": sizes_file
+            }
+            logger.info(f"🧬 {self.results['defect_clusters']['clusters']} clusters de defeitos: {clusters_file}")
+        except Exception as e:
+            logger.error(f"❌ Erro ao agrupar defeitos: {e}")
+            self.results["defect_clusters"] = {"error": str(e)}
+    
     def log_final_report(self, sample_data: list):
         """Gerar relatório final detalhado"""
         logger.info("📋 RELATÓRIO FINAL DO PIPELINE")
@@ -118,7 +438,10 @@ class CompletePipeline:
         
         # Tempo de execução
         duration = self.results["end_time"] - self.results["start_time"]
-        logger.info(f"⏱️ Tempo de execução: {duration}")
+        logger.info(f"⏱️ Tempo de execução: {duration} (trace {self.timer.trace_id})")
+        for stage, timing in self.results.get("timings", {}).items():
+            logger.info(f"   {stage}: {timing['wall_seconds']:.3f}s "
+                        f"(CPU {timing['cpu_seconds']:.3f}s, pico RSS {timing.get('peak_rss_mb')} MB)")
         
         # Estatísticas de processamento
         if self.results["processing_stats"]:
@@ -150,6 +473,8 @@ class CompletePipeline:
             logger.info(f"   Total enviado: {upload.get('successful_uploads', 0)}")
             logger.info(f"   Falhas: {upload.get('failed_uploads', 0)}")
             logger.info(f"   Lotes processados: {upload.get('batches_processed', 0)}")
+            if upload.get('run_id'):
+                logger.info(f"   Execução (journal): {upload['run_id']}")
             
             if upload.get('errors'):
                 logger.warning(f"   ⚠️ Erros encontrados: {len(upload['errors'])}")
@@ -164,6 +489,9 @@ class CompletePipeline:
             
             if not verify.get('match', False):
                 logger.warning(f"   ⚠️ Diferença: {verify.get('difference', 0)}")
+            if 'fingerprint_match' in verify:
+                logger.info(f"   Impressão digital: {verify['fingerprint_match']} "
+                            f"({len(verify.get('mismatched_partitions', []))} partições divergentes)")
         
         # Amostra dos dados
         if sample_data:
@@ -210,9 +538,50 @@ def main():
     parser.add_argument('--env', help='Caminho para arquivo .env')
     parser.add_argument('--no-clear', action='store_true', help='Não limpar dados existentes')
     parser.add_argument('--output', '-o', help='Arquivo para salvar resultados JSON')
+    parser.add_argument('--journal', default='upload_journal.db', help='Journal SQLite dos lotes enviados')
+    parser.add_argument('--resume', metavar='RUN_ID', help='Retomar execução interrompida, pulando lotes já confirmados')
+    parser.add_argument('--reload-mode', choices=['delete', 'swap'], default='delete',
+                        help='Recarga completa: apagar e reinserir, ou carregar em staging e trocar atomicamente')
+    parser.add_argument('--verify-mode', choices=['count', 'fingerprint'], default='count',
+                        help='Verificação pós-upload: só contagem, ou contagem + somas + hash por ano x status')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Processar e enviar em blocos, sobrepondo leitura do Excel e upload (REST, sem journal; '
+                             'incompatível com --resume, --reload-mode swap, --verify-mode fingerprint e --backend copy)')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Linhas por bloco no modo streaming')
+    parser.add_argument('--profile', action='store_true',
+                        help='Gravar perfil cProfile (.prof) e resumo das funções mais custosas ao lado da saída')
+    parser.add_argument('--profile-top', type=int, default=25, help='Quantidade de funções no resumo do perfil')
+    parser.add_argument('--metrics-file', help='Gravar métricas Prometheus (textfile collector) neste arquivo')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Servir métricas em http://127.0.0.1:PORTA/metrics (permanece ativo até Ctrl+C)')
+    parser.add_argument('--backend', choices=['rest', 'copy'], default='rest',
+                        help='Forma de envio: API REST em lotes ou COPY direto no Postgres (SUPABASE_DB_URL)')
+    parser.add_argument('--defect-index', default='defect_index.db',
+                        help='Índice SQLite de busca nas descrições de defeito (vazio para desativar)')
+    parser.add_argument('--mirror', default='service_orders_mirror.db',
+                        help='Espelho SQLite local de service_orders para consultas (vazio para desativar)')
+    parser.add_argument('--defect-clusters', action='store_true',
+                        help='Agrupar descrições de defeito quase iguais (MinHash LSH) e gravar CSVs')
+    parser.add_argument('--backup-format', choices=['csv', 'parquet', 'arrow'], default='csv',
+                        help='Formato do backup processado (Parquet/Arrow com zstd e tipos preservados; requer pyarrow)')
+    parser.add_argument('--trace-id', help='Identificador da execução para logs e spans (padrão: GLG_TRACE_ID ou novo)')
     
     args = parser.parse_args()
     
+    # O modo streaming envia via REST, sem journal, e confere só a contagem
+    if args.streaming:
+        unsupported = [option for option, used in (
+            ('--resume', bool(args.resume)),
+            ('--reload-mode swap', args.reload_mode == 'swap'),
+            ('--verify-mode fingerprint', args.verify_mode == 'fingerprint'),
+            ('--backend copy', args.backend == 'copy'),
+        ) if used]
+        if unsupported:
+            parser.error(f"--streaming não suporta {', '.join(unsupported)}")
+    
+    set_trace_id(args.trace_id)
+    setup_logging('complete_pipeline.log')
+    
     # Arquivos Excel disponíveis
     available_files = [
         "S:/comp-glgarantias/r-glgarantias/GLú-Garantias.xlsx",
@@ -238,17 +607,43 @@ def main():
         return 1
     
     try:
+        if args.metrics_port:
+            REGISTRY.serve(args.metrics_port)
+        
         # Inicializar pipeline
-        pipeline = CompletePipeline(args.env)
+        pipeline = CompletePipeline(args.env, args.journal, args.backend, args.defect_index or None,
+                                    args.mirror or None)
+        pipeline.cluster_defects = args.defect_clusters
+        pipeline.backup_format = args.backup_format
         
         # Executar pipeline
         clear_existing = not args.no_clear
-        results = pipeline.run_pipeline(excel_file, clear_existing)
+        profile_base = profile_base_path(args.output, prefix='pipeline_profile')
+        with profile_run(args.profile, profile_base, args.profile_top):
+            if args.streaming:
+                results = pipeline.run_streaming_pipeline(excel_file, clear_existing, chunk_size=args.chunk_size)
+            else:
+                results = pipeline.run_pipeline(excel_file, clear_existing, resume_run_id=args.resume,
+                                                reload_mode=args.reload_mode, verify_mode=args.verify_mode)
         
         # Salvar resultados se solicitado
         if args.output:
             pipeline.save_results(args.output)
         
+        # Métricas
+        processing_timing = results["timings"].get("excel_processing", {})
+        record_processing(results["processing_stats"], processing_timing.get("wall_seconds"))
+        record_run("pipeline", results["success"])
+        if args.metrics_file:
+            REGISTRY.write_textfile(args.metrics_file)
+        if args.metrics_port:
+            logger.info("📈 Servindo métricas; Ctrl+C para encerrar")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                REGISTRY.stop()
+        
         # Retornar código de saída
         return 0 if results["success"] else 1
         
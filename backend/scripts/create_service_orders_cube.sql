@@ -0,0 +1,142 @@
+-- Cubo pré-agregado de service_orders (ano x mês x status x fabricante x modelo)
+-- Execute este script no banco Supabase antes de usar complete_pipeline.py;
+-- relatórios leem este cubo (centenas de linhas) em vez da tabela inteira.
+-- Uploads incrementais aplicam deltas; cube_maintenance.py confere deriva e recalcula.
+
+CREATE TABLE IF NOT EXISTS service_orders_cube (
+    order_year INTEGER NOT NULL,
+    order_month INTEGER NOT NULL,
+    order_status TEXT NOT NULL,
+    engine_manufacturer TEXT NOT NULL DEFAULT '',
+    vehicle_model TEXT NOT NULL DEFAULT '',
+    order_count INTEGER NOT NULL,
+    parts_total NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    labor_total NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    grand_total NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (order_year, order_month, order_status, engine_manufacturer, vehicle_model)
+);
+
+COMMENT ON TABLE service_orders_cube IS 'Contagem e somas de service_orders por ano, mês, status, fabricante e modelo (fabricante/modelo ausentes = texto vazio)';
+
+-- Substituir o cubo pelo calculado no pipeline Python (numa única transação)
+CREATE OR REPLACE FUNCTION replace_service_orders_cube(p_rows JSONB)
+RETURNS JSONB AS $$
+DECLARE
+  v_deleted INTEGER;
+  v_inserted INTEGER;
+BEGIN
+  -- WHERE true: o pg_safeupdate do Supabase rejeita DELETE sem WHERE vindo da API (rpc)
+  DELETE FROM service_orders_cube WHERE true;
+  GET DIAGNOSTICS v_deleted = ROW_COUNT;
+
+  INSERT INTO service_orders_cube (
+    order_year, order_month, order_status, engine_manufacturer, vehicle_model,
+    order_count, parts_total, labor_total, grand_total
+  )
+  SELECT order_year, order_month, order_status, engine_manufacturer, vehicle_model,
+         order_count, parts_total, labor_total, grand_total
+  FROM jsonb_to_recordset(p_rows) AS r (
+    order_year INTEGER, order_month INTEGER, order_status TEXT, engine_manufacturer TEXT,
+    vehicle_model TEXT, order_count INTEGER, parts_total NUMERIC, labor_total NUMERIC, grand_total NUMERIC
+  );
+  GET DIAGNOSTICS v_inserted = ROW_COUNT;
+
+  RETURN jsonb_build_object('deleted_count', v_deleted, 'inserted_count', v_inserted);
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION replace_service_orders_cube IS 'Troca o conteúdo do cubo pelas linhas enviadas (JSON) numa única transação';
+
+-- Agregação de referência, direto de service_orders (usada na recarga e na checagem de deriva)
+CREATE OR REPLACE VIEW service_orders_cube_source AS
+SELECT
+  EXTRACT(YEAR FROM order_date)::INTEGER AS order_year,
+  EXTRACT(MONTH FROM order_date)::INTEGER AS order_month,
+  TRIM(order_status::TEXT) AS order_status,
+  COALESCE(TRIM(engine_manufacturer), '') AS engine_manufacturer,
+  COALESCE(TRIM(vehicle_model), '') AS vehicle_model,
+  COUNT(*)::INTEGER AS order_count,
+  ROUND(COALESCE(SUM(parts_total), 0)::NUMERIC, 2) AS parts_total,
+  ROUND(COALESCE(SUM(labor_total), 0)::NUMERIC, 2) AS labor_total,
+  ROUND(COALESCE(SUM(grand_total), 0)::NUMERIC, 2) AS grand_total
+FROM service_orders
+WHERE order_date IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5;
+
+-- Recalcular o cubo a partir de service_orders (recarga completa periódica)
+CREATE OR REPLACE FUNCTION refresh_service_orders_cube()
+RETURNS JSONB AS $$
+DECLARE
+  v_rows JSONB;
+BEGIN
+  SELECT COALESCE(jsonb_agg(c), '[]'::jsonb) INTO v_rows FROM service_orders_cube_source c;
+  RETURN replace_service_orders_cube(v_rows);
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION refresh_service_orders_cube IS 'Recalcula service_orders_cube a partir de service_orders';
+
+-- Aplicar deltas (+ inseridos, - removidos; atualização = remoção + inserção)
+-- sem recalcular o cubo inteiro. Células que ficam sem OS são apagadas.
+CREATE OR REPLACE FUNCTION apply_service_orders_cube_delta(p_rows JSONB)
+RETURNS JSONB AS $$
+DECLARE
+  v_cells INTEGER;
+  v_emptied INTEGER;
+BEGIN
+  INSERT INTO service_orders_cube AS cube (
+    order_year, order_month, order_status, engine_manufacturer, vehicle_model,
+    order_count, parts_total, labor_total, grand_total
+  )
+  SELECT order_year, order_month, order_status, engine_manufacturer, vehicle_model,
+         order_count, parts_total, labor_total, grand_total
+  FROM jsonb_to_recordset(p_rows) AS r (
+    order_year INTEGER, order_month INTEGER, order_status TEXT, engine_manufacturer TEXT,
+    vehicle_model TEXT, order_count INTEGER, parts_total NUMERIC, labor_total NUMERIC, grand_total NUMERIC
+  )
+  ON CONFLICT (order_year, order_month, order_status, engine_manufacturer, vehicle_model) DO UPDATE SET
+    order_count = cube.order_count + EXCLUDED.order_count,
+    parts_total = cube.parts_total + EXCLUDED.parts_total,
+    labor_total = cube.labor_total + EXCLUDED.labor_total,
+    grand_total = cube.grand_total + EXCLUDED.grand_total,
+    refreshed_at = NOW();
+  GET DIAGNOSTICS v_cells = ROW_COUNT;
+
+  DELETE FROM service_orders_cube WHERE order_count <= 0;
+  GET DIAGNOSTICS v_emptied = ROW_COUNT;
+
+  RETURN jsonb_build_object('cells_updated', v_cells, 'cells_removed', v_emptied);
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION apply_service_orders_cube_delta IS 'Soma deltas por célula ao cubo (manutenção incremental)';
+
+-- Células em que o cubo persistido diverge da agregação completa.
+-- Somas toleram p_tolerance (deltas são arredondados a 2 casas por célula).
+CREATE OR REPLACE FUNCTION service_orders_cube_drift(p_tolerance NUMERIC DEFAULT 0.05)
+RETURNS TABLE (
+    order_year INTEGER,
+    order_month INTEGER,
+    order_status TEXT,
+    engine_manufacturer TEXT,
+    vehicle_model TEXT,
+    cube_count INTEGER,
+    actual_count INTEGER,
+    cube_grand_total NUMERIC,
+    actual_grand_total NUMERIC
+) AS $$
+  SELECT
+    order_year, order_month, order_status, engine_manufacturer, vehicle_model,
+    c.order_count, s.order_count, c.grand_total, s.grand_total
+  FROM service_orders_cube c
+  FULL OUTER JOIN service_orders_cube_source s
+    USING (order_year, order_month, order_status, engine_manufacturer, vehicle_model)
+  WHERE c.order_count IS DISTINCT FROM s.order_count
+     OR ABS(COALESCE(c.parts_total, 0) - COALESCE(s.parts_total, 0)) > p_tolerance
+     OR ABS(COALESCE(c.labor_total, 0) - COALESCE(s.labor_total, 0)) > p_tolerance
+     OR ABS(COALESCE(c.grand_total, 0) - COALESCE(s.grand_total, 0)) > p_tolerance
+  ORDER BY 1, 2, 3, 4, 5;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION service_orders_cube_drift IS 'Compara service_orders_cube com a agregação completa de service_orders';
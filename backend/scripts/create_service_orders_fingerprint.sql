@@ -0,0 +1,29 @@
+-- Impressão digital agregada de service_orders para verificação de upload
+-- Execute este script no banco Supabase antes de usar complete_pipeline.py --verify-mode fingerprint
+
+-- Uma linha por ano x status com contagem, somas e hash dos order_numbers.
+-- O hash usa COLLATE "C" para que a ordenação seja a mesma do Python (ordem de bytes UTF-8).
+CREATE OR REPLACE FUNCTION service_orders_fingerprint()
+RETURNS TABLE (
+    order_year INTEGER,
+    order_status TEXT,
+    record_count BIGINT,
+    parts_total NUMERIC,
+    labor_total NUMERIC,
+    grand_total NUMERIC,
+    order_numbers_hash TEXT
+) AS $$
+  SELECT
+    EXTRACT(YEAR FROM so.order_date)::INTEGER AS order_year,
+    so.order_status::TEXT,
+    COUNT(*) AS record_count,
+    ROUND(COALESCE(SUM(so.parts_total), 0)::NUMERIC, 2) AS parts_total,
+    ROUND(COALESCE(SUM(so.labor_total), 0)::NUMERIC, 2) AS labor_total,
+    ROUND(COALESCE(SUM(so.grand_total), 0)::NUMERIC, 2) AS grand_total,
+    MD5(STRING_AGG(so.order_number::TEXT, E'\n' ORDER BY so.order_number::TEXT COLLATE "C")) AS order_numbers_hash
+  FROM service_orders so
+  GROUP BY 1, 2
+  ORDER BY 1, 2;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION service_orders_fingerprint IS 'Contagem, somas e hash dos order_numbers por ano e status (verificação de upload)';
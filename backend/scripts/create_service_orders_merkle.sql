@@ -0,0 +1,81 @@
+-- Hashes por linha e por partição (ano > mês > dia) de service_orders
+-- Execute este script no banco Supabase antes de usar merkle_diff.py
+
+-- Hash do conteúdo de cada linha. O texto canônico precisa ser idêntico ao
+-- montado por merkle_diff.row_content() no Python.
+CREATE OR REPLACE VIEW service_orders_row_hashes AS
+SELECT
+    so.id,
+    so.order_number::TEXT AS order_number,
+    so.order_date::DATE AS order_day,
+    MD5(CONCAT_WS('|',
+        so.order_number::TEXT,
+        TO_CHAR(so.order_date, 'YYYY-MM-DD'),
+        so.order_status::TEXT,
+        COALESCE(so.engine_manufacturer::TEXT, ''),
+        COALESCE(so.engine_description::TEXT, ''),
+        COALESCE(so.vehicle_model::TEXT, ''),
+        COALESCE(so.raw_defect_description::TEXT, ''),
+        COALESCE(so.responsible_mechanic::TEXT, ''),
+        ROUND(COALESCE(so.parts_total, 0)::NUMERIC, 2)::TEXT,
+        ROUND(COALESCE(so.labor_total, 0)::NUMERIC, 2)::TEXT,
+        ROUND(COALESCE(so.grand_total, 0)::NUMERIC, 2)::TEXT
+    )) AS row_hash
+FROM service_orders so
+WHERE so.order_date IS NOT NULL;
+
+COMMENT ON VIEW service_orders_row_hashes IS 'Hash do conteúdo de cada ordem de serviço (diff por árvore de hashes)';
+
+-- Hashes de um nível da árvore:
+--   sem parâmetros      -> um hash por ano
+--   p_year              -> um hash por mês do ano
+--   p_year + p_month    -> um hash por dia do mês
+CREATE OR REPLACE FUNCTION service_orders_partition_hashes(
+    p_year INTEGER DEFAULT NULL,
+    p_month INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    partition_key TEXT,
+    record_count BIGINT,
+    partition_hash TEXT
+) AS $$
+  WITH filtered AS (
+    SELECT order_day, row_hash
+    FROM service_orders_row_hashes
+    WHERE p_year IS NULL
+       OR (order_day >= MAKE_DATE(p_year, COALESCE(p_month, 1), 1)
+           AND order_day < MAKE_DATE(p_year, COALESCE(p_month, 1), 1)
+                           + CASE WHEN p_month IS NULL THEN INTERVAL '1 year' ELSE INTERVAL '1 month' END)
+  ),
+  days AS (
+    SELECT TO_CHAR(order_day, 'YYYY-MM-DD') AS day_key,
+           COUNT(*) AS n,
+           MD5(STRING_AGG(row_hash, E'\n' ORDER BY row_hash COLLATE "C")) AS h
+    FROM filtered
+    GROUP BY 1
+  ),
+  months AS (
+    SELECT LEFT(day_key, 7) AS month_key,
+           SUM(n)::BIGINT AS n,
+           MD5(STRING_AGG(day_key || ':' || h, E'\n' ORDER BY day_key COLLATE "C")) AS h
+    FROM days
+    GROUP BY 1
+  ),
+  years AS (
+    SELECT LEFT(month_key, 4) AS year_key,
+           SUM(n)::BIGINT AS n,
+           MD5(STRING_AGG(month_key || ':' || h, E'\n' ORDER BY month_key COLLATE "C")) AS h
+    FROM months
+    GROUP BY 1
+  )
+  SELECT year_key, n, h FROM years WHERE p_year IS NULL
+  UNION ALL
+  SELECT month_key, n, h FROM months WHERE p_year IS NOT NULL AND p_month IS NULL
+  UNION ALL
+  SELECT day_key, n, h FROM days WHERE p_year IS NOT NULL AND p_month IS NOT NULL
+  ORDER BY 1;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION service_orders_partition_hashes IS 'Hashes por ano, mês ou dia de service_orders (diff por árvore de hashes)';
+
+CREATE INDEX IF NOT EXISTS idx_service_orders_order_date ON service_orders (order_date);
@@ -0,0 +1,76 @@
+-- Tabela de staging e troca atômica para recarga completa de service_orders
+-- Execute este script no banco Supabase antes de usar complete_pipeline.py --reload-mode swap
+
+-- Tabela de staging com a mesma estrutura de service_orders
+CREATE TABLE IF NOT EXISTS service_orders_staging (LIKE service_orders INCLUDING DEFAULTS);
+
+COMMENT ON TABLE service_orders_staging IS 'Área de carga para recarga completa; o conteúdo só vai para service_orders após conferência';
+
+-- Conferir a staging e trocar o conteúdo de service_orders numa única transação.
+-- Leitores continuam vendo os dados antigos até o COMMIT; se a conferência
+-- falhar, nada é alterado em service_orders.
+CREATE OR REPLACE FUNCTION swap_service_orders_from_staging(
+    p_expected_count INTEGER,
+    p_expected_parts_total NUMERIC,
+    p_expected_labor_total NUMERIC,
+    p_expected_grand_total NUMERIC,
+    p_tolerance NUMERIC DEFAULT 0.05
+)
+RETURNS JSONB AS $$
+DECLARE
+  v_count INTEGER;
+  v_parts_total NUMERIC;
+  v_labor_total NUMERIC;
+  v_grand_total NUMERIC;
+  v_deleted INTEGER;
+BEGIN
+  SELECT COUNT(*),
+         COALESCE(SUM(parts_total), 0),
+         COALESCE(SUM(labor_total), 0),
+         COALESCE(SUM(grand_total), 0)
+    INTO v_count, v_parts_total, v_labor_total, v_grand_total
+    FROM service_orders_staging;
+
+  IF v_count <> p_expected_count THEN
+    RAISE EXCEPTION 'Staging com % registros, esperado %', v_count, p_expected_count;
+  END IF;
+
+  IF ABS(v_parts_total - p_expected_parts_total) > p_tolerance
+     OR ABS(v_labor_total - p_expected_labor_total) > p_tolerance
+     OR ABS(v_grand_total - p_expected_grand_total) > p_tolerance THEN
+    RAISE EXCEPTION 'Somas da staging divergentes: peças % (esperado %), mão de obra % (esperado %), total % (esperado %)',
+      v_parts_total, p_expected_parts_total, v_labor_total, p_expected_labor_total,
+      v_grand_total, p_expected_grand_total;
+  END IF;
+
+  -- Bloqueia escritas concorrentes, mas não leituras
+  LOCK TABLE service_orders IN SHARE ROW EXCLUSIVE MODE;
+
+  -- WHERE true: o pg_safeupdate do Supabase rejeita DELETE sem WHERE vindo da API (rpc)
+  DELETE FROM service_orders WHERE true;
+  GET DIAGNOSTICS v_deleted = ROW_COUNT;
+
+  INSERT INTO service_orders (
+    order_number, order_date, order_status, engine_manufacturer, engine_description,
+    vehicle_model, raw_defect_description, responsible_mechanic, parts_total,
+    labor_total, grand_total, original_parts_value, calculation_verified
+  )
+  SELECT
+    order_number, order_date, order_status, engine_manufacturer, engine_description,
+    vehicle_model, raw_defect_description, responsible_mechanic, parts_total,
+    labor_total, grand_total, original_parts_value, calculation_verified
+  FROM service_orders_staging;
+
+  DELETE FROM service_orders_staging WHERE true;
+
+  RETURN jsonb_build_object(
+    'swapped_count', v_count,
+    'deleted_count', v_deleted,
+    'parts_total', v_parts_total,
+    'labor_total', v_labor_total,
+    'grand_total', v_grand_total
+  );
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION swap_service_orders_from_staging IS 'Confere contagem e somas da staging e substitui service_orders numa única transação';
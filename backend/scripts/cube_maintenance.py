@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Manutenção periódica do cubo service_orders_cube
+
+Uploads incrementais só aplicam deltas ao cubo; esta rotina (para agendar, ex.
+diariamente) compara o cubo persistido com a agregação completa de
+service_orders e, com --rebuild, recalcula o cubo.
+
+Código de saída: 0 sem deriva, 1 com deriva (mesmo se corrigida com --rebuild),
+2 em caso de erro.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+import logging
+
+# Módulos compartilhados com o processador definitivo (backend/python)
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'python'))
+
+from log_setup import setup_logging
+from supabase_uploader import SupabaseUploader
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Conferir deriva do cubo de service_orders e recalcular')
+    parser.add_argument('--env', help='Caminho para arquivo .env')
+    parser.add_argument('--rebuild', action='store_true', help='Recalcular o cubo se houver deriva')
+    parser.add_argument('--force', action='store_true', help='Com --rebuild, recalcular mesmo sem deriva')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='Tolerância das somas por célula')
+    parser.add_argument('--output', '-o', help='Gravar as células divergentes em JSON')
+    args = parser.parse_args()
+
+    setup_logging('cube_maintenance.log')
+
+    try:
+        uploader = SupabaseUploader(args.env)
+        drift = uploader.get_cube_drift(args.tolerance)
+    except Exception as e:
+        logger.error(f"❌ Erro ao conferir o cubo: {e}")
+        return 2
+
+    if drift:
+        logger.warning(f"⚠️ Cubo divergente em {len(drift)} células:")
+        for cell in drift[:20]:
+            logger.warning(f"   {cell['order_year']}-{cell['order_month']:02d} {cell['order_status']} "
+                           f"{cell['engine_manufacturer'] or '-'} / {cell['vehicle_model'] or '-'}: "
+                           f"cubo {cell['cube_count']} OS, real {cell['actual_count']} OS")
+        if len(drift) > 20:
+            logger.warning(f"   ... e mais {len(drift) - 20}")
+    else:
+        logger.info("✅ Cubo confere com service_orders")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(drift, f, indent=2, ensure_ascii=False, default=str)
+
+    if args.rebuild and (drift or args.force):
+        try:
+            result = uploader.refresh_cube()
+        except Exception as e:
+            logger.error(f"❌ Erro ao recalcular o cubo: {e}")
+            return 2
+        logger.info(f"🔄 Cubo recalculado: {result}")
+
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Impressão digital agregada dos dados de service_orders
+
+Calcula, por ano x status, a contagem, as somas de parts_total, labor_total e
+grand_total e um hash MD5 dos order_numbers ordenados. O mesmo cálculo roda no
+banco pela função service_orders_fingerprint (create_service_orders_fingerprint.sql),
+então comparar os dois lados detecta datas, status e valores errados sem baixar
+a tabela.
+"""
+
+import hashlib
+from typing import Dict, List
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SUM_FIELDS = ('parts_total', 'labor_total', 'grand_total')
+
+# Tolerância para as somas (erro de ponto flutuante entre as duas somas)
+SUM_TOLERANCE = 0.05
+
+
+def partition_key(year, status) -> str:
+    """Chave da partição ano|status"""
+    year_label = 'sem_data' if year is None or pd.isna(year) else str(int(year))
+    return f"{year_label}|{status}"
+
+
+def order_numbers_hash(order_numbers: List[str]) -> str:
+    """MD5 dos order_numbers ordenados e unidos por quebra de linha"""
+    joined = '\n'.join(sorted(order_numbers))
+    return hashlib.md5(joined.encode('utf-8')).hexdigest()
+
+
+def dataframe_fingerprint(df: pd.DataFrame) -> Dict[str, Dict]:
+    """Impressão digital de um DataFrame processado"""
+    work = pd.DataFrame({
+        'year': pd.to_datetime(df['order_date']).dt.year,
+        'status': df['order_status'].astype(str).str.strip(),
+        'order_number': df['order_number'].astype(str).str.strip(),
+    })
+    for field in SUM_FIELDS:
+        values = df[field] if field in df.columns else 0.0
+        # Valores como gravados: o banco soma sem arredondar e só arredonda o total
+        work[field] = pd.to_numeric(values, errors='coerce').fillna(0.0)
+
+    fingerprint = {}
+    for (year, status), group in work.groupby(['year', 'status'], dropna=False):
+        fingerprint[partition_key(year, status)] = {
+            'record_count': int(len(group)),
+            'parts_total': round(float(group['parts_total'].sum()), 2),
+            'labor_total': round(float(group['labor_total'].sum()), 2),
+            'grand_total': round(float(group['grand_total'].sum()), 2),
+            'order_numbers_hash': order_numbers_hash(group['order_number'].tolist()),
+        }
+    return fingerprint
+
+
+def database_fingerprint(rows: List[Dict]) -> Dict[str, Dict]:
+    """Impressão digital a partir do retorno de service_orders_fingerprint()"""
+    fingerprint = {}
+    for row in rows:
+        fingerprint[partition_key(row.get('order_year'), row.get('order_status'))] = {
+            'record_count': int(row.get('record_count') or 0),
+            'parts_total': round(float(row.get('parts_total') or 0), 2),
+            'labor_total': round(float(row.get('labor_total') or 0), 2),
+            'grand_total': round(float(row.get('grand_total') or 0), 2),
+            'order_numbers_hash': row.get('order_numbers_hash'),
+        }
+    return fingerprint
+
+
+def compare_fingerprints(expected: Dict[str, Dict], actual: Dict[str, Dict]) -> List[Dict]:
+    """Listar partições divergentes entre os dados de origem e o banco"""
+    mismatches = []
+
+    for key in sorted(set(expected) | set(actual)):
+        exp = expected.get(key)
+        act = actual.get(key)
+
+        if exp is None or act is None:
+            mismatches.append({
+                'partition': key,
+                'reason': 'missing_in_database' if act is None else 'unexpected_in_database',
+                'expected': exp,
+                'actual': act,
+            })
+            continue
+
+        differences = []
+        if exp['record_count'] != act['record_count']:
+            differences.append('record_count')
+        for field in SUM_FIELDS:
+            if abs(exp[field] - act[field]) > SUM_TOLERANCE:
+                differences.append(field)
+        if exp['order_numbers_hash'] != act['order_numbers_hash']:
+            differences.append('order_numbers_hash')
+
+        if differences:
+            mismatches.append({
+                'partition': key,
+                'reason': 'different_values',
+                'fields': differences,
+                'expected': exp,
+                'actual': act,
+            })
+
+    return mismatches
@@ -0,0 +1,195 @@
+"""
+Agrupamento de descrições de defeito quase iguais (MinHash + LSH)
+
+A mesma falha aparece digitada de dezenas de formas ("vazamento oleo cabecote",
+"vazam. de óleo no cabeçote"...). Comparar todos os pares é quadrático; aqui:
+1. cada texto normalizado vira um conjunto de shingles de caracteres (k-gramas)
+2. uma assinatura MinHash (num_perm valores) estima a similaridade de Jaccard
+3. a assinatura é dividida em bandas; textos com alguma banda igual caem no
+   mesmo balde (LSH) e viram candidatos
+4. candidatos com similaridade estimada >= threshold são unidos (union-find)
+
+Textos idênticos após a normalização são processados uma vez só, então o custo
+cresce com o número de descrições distintas, em tempo aproximadamente linear.
+
+Uso:
+    python defect_clusters.py planilha.xlsx --output-prefix defeitos
+        grava defeitos_clusters.csv (cluster por OS) e defeitos_cluster_sizes.csv
+        (tamanho de cada cluster por ano)
+"""
+
+import argparse
+import re
+import sys
+import zlib
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List
+import logging
+
+import numpy as np
+import pandas as pd
+
+from defect_index import fold_accents
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 4
+NUM_PERM = 64
+BANDS = 16          # 16 bandas x 4 linhas: pares com Jaccard ~0,5 já têm boa chance de colidir
+THRESHOLD = 0.5     # similaridade estimada mínima para unir dois textos
+
+# Primo acima de 2^32: (a * x + b) cabe em uint64 para x, a < 2^32
+_MERSENNE_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(2 ** 32 - 1)
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_description(text) -> str:
+    """Minúsculas, sem acentos e só letras/números separados por um espaço"""
+    if text is None or (isinstance(text, float) and pd.isna(text)):
+        return ''
+    return _NON_ALNUM_RE.sub(' ', fold_accents(str(text))).strip()
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Hashes (32 bits) dos k-gramas de caracteres do texto normalizado"""
+    if len(text) <= size:
+        grams = {text}
+    else:
+        grams = {text[i:i + size] for i in range(len(text) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHashLSH:
+    """Assinaturas MinHash e baldes LSH"""
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, threshold: float = THRESHOLD, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm deve ser múltiplo de bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2 ** 32 - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 2 ** 32 - 1, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_hashes: np.ndarray) -> np.ndarray:
+        """Mínimo de cada permutação (a*x + b) mod p sobre os shingles"""
+        hashed = (np.outer(shingle_hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return np.minimum(hashed, _MAX_HASH).min(axis=0)
+
+    def cluster(self, texts: List[str]) -> np.ndarray:
+        """Rótulo de cluster (índice do representante) para cada texto distinto"""
+        n = len(texts)
+        signatures = np.empty((n, self.num_perm), dtype=np.uint64)
+        for i, text in enumerate(texts):
+            signatures[i] = self.signature(shingles(text))
+
+        parent = np.arange(n)
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for band in range(self.bands):
+            band_slice = signatures[:, band * self.rows:(band + 1) * self.rows]
+            buckets: Dict[bytes, int] = {}
+            for i in range(n):
+                key = band_slice[i].tobytes()
+                first = buckets.setdefault(key, i)
+                if first == i:
+                    continue
+                root_i, root_first = find(i), find(first)
+                if root_i == root_first:
+                    continue
+                # Confirma pela similaridade estimada (descarta colisões fracas)
+                if np.mean(signatures[i] == signatures[first]) >= self.threshold:
+                    parent[root_i] = root_first
+
+        return np.array([find(i) for i in range(n)])
+
+
+def cluster_defects(df: pd.DataFrame, lsh: MinHashLSH = None) -> pd.DataFrame:
+    """Cluster de cada OS: order_number, year, cluster_id, cluster_size, representative
+
+    OS sem descrição ficam com cluster_id -1. Os ids são atribuídos por tamanho
+    do cluster (0 = maior); representative é a grafia mais frequente.
+    """
+    lsh = lsh or MinHashLSH()
+    column = 'raw_defect_description' if 'raw_defect_description' in df.columns else 'defect_description'
+    normalized = df[column].map(normalize_description)
+
+    distinct = [text for text in normalized.unique() if text]
+    logger.info(f"🧬 {len(distinct)} descrições distintas em {len(df)} OS")
+    labels = lsh.cluster(distinct) if distinct else np.array([], dtype=int)
+    root_of = dict(zip(distinct, labels))
+
+    roots = normalized.map(lambda text: root_of.get(text, -1))
+    sizes = roots[roots >= 0].value_counts()
+    # ids estáveis dentro da execução: maior cluster primeiro, empate pelo representante
+    ordered_roots = sorted(sizes.index, key=lambda root: (-sizes[root], distinct[root]))
+    cluster_id_of = {root: cluster_id for cluster_id, root in enumerate(ordered_roots)}
+
+    representatives: Dict[int, Counter] = defaultdict(Counter)
+    for root, original in zip(roots, df[column]):
+        if root >= 0:
+            representatives[root][str(original).strip()] += 1
+
+    result = pd.DataFrame({
+        'order_number': df['order_number'].astype(str).values,
+        'year': pd.to_datetime(df['order_date']).dt.year.values if 'order_date' in df.columns else None,
+        'cluster_id': roots.map(lambda root: cluster_id_of.get(root, -1)).values,
+    })
+    result['cluster_size'] = roots.map(lambda root: int(sizes.get(root, 0))).values
+    result['representative'] = roots.map(
+        lambda root: representatives[root].most_common(1)[0][0] if root >= 0 else ''
+    ).values
+    return result
+
+
+def cluster_sizes_by_year(clusters: pd.DataFrame) -> pd.DataFrame:
+    """Tamanho de cada cluster por ano (cluster_id, representative, year, order_count)"""
+    clustered = clusters[clusters['cluster_id'] >= 0]
+    return (clustered.groupby(['cluster_id', 'representative', 'year'], sort=True)
+            .size().rename('order_count').reset_index())
+
+
+def main():
+    sys.path.append(str(Path(__file__).resolve().parent.parent / 'python'))
+    from log_setup import setup_logging
+
+    parser = argparse.ArgumentParser(description='Agrupar descrições de defeito quase iguais (MinHash LSH)')
+    parser.add_argument('file', help='Planilha Excel ou CSV de backup processado')
+    parser.add_argument('--output-prefix', default='defect', help='Prefixo dos arquivos CSV de saída')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='Similaridade mínima (0-1)')
+    parser.add_argument('--top', type=int, default=15, help='Clusters exibidos no resumo')
+    args = parser.parse_args()
+
+    setup_logging()
+
+    if args.file.lower().endswith('.csv'):
+        df = pd.read_csv(args.file, dtype={'order_number': str})
+    else:
+        from excel_processor import ExcelProcessor
+        df, _ = ExcelProcessor().process_excel_file(args.file)
+
+    clusters = cluster_defects(df, MinHashLSH(threshold=args.threshold))
+    sizes = cluster_sizes_by_year(clusters)
+    clusters.to_csv(f"{args.output_prefix}_clusters.csv", index=False, encoding='utf-8')
+    sizes.to_csv(f"{args.output_prefix}_cluster_sizes.csv", index=False, encoding='utf-8')
+
+    top = (clusters[clusters['cluster_id'] >= 0].drop_duplicates('cluster_id')
+           .sort_values('cluster_id').head(args.top))
+    logger.info(f"📊 {clusters['cluster_id'].max() + 1} clusters; maiores:")
+    for row in top.itertuples():
+        logger.info(f"   #{row.cluster_id} ({row.cluster_size} OS): {row.representative[:80]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
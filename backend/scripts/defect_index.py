@@ -0,0 +1,263 @@
+"""
+Índice invertido das descrições de defeito (raw_defect_description / ObsCorpo_OSv)
+
+Cada descrição é normalizada (minúsculas, sem acentos), quebrada em termos e
+sem stopwords do português; o índice guarda termo -> order_numbers numa tabela
+SQLite com chave (termo, order_number). Consultas por palavra ou prefixo leem
+só as faixas de termos envolvidas, então o tempo não depende do tamanho da
+tabela de OS.
+
+Atualização incremental: cada upload reenvia as descrições e só as OS cujo texto
+mudou (hash) têm os termos regravados.
+
+Uso:
+    python defect_index.py build planilha.xlsx
+    python defect_index.py search "vazamento cabec"      (último termo como prefixo)
+    python defect_index.py search "junta bomba" --any
+"""
+
+import argparse
+import hashlib
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = 'defect_index.db'
+
+MIN_TERM_LENGTH = 2
+
+# Stopwords do português (já sem acento, como ficam após a normalização)
+STOPWORDS = frozenset("""
+a o as os um uma uns umas de da do das dos em na no nas nos num numa e ou
+que se com sem por para pra pelo pela pelos pelas ao aos la lo sua seu
+suas seus foi ser esta este isso isto ja nao mais muito muita entre sobre
+apos ate desde como quando onde tambem
+""".split())
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def fold_accents(text: str) -> str:
+    """Minúsculas e sem acentos ('Cabeçote' -> 'cabecote')"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Termos indexáveis de um texto, na ordem em que aparecem (sem repetição)"""
+    if not text or (isinstance(text, float) and pd.isna(text)):
+        return []
+    seen = {}
+    for term in _TOKEN_RE.findall(fold_accents(str(text))):
+        if len(term) >= MIN_TERM_LENGTH and term not in STOPWORDS:
+            seen.setdefault(term, None)
+    return list(seen)
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class DefectIndex:
+    """Índice invertido persistido em SQLite"""
+
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH):
+        self.index_path = index_path
+        self.conn = sqlite3.connect(index_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS defect_documents (
+                    order_number TEXT PRIMARY KEY,
+                    text_hash TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS defect_postings (
+                    term TEXT NOT NULL,
+                    order_number TEXT NOT NULL,
+                    PRIMARY KEY (term, order_number)
+                ) WITHOUT ROWID
+            """)
+            # Para remover os termos antigos de uma OS
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_defect_postings_order ON defect_postings(order_number)"
+            )
+
+    # --- atualização ----------------------------------------------------------
+
+    def update(self, documents: Iterable[Tuple[str, Optional[str]]]) -> Dict[str, int]:
+        """Indexar pares (order_number, descrição); só OS com texto novo ou alterado"""
+        stats = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        with self.conn:
+            for order_number, text in documents:
+                order_number = str(order_number).strip()
+                terms = tokenize(text)
+                if not terms:
+                    stats['removed'] += self._remove(order_number)
+                    continue
+                digest = _text_hash(' '.join(terms))
+                row = self.conn.execute(
+                    "SELECT text_hash FROM defect_documents WHERE order_number = ?", (order_number,)
+                ).fetchone()
+                if row is not None and row[0] == digest:
+                    stats['unchanged'] += 1
+                    continue
+                if row is not None:
+                    self.conn.execute("DELETE FROM defect_postings WHERE order_number = ?", (order_number,))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO defect_documents (order_number, text_hash) VALUES (?, ?)",
+                    (order_number, digest)
+                )
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO defect_postings (term, order_number) VALUES (?, ?)",
+                    [(term, order_number) for term in terms]
+                )
+                stats['indexed'] += 1
+        return stats
+
+    def update_dataframe(self, df: pd.DataFrame, replace: bool = False) -> Dict[str, int]:
+        """Indexar um DataFrame processado (replace=True: recarga completa da tabela)"""
+        if replace:
+            self.clear()
+        column = 'raw_defect_description' if 'raw_defect_description' in df.columns else 'defect_description'
+        if column not in df.columns:
+            logger.warning("⚠️ DataFrame sem descrição de defeito: índice não atualizado")
+            return {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        stats = self.update(zip(df['order_number'].astype(str), df[column]))
+        logger.info(f"🔎 Índice de defeitos: {stats['indexed']} OS indexadas, "
+                    f"{stats['unchanged']} sem alteração, {stats['removed']} removidas")
+        return stats
+
+    def remove(self, order_numbers: Iterable[str]) -> int:
+        """Remover OS do índice"""
+        with self.conn:
+            return sum(self._remove(str(n).strip()) for n in order_numbers)
+
+    def _remove(self, order_number: str) -> int:
+        self.conn.execute("DELETE FROM defect_postings WHERE order_number = ?", (order_number,))
+        return self.conn.execute("DELETE FROM defect_documents WHERE order_number = ?", (order_number,)).rowcount
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM defect_postings")
+            self.conn.execute("DELETE FROM defect_documents")
+
+    # --- consulta -------------------------------------------------------------
+
+    def _matching(self, term: str, prefix: bool) -> Set[str]:
+        if prefix:
+            # Faixa [termo, termo + maior caractere) na chave primária
+            rows = self.conn.execute(
+                "SELECT DISTINCT order_number FROM defect_postings WHERE term >= ? AND term < ?",
+                (term, term + '\uffff')
+            )
+        else:
+            rows = self.conn.execute("SELECT order_number FROM defect_postings WHERE term = ?", (term,))
+        return {row[0] for row in rows}
+
+    def search(self, query: str, match_all: bool = True, prefix_last: bool = True,
+               limit: Optional[int] = None) -> List[str]:
+        """order_numbers cujas descrições contêm os termos da consulta
+
+        match_all: todos os termos (E) ou qualquer um (OU)
+        prefix_last: o último termo casa como prefixo (busca enquanto se digita)
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        match_sets = [self._matching(term, prefix_last and i == len(terms) - 1) for i, term in enumerate(terms)]
+        if match_all:
+            # Conjuntos menores primeiro: a interseção encolhe mais cedo
+            match_sets.sort(key=len)
+            result = set(match_sets[0])
+            for matches in match_sets[1:]:
+                result &= matches
+        else:
+            result = set().union(*match_sets)
+
+        ordered = sorted(result)
+        return ordered[:limit] if limit else ordered
+
+    def prefix_terms(self, prefix: str, limit: int = 20) -> List[Tuple[str, int]]:
+        """Termos que começam com o prefixo e quantas OS têm cada um (autocompletar)"""
+        folded = fold_accents(prefix).strip()
+        rows = self.conn.execute(
+            "SELECT term, COUNT(*) FROM defect_postings WHERE term >= ? AND term < ? "
+            "GROUP BY term ORDER BY COUNT(*) DESC, term LIMIT ?",
+            (folded, folded + '\uffff', limit)
+        )
+        return [(row[0], row[1]) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        documents = self.conn.execute("SELECT COUNT(*) FROM defect_documents").fetchone()[0]
+        postings = self.conn.execute("SELECT COUNT(*) FROM defect_postings").fetchone()[0]
+        terms = self.conn.execute("SELECT COUNT(DISTINCT term) FROM defect_postings").fetchone()[0]
+        return {'documents': documents, 'terms': terms, 'postings': postings}
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    """Construir ou consultar o índice pela linha de comando"""
+    sys.path.append(str(Path(__file__).resolve().parent.parent / 'python'))
+    from log_setup import setup_logging
+
+    parser = argparse.ArgumentParser(description='Índice invertido das descrições de defeito')
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH, help='Arquivo SQLite do índice')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Indexar uma planilha Excel (ou CSV de backup processado)')
+    build.add_argument('file')
+    build.add_argument('--replace', action='store_true', help='Apagar o índice antes de indexar')
+
+    search = subparsers.add_parser('search', help='Buscar order_numbers por palavras')
+    search.add_argument('query')
+    search.add_argument('--any', action='store_true', help='Qualquer termo (OU) em vez de todos (E)')
+    search.add_argument('--exact', action='store_true', help='Não tratar o último termo como prefixo')
+    search.add_argument('--limit', type=int, default=50)
+
+    subparsers.add_parser('stats', help='Tamanho do índice')
+    args = parser.parse_args()
+
+    setup_logging()
+    index = DefectIndex(args.index)
+    try:
+        if args.command == 'build':
+            if args.file.lower().endswith('.csv'):
+                df = pd.read_csv(args.file, dtype={'order_number': str})
+            else:
+                from excel_processor import ExcelProcessor
+                df, _ = ExcelProcessor().process_excel_file(args.file)
+            index.update_dataframe(df, replace=args.replace)
+            logger.info(f"📊 {index.stats()}")
+        elif args.command == 'search':
+            start = time.perf_counter()
+            results = index.search(args.query, match_all=not args.any, prefix_last=not args.exact)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            for order_number in results[:args.limit]:
+                print(order_number)
+            logger.info(f"🔎 {len(results)} OS em {elapsed_ms:.1f} ms")
+        else:
+            print(index.stats())
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,21 +3,35 @@ import numpy as np
 from datetime import datetime, date
 import os
 import sys
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Dict, List, Tuple, Optional, Any, Iterator
 import logging
+from contextlib import nullcontext
 from pathlib import Path
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('excel_processing.log'),
-        logging.StreamHandler()
-    ]
-)
+# Módulos compartilhados com o processador definitivo (backend/python)
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'python'))
+
+from log_setup import setup_logging
+from name_canonicalizer import CANONICAL_COLUMNS, NameCanonicalizer
+from columnar_io import ProcessedDataWriter
+
 logger = logging.getLogger(__name__)
 
+# Colunas de baixa cardinalidade: ficam como Categorical (códigos inteiros + um
+# único objeto str por valor distinto) até a gravação e o upload
+CATEGORICAL_COLUMNS = (
+    'order_status', 'engine_manufacturer', 'engine_description', 'vehicle_model',
+    'mechanic', 'responsible_mechanic',
+)
+
+
+def categorize_columns(df: pd.DataFrame, columns=CATEGORICAL_COLUMNS) -> pd.DataFrame:
+    """Converter as colunas presentes para Categorical (no lugar)"""
+    for column in columns:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return df
+
 class DateValidator:
     """Validador de datas otimizado para pandas"""
     
@@ -65,9 +79,17 @@ class DateValidator:
 class ExcelProcessor:
     """Processador de Excel otimizado com pandas"""
     
-    def __init__(self):
+    def __init__(self, timer=None, canonicalizer: NameCanonicalizer = None):
         self.valid_statuses = {'G', 'GO', 'GU'}
         self.date_validator = DateValidator()
+        # StageTimer opcional (backend/python/stage_timer.py) para medir as etapas
+        self.timer = timer
+        # Fabricante/motor/modelo canônicos, com mapeamento em cache entre execuções
+        self.canonicalizer = canonicalizer or NameCanonicalizer()
+    
+    def _stage(self, name: str):
+        """Contexto de medição de etapa (sem efeito quando não há timer)"""
+        return self.timer.stage(name) if self.timer is not None else nullcontext()
         
     def load_excel_file(self, file_path: str) -> pd.DataFrame:
         """Carregar arquivo Excel"""
@@ -161,8 +183,10 @@ class ExcelProcessor:
         date_col = column_mapping['order_date']
         logger.info("📅 Processando datas...")
         
-        # Aplicar validação de data
-        df['parsed_date'] = df[date_col].apply(self.date_validator.parse_excel_date)
+        # Aplicar validação de data (datetime64 mesmo quando o bloco fica vazio,
+        # ex. linhas em branco no fim da planilha no modo streaming)
+        df['parsed_date'] = pd.to_datetime(df[date_col].apply(self.date_validator.parse_excel_date),
+                                           errors='coerce')
         
         before_date = len(df)
         df = df.dropna(subset=['parsed_date'])
@@ -175,8 +199,9 @@ class ExcelProcessor:
         stats['year_distribution'] = year_counts.to_dict()
         
         before_year = len(df)
-        valid_years = df['year'].apply(self.date_validator.is_valid_year)
-        df = df[valid_years]
+        if not df.empty:
+            valid_years = df['year'].apply(self.date_validator.is_valid_year).astype(bool)
+            df = df[valid_years]
         stats['removed_by_year_range'] = before_year - len(df)
         logger.info(f"   Após filtro de anos (2019-2025): {len(df)} registros")
         
@@ -252,26 +277,38 @@ class ExcelProcessor:
         result_df['raw_defect_description'] = result_df['defect_description']
         result_df['responsible_mechanic'] = result_df['mechanic']
         
+        categorize_columns(result_df)
+        
         logger.info(f"✅ Transformação concluída: {len(result_df)} registros")
         
         return result_df
     
+    def canonicalize_names(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Fabricante, motor e modelo canônicos (colunas Categorical)"""
+        self.canonicalizer.canonicalize_frame(df, {column: column for column in CANONICAL_COLUMNS})
+        self.canonicalizer.save()
+        return df
+    
     def process_excel_file(self, file_path: str) -> Tuple[pd.DataFrame, Dict]:
         """Processar arquivo Excel completo"""
         logger.info(f"🚀 Iniciando processamento: {file_path}")
         
         try:
             # 1. Carregar arquivo
-            df = self.load_excel_file(file_path)
+            with self._stage('read'):
+                df = self.load_excel_file(file_path)
             
             # 2. Validar colunas
-            column_mapping = self.validate_columns(df)
+            with self._stage('column_validation'):
+                column_mapping = self.validate_columns(df)
             
-            # 3. Limpar e filtrar dados
-            clean_df, stats = self.clean_and_filter_data(df, column_mapping)
+            # 3-4. Limpar, filtrar e transformar dados
+            with self._stage('row_processing'):
+                clean_df, stats = self.clean_and_filter_data(df, column_mapping)
+                final_df = self.transform_data(clean_df, column_mapping)
             
-            # 4. Transformar dados
-            final_df = self.transform_data(clean_df, column_mapping)
+            with self._stage('canonicalization'):
+                final_df = self.canonicalize_names(final_df)
             
             logger.info("✅ Processamento concluído com sucesso!")
             return final_df, stats
@@ -280,20 +317,82 @@ class ExcelProcessor:
             logger.error(f"❌ Erro no processamento: {e}")
             raise
     
-    def save_processed_data(self, df: pd.DataFrame, output_path: str):
-        """Salvar dados processados"""
-        logger.info(f"💾 Salvando dados processados: {output_path}")
+    def iter_excel_chunks(self, file_path: str, chunk_size: int = 5000) -> Iterator[pd.DataFrame]:
+        """Ler a aba 'Tabela' em blocos de linhas, sem carregar a planilha inteira"""
+        from openpyxl import load_workbook
+        
+        logger.info(f"📁 Lendo arquivo em blocos de {chunk_size} linhas: {file_path}")
+        
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
         
-        # Converter datetime para string para CSV
-        df_save = df.copy()
-        if 'order_date' in df_save.columns:
-            df_save['order_date'] = df_save['order_date'].dt.strftime('%Y-%m-%d')
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook['Tabela'].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            
+            columns = [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+            width = len(columns)
+            buffer = []
+            
+            for row in rows:
+                # Em modo read_only as linhas podem vir com largura diferente do cabeçalho
+                buffer.append((tuple(row) + (None,) * width)[:width])
+                if len(buffer) >= chunk_size:
+                    yield pd.DataFrame(buffer, columns=columns)
+                    buffer = []
+            
+            if buffer:
+                yield pd.DataFrame(buffer, columns=columns)
+        finally:
+            workbook.close()
+    
+    def process_excel_chunks(self, file_path: str, chunk_size: int = 5000) -> Iterator[Tuple[pd.DataFrame, Dict]]:
+        """Processar arquivo Excel bloco a bloco (limpeza + transformação por bloco)"""
+        column_mapping = None
+        
+        for chunk in self.iter_excel_chunks(file_path, chunk_size):
+            if column_mapping is None:
+                column_mapping = self.validate_columns(chunk)
             
-        df_save.to_csv(output_path, index=False, encoding='utf-8')
-        logger.info(f"✅ Dados salvos: {len(df_save)} registros")
+            clean_df, stats = self.clean_and_filter_data(chunk, column_mapping)
+            yield self.canonicalize_names(self.transform_data(clean_df, column_mapping)), stats
+    
+    @staticmethod
+    def merge_stats(total: Dict, chunk_stats: Dict) -> Dict:
+        """Somar as estatísticas de um bloco às estatísticas acumuladas"""
+        for key, value in chunk_stats.items():
+            if isinstance(value, dict):
+                merged = total.setdefault(key, {})
+                for item, count in value.items():
+                    merged[item] = merged.get(item, 0) + int(count)
+            else:
+                total[key] = total.get(key, 0) + value
+        return total
+    
+    def save_processed_data(self, df: pd.DataFrame, output_path: str, append: bool = False):
+        """Salvar dados processados (formato pela extensão: .csv, .parquet ou .arrow)
+        
+        append=True acrescenta ao CSV, sem cabeçalho. Para Parquet/Arrow em blocos,
+        use open_processed_writer.
+        """
+        logger.info(f"💾 Salvando dados processados: {output_path}")
+        
+        with ProcessedDataWriter(output_path, append=append) as writer:
+            writer.write(df)
+        logger.info(f"✅ Dados salvos: {len(df)} registros")
+    
+    @staticmethod
+    def open_processed_writer(output_path: str) -> ProcessedDataWriter:
+        """Writer para gravar os blocos do modo streaming num único arquivo"""
+        logger.info(f"💾 Salvando dados processados em blocos: {output_path}")
+        return ProcessedDataWriter(output_path)
 
 def main():
     """Função principal para teste"""
+    setup_logging('excel_processing.log')
     processor = ExcelProcessor()
     
     # Arquivo de teste
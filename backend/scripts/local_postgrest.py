@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""
+Servidor local compatível com o subconjunto do PostgREST usado pelos scripts
+
+Substitui o Supabase em benchmarks de upload e verificação feitos sem rede:
+tabelas em memória, com latência e erros injetados de forma configurável
+para medir vazão, lógica de novas tentativas e concorrência.
+
+Suporta, em /rest/v1/<tabela>:
+- GET com select, filtros (eq, neq, gt, gte, lt, lte, in, is), order, limit/offset e Range
+- POST (insert de objeto ou lista; upsert com Prefer: resolution=merge-duplicates)
+- PATCH e DELETE com os mesmos filtros
+- Prefer: count=exact (Content-Range) e return=minimal|representation
+E em /rest/v1/rpc/<função>: swap_service_orders_from_staging,
+service_orders_fingerprint, replace_service_orders_cube,
+refresh_service_orders_cube, apply_service_orders_cube_delta e
+service_orders_cube_drift (mesma semântica dos scripts SQL), mais as
+funções registradas com register_rpc().
+
+Uso:
+    python local_postgrest.py --port 54321 --latency-ms 80 --error-rate 0.02
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_ROLE_KEY=local.stand-in.key \\
+        python complete_pipeline.py --excel planilha.xlsx
+
+Os scripts carregam o .env com load_dotenv(), que não sobrescreve variáveis já
+definidas no ambiente, então basta exportar SUPABASE_URL/SUPABASE_SERVICE_ROLE_KEY.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+import logging
+
+# Módulos compartilhados com o processador definitivo (backend/python)
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'python'))
+
+logger = logging.getLogger(__name__)
+
+# Chave fictícia no formato aceito pelo cliente supabase-py
+LOCAL_SERVICE_KEY = 'local.stand-in.key'
+
+# Parâmetros de query que não são filtros de coluna
+_RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+
+
+class PostgrestError(Exception):
+    """Erro devolvido no formato JSON do PostgREST"""
+
+    def __init__(self, status: int, message: str, code: str = 'PGRST000', details: str = None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.details = details
+
+    def body(self) -> Dict[str, Any]:
+        return {'code': self.code, 'message': str(self), 'details': self.details, 'hint': None}
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _compare_key(value: Any):
+    """Chave de comparação: números como número, o resto como texto"""
+    if isinstance(value, bool):
+        return (0, int(value))
+    if isinstance(value, (int, float)):
+        return (0, float(value))
+    try:
+        return (0, float(value))
+    except (TypeError, ValueError):
+        return (1, str(value))
+
+
+def _matches(row: Dict[str, Any], column: str, expression: str) -> bool:
+    """Avaliar um filtro PostgREST (ex. 'eq.123', 'in.(a,b)', 'not.is.null')"""
+    negate = expression.startswith('not.')
+    if negate:
+        expression = expression[4:]
+    operator, _, raw = expression.partition('.')
+    value = row.get(column)
+
+    if operator == 'is':
+        expected = {'null': None, 'true': True, 'false': False}.get(raw.lower(), raw)
+        result = value is expected if expected is None else value == expected
+    elif operator == 'in':
+        options = [_unquote(item) for item in raw.strip('()').split(',')] if raw.strip('()') else []
+        result = value is not None and any(_compare_key(value) == _compare_key(o) for o in options)
+    elif operator in ('eq', 'neq', 'gt', 'gte', 'lt', 'lte'):
+        if value is None:
+            return False  # NULL não satisfaz nenhuma comparação (nem com not.)
+        left, right = _compare_key(value), _compare_key(_unquote(raw))
+        if left[0] != right[0]:
+            left, right = (1, str(value)), (1, _unquote(raw))
+        result = {
+            'eq': left == right, 'neq': left != right,
+            'gt': left > right, 'gte': left >= right,
+            'lt': left < right, 'lte': left <= right,
+        }[operator]
+    else:
+        raise PostgrestError(400, f'Operador não suportado: {operator}', 'PGRST100')
+
+    return not result if negate else result
+
+
+def _round2(value: Any) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class InMemoryDatabase:
+    """Tabelas em memória (listas de dicts) protegidas por um lock global"""
+
+    def __init__(self, unique_columns: Dict[str, List[str]] = None):
+        self.tables: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.unique_columns = unique_columns or {}
+        self._next_id: Dict[str, int] = defaultdict(lambda: 1)
+        self.lock = threading.RLock()
+
+    def reset(self):
+        with self.lock:
+            self.tables.clear()
+            self._next_id.clear()
+
+    def filtered(self, table: str, filters: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        return [row for row in self.tables[table] if all(_matches(row, c, e) for c, e in filters)]
+
+    def insert(self, table: str, records: List[Dict[str, Any]], upsert_on: Optional[str] = None) -> List[Dict]:
+        rows = self.tables[table]
+        # Índices montados uma vez por requisição (lote inteiro é atômico, como no Postgres)
+        seen = {column: {r.get(column) for r in rows} for column in self.unique_columns.get(table, [])}
+        by_key = {r.get(upsert_on): r for r in rows} if upsert_on else {}
+        new_rows, inserted = [], []
+        for record in records:
+            if upsert_on and record.get(upsert_on) in by_key:
+                by_key[record[upsert_on]].update(record)
+                inserted.append(by_key[record[upsert_on]])
+                continue
+            for column, values in seen.items():
+                if record.get(column) is not None and record[column] in values:
+                    raise PostgrestError(
+                        409, f'duplicate key value violates unique constraint "{table}_{column}_key"',
+                        '23505', f'Key ({column})=({record[column]}) already exists.'
+                    )
+                values.add(record.get(column))
+            new_rows.append(dict(record))
+
+        next_id = self._next_id[table]
+        for row in new_rows:
+            if row.get('id') is None:
+                row['id'] = next_id
+            next_id = max(next_id, int(row['id'])) + 1
+            if upsert_on:
+                by_key[row.get(upsert_on)] = row
+        self._next_id[table] = next_id
+        rows.extend(new_rows)
+        return inserted + new_rows
+
+    def delete(self, table: str, filters: List[Tuple[str, str]]) -> List[Dict]:
+        removed = self.filtered(table, filters)
+        removed_ids = {id(r) for r in removed}
+        self.tables[table] = [r for r in self.tables[table] if id(r) not in removed_ids]
+        return removed
+
+    def update(self, table: str, filters: List[Tuple[str, str]], changes: Dict[str, Any]) -> List[Dict]:
+        rows = self.filtered(table, filters)
+        for row in rows:
+            row.update(changes)
+        return rows
+
+
+# ---------------------------------------------------------------------------
+# RPCs com a mesma semântica das funções SQL do repositório
+# ---------------------------------------------------------------------------
+
+def rpc_swap_service_orders_from_staging(db: InMemoryDatabase, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Equivalente a create_service_orders_staging.sql"""
+    staging = db.tables['service_orders_staging']
+    count = len(staging)
+    totals = {field: sum(Decimal(str(r.get(field) or 0)) for r in staging)
+              for field in ('parts_total', 'labor_total', 'grand_total')}
+
+    if count != int(params['p_expected_count']):
+        raise PostgrestError(400, f"Staging com {count} registros, esperado {params['p_expected_count']}", 'P0001')
+    tolerance = Decimal(str(params.get('p_tolerance', 0.05)))
+    for field in ('parts_total', 'labor_total', 'grand_total'):
+        if abs(totals[field] - Decimal(str(params[f'p_expected_{field}']))) > tolerance:
+            raise PostgrestError(400, f'Somas da staging divergentes: {field} {totals[field]}', 'P0001')
+
+    deleted = len(db.tables['service_orders'])
+    db.tables['service_orders'] = []
+    db.insert('service_orders', [{k: v for k, v in r.items() if k != 'id'} for r in staging])
+    db.tables['service_orders_staging'] = []
+
+    return {'swapped_count': count, 'deleted_count': deleted,
+            **{field: float(total) for field, total in totals.items()}}
+
+
+def rpc_service_orders_fingerprint(db: InMemoryDatabase, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Equivalente a create_service_orders_fingerprint.sql"""
+    groups: Dict[Tuple, List[Dict]] = defaultdict(list)
+    for row in db.tables['service_orders']:
+        order_date = row.get('order_date')
+        year = int(str(order_date)[:4]) if order_date else None
+        groups[(year, row.get('order_status'))].append(row)
+
+    result = []
+    for (year, status), rows in sorted(groups.items(), key=lambda item: (item[0][0] is None, item[0])):
+        order_numbers = sorted(str(r.get('order_number')) for r in rows)
+        result.append({
+            'order_year': year,
+            'order_status': status,
+            'record_count': len(rows),
+            **{field: float(_round2(sum(Decimal(str(r.get(field) or 0)) for r in rows)))
+               for field in ('parts_total', 'labor_total', 'grand_total')},
+            'order_numbers_hash': hashlib.md5('\n'.join(order_numbers).encode('utf-8')).hexdigest(),
+        })
+    return result
+
+
+def rpc_replace_service_orders_cube(db: InMemoryDatabase, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Equivalente a replace_service_orders_cube (create_service_orders_cube.sql)"""
+    deleted = len(db.tables['service_orders_cube'])
+    db.tables['service_orders_cube'] = [dict(row) for row in params.get('p_rows') or []]
+    return {'deleted_count': deleted, 'inserted_count': len(db.tables['service_orders_cube'])}
+
+
+_CUBE_KEY = ('order_year', 'order_month', 'order_status', 'engine_manufacturer', 'vehicle_model')
+_CUBE_SUMS = ('parts_total', 'labor_total', 'grand_total')
+
+
+def _cube_source(db: InMemoryDatabase) -> List[Dict[str, Any]]:
+    """Equivalente à view service_orders_cube_source"""
+    groups: Dict[Tuple, Dict[str, Any]] = {}
+    for row in db.tables['service_orders']:
+        order_date = row.get('order_date')
+        if not order_date:
+            continue
+        key = (int(str(order_date)[:4]), int(str(order_date)[5:7]), str(row.get('order_status') or '').strip(),
+               str(row.get('engine_manufacturer') or '').strip(), str(row.get('vehicle_model') or '').strip())
+        cell = groups.setdefault(key, {'order_count': 0, 'parts_total': Decimal(0),
+                                       'labor_total': Decimal(0), 'grand_total': Decimal(0)})
+        cell['order_count'] += 1
+        for field in ('parts_total', 'labor_total', 'grand_total'):
+            cell[field] += Decimal(str(row.get(field) or 0))
+
+    return [{**dict(zip(_CUBE_KEY, k)), 'order_count': cell['order_count'],
+             **{field: float(_round2(cell[field])) for field in _CUBE_SUMS}}
+            for k, cell in sorted(groups.items())]
+
+
+def rpc_refresh_service_orders_cube(db: InMemoryDatabase, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Equivalente a refresh_service_orders_cube (create_service_orders_cube.sql)"""
+    return rpc_replace_service_orders_cube(db, {'p_rows': _cube_source(db)})
+
+
+def rpc_apply_service_orders_cube_delta(db: InMemoryDatabase, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Equivalente a apply_service_orders_cube_delta (create_service_orders_cube.sql)"""
+    cells = {tuple(row[k] for k in _CUBE_KEY): row for row in db.tables['service_orders_cube']}
+    for delta in params.get('p_rows') or []:
+        key = tuple(delta[k] for k in _CUBE_KEY)
+        cell = cells.setdefault(key, {**{k: delta[k] for k in _CUBE_KEY}, 'order_count': 0,
+                                      **{field: 0.0 for field in _CUBE_SUMS}})
+        cell['order_count'] += int(delta['order_count'])
+        for field in _CUBE_SUMS:
+            cell[field] = float(_round2(Decimal(str(cell[field])) + Decimal(str(delta.get(field) or 0))))
+    db.tables['service_orders_cube'] = [cell for cell in cells.values() if cell['order_count'] > 0]
+    return {'cells_updated': len(params.get('p_rows') or []),
+            'cells_removed': len(cells) - len(db.tables['service_orders_cube'])}
+
+
+def rpc_service_orders_cube_drift(db: InMemoryDatabase, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Equivalente a service_orders_cube_drift (create_service_orders_cube.sql)"""
+    tolerance = float(params.get('p_tolerance', 0.05))
+    cube = {tuple(row[k] for k in _CUBE_KEY): row for row in db.tables['service_orders_cube']}
+    source = {tuple(row[k] for k in _CUBE_KEY): row for row in _cube_source(db)}
+    drift = []
+    for key in sorted(set(cube) | set(source), key=lambda k: tuple(map(str, k))):
+        c, s = cube.get(key, {}), source.get(key, {})
+        if (c.get('order_count') != s.get('order_count')
+                or any(abs((c.get(f) or 0) - (s.get(f) or 0)) > tolerance for f in _CUBE_SUMS)):
+            drift.append({**dict(zip(_CUBE_KEY, key)), 'cube_count': c.get('order_count'),
+                          'actual_count': s.get('order_count'), 'cube_grand_total': c.get('grand_total'),
+                          'actual_grand_total': s.get('grand_total')})
+    return drift
+
+
+DEFAULT_RPCS: Dict[str, Callable[[InMemoryDatabase, Dict[str, Any]], Any]] = {
+    'swap_service_orders_from_staging': rpc_swap_service_orders_from_staging,
+    'service_orders_fingerprint': rpc_service_orders_fingerprint,
+    'replace_service_orders_cube': rpc_replace_service_orders_cube,
+    'refresh_service_orders_cube': rpc_refresh_service_orders_cube,
+    'apply_service_orders_cube_delta': rpc_apply_service_orders_cube_delta,
+    'service_orders_cube_drift': rpc_service_orders_cube_drift,
+}
+
+
+class LocalPostgrest:
+    """Servidor HTTP local que imita o PostgREST do Supabase
+
+    Args:
+        latency_ms: atraso fixo por requisição
+        jitter_ms: atraso aleatório adicional (0..jitter_ms)
+        error_rate: fração das requisições que falham com error_status
+        error_methods: métodos sujeitos a erro injetado (padrão: só escritas)
+        unique_columns: colunas únicas por tabela, ex. {'service_orders': ['order_number']}
+        seed: semente do gerador aleatório (benchmarks reprodutíveis)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 error_methods: Tuple[str, ...] = ('POST', 'PATCH', 'DELETE'),
+                 unique_columns: Dict[str, List[str]] = None, seed: int = None):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.error_methods = tuple(m.upper() for m in error_methods)
+        self.db = InMemoryDatabase(unique_columns)
+        self.rpcs = dict(DEFAULT_RPCS)
+        self.stats: Dict[str, int] = defaultdict(int)
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def register_rpc(self, name: str, func: Callable[[InMemoryDatabase, Dict[str, Any]], Any]):
+        """Registrar uma função acessível em /rest/v1/rpc/<name>"""
+        self.rpcs[name] = func
+
+    def start(self) -> 'LocalPostgrest':
+        """Iniciar o servidor numa thread em segundo plano"""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler_class())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='local-postgrest', daemon=True).start()
+        logger.info(f"🧪 PostgREST local em {self.url} (latência {self.latency_ms}ms "
+                    f"+ até {self.jitter_ms}ms, erro {self.error_rate:.1%})")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> 'LocalPostgrest':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- injeção de falhas --------------------------------------------------
+
+    def _inject(self, method: str) -> bool:
+        """Aplicar latência; retorna True se a requisição deve falhar"""
+        with self._random_lock:
+            delay = self.latency_ms + (self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+            fail = method in self.error_methods and self._random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        return fail
+
+    # --- tratamento das requisições -----------------------------------------
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_HEAD(self):
+                self._dispatch('HEAD')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_PATCH(self):
+                self._dispatch('PATCH')
+
+            def do_DELETE(self):
+                self._dispatch('DELETE')
+
+            def log_message(self, format, *args):
+                logger.debug(f"{self.address_string()} {format % args}")
+
+            def _dispatch(self, method: str):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                try:
+                    if parts.path == '/_stats':
+                        self._send(200, dict(stand_in.stats))
+                        return
+                    if parts.path == '/_reset' and method == 'POST':
+                        stand_in.db.reset()
+                        stand_in.stats.clear()
+                        self._send(204, None)
+                        return
+                    if not parts.path.startswith('/rest/v1/'):
+                        raise PostgrestError(404, f'Caminho desconhecido: {parts.path}', 'PGRST125')
+
+                    stand_in.stats[f'requests_{method.lower()}'] += 1
+                    if stand_in._inject(method):
+                        stand_in.stats['injected_errors'] += 1
+                        raise PostgrestError(stand_in.error_status, 'Erro injetado pelo servidor local', 'LOCAL')
+
+                    resource = parts.path[len('/rest/v1/'):]
+                    params = parse_qsl(parts.query, keep_blank_values=True)
+                    payload = json.loads(body) if body else None
+                    if resource.startswith('rpc/'):
+                        status, result, headers = stand_in._rpc(resource[4:], payload, params)
+                    else:
+                        status, result, headers = stand_in._table_request(method, resource, params, payload,
+                                                                          self.headers)
+                    self._send(status, None if method == 'HEAD' else result, headers)
+                except PostgrestError as e:
+                    self._send(e.status, e.body())
+                except (ValueError, KeyError, TypeError) as e:
+                    self._send(400, PostgrestError(400, str(e), 'PGRST102').body())
+
+            def _send(self, status: int, payload: Any, headers: Dict[str, str] = None):
+                data = b'' if payload is None else json.dumps(payload, default=str).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if data:
+                    self.wfile.write(data)
+
+        return Handler
+
+    def _rpc(self, name: str, payload: Optional[Dict], params: List[Tuple[str, str]]):
+        func = self.rpcs.get(name)
+        if func is None:
+            raise PostgrestError(404, f'Could not find the function public.{name}', 'PGRST202')
+        with self.db.lock:
+            result = func(self.db, payload if payload is not None else dict(params))
+        return 200, result, {}
+
+    def _table_request(self, method: str, table: str, params: List[Tuple[str, str]],
+                       payload: Any, headers) -> Tuple[int, Any, Dict[str, str]]:
+        prefer = {item.strip() for item in (headers.get('Prefer') or '').split(',') if item.strip()}
+        query = {name: value for name, value in params if name in _RESERVED_PARAMS}
+        filters = [(name, value) for name, value in params if name not in _RESERVED_PARAMS]
+        minimal = 'return=minimal' in prefer
+
+        with self.db.lock:
+            if method in ('GET', 'HEAD'):
+                rows = self.db.filtered(table, filters)
+                total = len(rows)
+                rows = self._order(rows, query.get('order'))
+                offset, limit = self._window(query, headers.get('Range'))
+                page = rows[offset:offset + limit] if limit is not None else rows[offset:]
+                result = [self._project(row, query.get('select', '*')) for row in page]
+                response_headers = {}
+                if 'count=exact' in prefer:
+                    span = f"{offset}-{offset + len(page) - 1}" if page else '*'
+                    response_headers['Content-Range'] = f"{span}/{total}"
+                self.stats['rows_read'] += len(page)
+                return 200, result, response_headers
+
+            if method == 'POST':
+                records = payload if isinstance(payload, list) else [payload]
+                upsert_on = None
+                if 'resolution=merge-duplicates' in prefer:
+                    upsert_on = query.get('on_conflict', 'id')
+                rows = self.db.insert(table, records, upsert_on)
+                self.stats['rows_inserted'] += len(rows)
+                return 201, None if minimal else [dict(r) for r in rows], {}
+
+            if method == 'PATCH':
+                rows = self.db.update(table, filters, payload or {})
+                self.stats['rows_updated'] += len(rows)
+                return (204 if minimal else 200), None if minimal else [dict(r) for r in rows], {}
+
+            if method == 'DELETE':
+                if not filters:
+                    # Mesmo comportamento do Supabase: DELETE sem filtro é recusado
+                    raise PostgrestError(400, 'DELETE requires a WHERE clause', '21000')
+                rows = self.db.delete(table, filters)
+                self.stats['rows_deleted'] += len(rows)
+                return (204 if minimal else 200), None if minimal else rows, {}
+
+        raise PostgrestError(405, f'Método não suportado: {method}', 'PGRST117')
+
+    @staticmethod
+    def _project(row: Dict[str, Any], select: str) -> Dict[str, Any]:
+        columns = [c.strip() for c in select.split(',') if c.strip()]
+        if not columns or '*' in columns:
+            return dict(row)
+        # Colunas inexistentes (ex. select("count")) são ignoradas
+        return {c: row[c] for c in columns if c in row}
+
+    @staticmethod
+    def _order(rows: List[Dict[str, Any]], order: Optional[str]) -> List[Dict[str, Any]]:
+        if not order:
+            return rows
+        for term in reversed(order.split(',')):
+            column, *modifiers = term.split('.')
+            descending = 'desc' in modifiers
+            rows = sorted(rows, key=lambda r: (r.get(column) is None, _compare_key(r.get(column))),
+                          reverse=descending)
+        return rows
+
+    @staticmethod
+    def _window(query: Dict[str, str], range_header: Optional[str]) -> Tuple[int, Optional[int]]:
+        offset = int(query.get('offset', 0))
+        limit = int(query['limit']) if 'limit' in query else None
+        if range_header and '-' in range_header:
+            start, _, end = range_header.partition('-')
+            offset = int(start)
+            if end:
+                limit = int(end) - offset + 1
+        return offset, limit
+
+
+def main():
+    """Servir o PostgREST local até Ctrl+C"""
+    from log_setup import setup_logging
+
+    parser = argparse.ArgumentParser(description='PostgREST local (em memória) para benchmarks sem Supabase')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Atraso fixo por requisição')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Atraso aleatório adicional máximo')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração das escritas que falham (0-1)')
+    parser.add_argument('--error-status', type=int, default=503, help='Status HTTP dos erros injetados')
+    parser.add_argument('--error-on-reads', action='store_true', help='Injetar erros também em GET')
+    parser.add_argument('--unique', action='append', default=[], metavar='TABELA.COLUNA',
+                        help='Coluna única (pode repetir), ex. service_orders.order_number')
+    parser.add_argument('--seed', type=int, help='Semente para latência/erros reprodutíveis')
+    args = parser.parse_args()
+
+    setup_logging()
+
+    unique_columns: Dict[str, List[str]] = defaultdict(list)
+    for item in args.unique:
+        table, _, column = item.partition('.')
+        unique_columns[table].append(column)
+
+    error_methods = ('POST', 'PATCH', 'DELETE') + (('GET',) if args.error_on_reads else ())
+    server = LocalPostgrest(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                            args.error_status, error_methods, dict(unique_columns), args.seed)
+    server.start()
+    logger.info(f"   SUPABASE_URL={server.url}")
+    logger.info(f"   SUPABASE_SERVICE_ROLE_KEY={LOCAL_SERVICE_KEY}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Diff por árvore de hashes (Merkle) entre a planilha processada e service_orders
+
+Monta a mesma árvore ano > mês > dia > linha dos dois lados. Do banco só são
+buscados os hashes das partições que divergem (service_orders_partition_hashes)
+e, no fim, as linhas dos dias divergentes (service_orders_row_hashes). Assim,
+quando as contagens não batem, as ordens faltando, sobrando ou alteradas são
+encontradas com poucas consultas, sem ler a tabela inteira.
+
+Requer create_service_orders_merkle.sql aplicado no banco.
+"""
+
+import hashlib
+import json
+import sys
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+import argparse
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TEXT_FIELDS = (
+    'order_status',
+    'engine_manufacturer',
+    'engine_description',
+    'vehicle_model',
+    'raw_defect_description',
+    'responsible_mechanic',
+)
+MONEY_FIELDS = ('parts_total', 'labor_total', 'grand_total')
+
+# Limite de linhas por requisição do PostgREST
+PAGE_SIZE = 1000
+
+
+def _md5(text: str) -> str:
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+def _money(value) -> str:
+    """Formatar valor como ROUND(x::NUMERIC, 2)::TEXT do Postgres"""
+    if value is None or pd.isna(value):
+        value = 0
+    amount = Decimal(repr(float(value))).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    if amount == 0:
+        amount = Decimal('0.00')
+    return str(amount)
+
+
+def row_content(record: Dict) -> str:
+    """Texto canônico de uma linha (igual ao da view service_orders_row_hashes)"""
+    order_date = record.get('order_date')
+    if isinstance(order_date, (datetime, pd.Timestamp)):
+        order_date = order_date.strftime('%Y-%m-%d')
+
+    parts = [str(record['order_number']), str(order_date)[:10]]
+    parts += [str(record.get(field) or '') for field in TEXT_FIELDS]
+    parts += [_money(record.get(field)) for field in MONEY_FIELDS]
+    return '|'.join(parts)
+
+
+def _combine(children: Dict[str, str]) -> str:
+    """Hash de um nó a partir dos filhos (chave:hash ordenados pela chave)"""
+    return _md5('\n'.join(f"{key}:{children[key]}" for key in sorted(children)))
+
+
+class MerkleTree:
+    """Árvore de hashes ano > mês > dia > linha"""
+
+    def __init__(self):
+        self.leaves: Dict[str, List[Tuple[str, str]]] = defaultdict(list)  # dia -> [(order_number, row_hash)]
+        self.days: Dict[str, Tuple[int, str]] = {}
+        self.months: Dict[str, Tuple[int, str]] = {}
+        self.years: Dict[str, Tuple[int, str]] = {}
+        self.root: Optional[str] = None
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> 'MerkleTree':
+        """Construir a árvore a partir de registros preparados para upload"""
+        tree = cls()
+        for record in records:
+            if not record.get('order_date'):
+                continue
+            content = row_content(record)
+            day_key = content.split('|', 2)[1]
+            tree.leaves[day_key].append((str(record['order_number']), _md5(content)))
+        tree._build()
+        return tree
+
+    def _build(self):
+        for day_key, leaves in self.leaves.items():
+            hashes = sorted(row_hash for _, row_hash in leaves)
+            self.days[day_key] = (len(hashes), _md5('\n'.join(hashes)))
+
+        self.months = self._roll_up(self.days, 7)
+        self.years = self._roll_up(self.months, 4)
+        self.root = _combine({key: h for key, (_, h) in self.years.items()})
+
+    @staticmethod
+    def _roll_up(level: Dict[str, Tuple[int, str]], prefix: int) -> Dict[str, Tuple[int, str]]:
+        groups: Dict[str, Dict[str, Tuple[int, str]]] = defaultdict(dict)
+        for key, node in level.items():
+            groups[key[:prefix]][key] = node
+        return {
+            parent: (sum(n for n, _ in children.values()), _combine({k: h for k, (_, h) in children.items()}))
+            for parent, children in groups.items()
+        }
+
+    def level(self, year: int = None, month: int = None) -> Dict[str, Tuple[int, str]]:
+        """Nós de um nível, no mesmo formato de service_orders_partition_hashes"""
+        if year is None:
+            return dict(self.years)
+        if month is None:
+            prefix = f"{year:04d}-"
+            return {k: v for k, v in self.months.items() if k.startswith(prefix)}
+        prefix = f"{year:04d}-{month:02d}-"
+        return {k: v for k, v in self.days.items() if k.startswith(prefix)}
+
+
+class MerkleDiff:
+    """Localiza linhas divergentes descendo só pelas partições diferentes"""
+
+    def __init__(self, supabase_client, table_name: str = "service_orders"):
+        self.supabase = supabase_client
+        self.table_name = table_name
+        self.queries = 0
+
+    def _remote_level(self, year: int = None, month: int = None) -> Dict[str, Tuple[int, str]]:
+        params = {}
+        if year is not None:
+            params["p_year"] = year
+        if month is not None:
+            params["p_month"] = month
+        self.queries += 1
+        result = self.supabase.rpc("service_orders_partition_hashes", params).execute()
+        return {
+            row["partition_key"]: (int(row["record_count"]), row["partition_hash"])
+            for row in (result.data or [])
+        }
+
+    def _remote_leaves(self, days: List[str]) -> Dict[str, List[Tuple[str, str]]]:
+        leaves: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        start = 0
+        while True:
+            self.queries += 1
+            result = (
+                self.supabase.table(f"{self.table_name}_row_hashes")
+                .select("order_number, order_day, row_hash")
+                .in_("order_day", days)
+                .order("id")
+                .range(start, start + PAGE_SIZE - 1)
+                .execute()
+            )
+            rows = result.data or []
+            for row in rows:
+                leaves[str(row["order_day"])[:10]].append((row["order_number"], row["row_hash"]))
+            if len(rows) < PAGE_SIZE:
+                return leaves
+            start += PAGE_SIZE
+
+    @staticmethod
+    def _differing(local: Dict[str, Tuple[int, str]], remote: Dict[str, Tuple[int, str]]) -> List[str]:
+        return sorted(key for key in set(local) | set(remote) if local.get(key) != remote.get(key))
+
+    def diff(self, tree: MerkleTree) -> Dict:
+        """Comparar a árvore local com o banco"""
+        remote_years = self._remote_level()
+        remote_root = _combine({key: h for key, (_, h) in remote_years.items()})
+
+        report = {
+            "local_root": tree.root,
+            "remote_root": remote_root,
+            "match": tree.root == remote_root,
+            "differing_days": [],
+            "missing_in_database": [],
+            "extra_in_database": [],
+            "changed": [],
+            "queries": 0
+        }
+
+        if report["match"]:
+            report["queries"] = self.queries
+            logger.info("✅ Árvores de hashes idênticas: planilha e banco conferem")
+            return report
+
+        differing_days = []
+        for year_key in self._differing(tree.level(), remote_years):
+            year = int(year_key)
+            remote_months = self._remote_level(year)
+            for month_key in self._differing(tree.level(year), remote_months):
+                month = int(month_key[5:7])
+                remote_days = self._remote_level(year, month)
+                differing_days.extend(self._differing(tree.level(year, month), remote_days))
+
+        report["differing_days"] = differing_days
+        remote_leaves = self._remote_leaves(differing_days) if differing_days else {}
+
+        for day_key in differing_days:
+            local = defaultdict(list)
+            remote = defaultdict(list)
+            for order_number, row_hash in tree.leaves.get(day_key, []):
+                local[order_number].append(row_hash)
+            for order_number, row_hash in remote_leaves.get(day_key, []):
+                remote[order_number].append(row_hash)
+
+            for order_number in sorted(set(local) | set(remote)):
+                local_hashes = sorted(local.get(order_number, []))
+                remote_hashes = sorted(remote.get(order_number, []))
+                if local_hashes == remote_hashes:
+                    continue
+                entry = {"order_number": order_number, "day": day_key}
+                if not remote_hashes:
+                    report["missing_in_database"].append(entry)
+                elif not local_hashes:
+                    report["extra_in_database"].append(entry)
+                else:
+                    entry["local_count"] = len(local_hashes)
+                    entry["remote_count"] = len(remote_hashes)
+                    report["changed"].append(entry)
+
+        report["queries"] = self.queries
+        logger.info(f"🔎 Diff concluído com {self.queries} consultas: "
+                    f"{len(differing_days)} dias divergentes, "
+                    f"{len(report['missing_in_database'])} faltando no banco, "
+                    f"{len(report['extra_in_database'])} sobrando no banco, "
+                    f"{len(report['changed'])} alteradas")
+        return report
+
+
+def main():
+    """Comparar uma planilha Excel (ou uma exportação do order_exporter) com service_orders"""
+    from excel_processor import ExcelProcessor
+    from supabase_uploader import SupabaseUploader
+    from log_setup import setup_logging
+
+    parser = argparse.ArgumentParser(description='Diff por árvore de hashes: planilha Excel x service_orders')
+    parser.add_argument('excel_file', help='Caminho para arquivo Excel ou diretório exportado por order_exporter.py')
+    parser.add_argument('--env', help='Caminho para arquivo .env')
+    parser.add_argument('--output', '-o', help='Arquivo para salvar o relatório JSON')
+
+    args = parser.parse_args()
+
+    setup_logging()
+
+    if Path(args.excel_file).is_dir():
+        from order_exporter import read_export
+        df = read_export(args.excel_file)
+    else:
+        df, _ = ExcelProcessor().process_excel_file(args.excel_file)
+    records = [SupabaseUploader.prepare_record(row) for _, row in df.iterrows()]
+    tree = MerkleTree.from_records(records)
+    logger.info(f"🌳 Árvore local: {len(records)} registros, {len(tree.days)} dias, raiz {tree.root}")
+
+    uploader = SupabaseUploader(args.env)
+    report = MerkleDiff(uploader.supabase, uploader.table_name).diff(tree)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        logger.info(f"📄 Relatório salvo em: {args.output}")
+    else:
+        print(output)
+
+    return 0 if report["match"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
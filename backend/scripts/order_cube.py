@@ -0,0 +1,132 @@
+"""
+Cubo pré-agregado de service_orders
+
+Uma linha por ano x mês x status x fabricante x modelo, com contagem de OS e
+somas de peças, mão de obra e total. Os números do dashboard (OS por ano,
+totais por ano, distribuição de status, principais fabricantes) saem de
+rollups desse cubo: centenas de linhas em vez da tabela inteira.
+
+O mesmo cálculo existe no banco (create_service_orders_cube.sql). Uploads que
+não substituem a tabela mandam só deltas (build_cube_delta): +inseridos,
+-removidos, e atualização como remoção da versão antiga + inserção da nova.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CUBE_DIMENSIONS = ('order_year', 'order_month', 'order_status', 'engine_manufacturer', 'vehicle_model')
+CUBE_MEASURES = ('order_count', 'parts_total', 'labor_total', 'grand_total')
+SUM_FIELDS = ('parts_total', 'labor_total', 'grand_total')
+
+# Fabricante/modelo ausentes entram no cubo como texto vazio (chave primária sem NULL)
+UNKNOWN_LABEL = ''
+
+
+def _text_dimension(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series(UNKNOWN_LABEL, index=df.index)
+    # astype(object) antes do fillna: colunas Categorical não aceitam valor fora das categorias
+    return df[column].astype(object).fillna(UNKNOWN_LABEL).astype(str).str.strip()
+
+
+def build_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Agregar um DataFrame processado no grão do cubo"""
+    dates = pd.to_datetime(df['order_date'])
+    work = pd.DataFrame({
+        'order_year': dates.dt.year,
+        'order_month': dates.dt.month,
+        'order_status': _text_dimension(df, 'order_status'),
+        'engine_manufacturer': _text_dimension(df, 'engine_manufacturer'),
+        'vehicle_model': _text_dimension(df, 'vehicle_model'),
+    })
+    for field in SUM_FIELDS:
+        values = df[field] if field in df.columns else 0.0
+        work[field] = pd.to_numeric(values, errors='coerce').fillna(0.0)
+
+    # Sem data não há ano/mês: essas linhas não entram no cubo
+    work = work.dropna(subset=['order_year', 'order_month'])
+
+    cube = work.groupby(list(CUBE_DIMENSIONS), sort=True).agg(
+        order_count=('order_status', 'size'),
+        parts_total=('parts_total', 'sum'),
+        labor_total=('labor_total', 'sum'),
+        grand_total=('grand_total', 'sum'),
+    ).reset_index()
+    return _normalize(cube)
+
+
+def merge_cubes(cubes: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Somar cubos parciais (ex. um por bloco no modo streaming)"""
+    cubes = [cube for cube in cubes if len(cube) > 0]
+    if not cubes:
+        return pd.DataFrame(columns=list(CUBE_DIMENSIONS + CUBE_MEASURES))
+    combined = pd.concat(cubes, ignore_index=True)
+    merged = combined.groupby(list(CUBE_DIMENSIONS), sort=True)[list(CUBE_MEASURES)].sum().reset_index()
+    return _normalize(merged)
+
+
+def build_cube_delta(inserted: Optional[pd.DataFrame] = None,
+                     deleted: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Cubo com sinal: +linhas inseridas, -linhas removidas
+
+    Para atualizações, passe a versão antiga em deleted e a nova em inserted.
+    Células que se anulam (ex. atualização que não muda a partição nem os
+    valores) são descartadas.
+    """
+    parts = []
+    if inserted is not None and len(inserted) > 0:
+        parts.append(build_cube(inserted))
+    if deleted is not None and len(deleted) > 0:
+        removed = build_cube(deleted)
+        removed[list(CUBE_MEASURES)] = -removed[list(CUBE_MEASURES)]
+        parts.append(removed)
+
+    delta = merge_cubes(parts)
+    changed = (delta['order_count'] != 0) | (delta[list(SUM_FIELDS)].abs() >= 0.005).any(axis=1)
+    return delta[changed].reset_index(drop=True)
+
+
+def rollup(cube: pd.DataFrame, dimensions: Sequence[str]) -> pd.DataFrame:
+    """Reagregar o cubo por um subconjunto das dimensões (ex. ['order_year'])"""
+    unknown = set(dimensions) - set(CUBE_DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Dimensões fora do cubo: {sorted(unknown)}")
+    if not dimensions:
+        return _normalize(cube[list(CUBE_MEASURES)].sum().to_frame().T)
+    result = cube.groupby(list(dimensions), sort=True)[list(CUBE_MEASURES)].sum().reset_index()
+    return _normalize(result)
+
+
+def cube_records(cube: pd.DataFrame) -> List[Dict]:
+    """Linhas do cubo como dicts serializáveis em JSON"""
+    int_columns = {'order_year', 'order_month', 'order_count'}
+    records = []
+    for row in cube[list(CUBE_DIMENSIONS + CUBE_MEASURES)].itertuples(index=False):
+        records.append({
+            column: int(value) if column in int_columns else float(value) if column in SUM_FIELDS else value
+            for column, value in zip(CUBE_DIMENSIONS + CUBE_MEASURES, row)
+        })
+    return records
+
+
+def save_cube(cube: pd.DataFrame, path: str):
+    """Gravar o cubo em CSV (ou JSON, pela extensão)"""
+    if path.endswith('.json'):
+        cube.to_json(path, orient='records', force_ascii=False, indent=2)
+    else:
+        cube.to_csv(path, index=False, encoding='utf-8')
+    logger.info(f"🧊 Cubo com {len(cube)} linhas salvo em: {path}")
+
+
+def _normalize(cube: pd.DataFrame) -> pd.DataFrame:
+    for column in ('order_year', 'order_month', 'order_count'):
+        if column in cube.columns:
+            cube[column] = cube[column].astype(int)
+    for field in SUM_FIELDS:
+        if field in cube.columns:
+            cube[field] = cube[field].astype(float).round(2)
+    return cube
@@ -0,0 +1,461 @@
+"""
+Exportação em massa de service_orders (paginação por keyset em id)
+
+get_sample_data só faz select * limit n, e paginar por offset (range) fica mais
+lento a cada página: o banco precisa percorrer e descartar todas as linhas
+anteriores. Aqui cada página é "id > último id lido ORDER BY id LIMIT n", que
+usa a chave primária e custa o mesmo do início ao fim da tabela.
+
+Para buscar páginas em paralelo, o intervalo [min(id), max(id)] é dividido em
+fatias contíguas; cada fatia é percorrida por keyset de forma independente, em
+threads. As páginas vão direto para arquivos de partes (Parquet zstd ou NDJSON)
+no diretório de saída, sem acumular a tabela em memória.
+
+O progresso fica em export_progress.db (SQLite) no próprio diretório: uma parte
+só é registrada depois de fechada, junto com o último id da fatia. Rodar de novo
+no mesmo diretório retoma de onde parou (partes incompletas são descartadas).
+
+A exportação não é um snapshot: linhas gravadas durante a execução podem ou não
+aparecer, conforme a fatia já tenha passado pelo id delas.
+
+Uso:
+    python order_exporter.py --output backup_service_orders --format parquet --workers 4
+    python order_exporter.py --output backup_service_orders --verify --mirror service_orders_mirror.db
+    python merkle_diff.py backup_service_orders   # diff do backup contra o banco
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+import pandas as pd
+
+# Módulos compartilhados com o processador definitivo (backend/python)
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'python'))
+
+from columnar_io import ProcessedDataWriter, read_arrow_table
+from data_fingerprint import dataframe_fingerprint, database_fingerprint, compare_fingerprints
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = (
+    'id',
+    'order_number',
+    'order_date',
+    'order_status',
+    'engine_manufacturer',
+    'engine_description',
+    'vehicle_model',
+    'raw_defect_description',
+    'responsible_mechanic',
+    'parts_total',
+    'labor_total',
+    'grand_total',
+    'original_parts_value',
+    'calculation_verified',
+)
+DICTIONARY_COLUMNS = ('order_status', 'engine_manufacturer', 'engine_description',
+                      'vehicle_model', 'responsible_mechanic')
+NUMERIC_COLUMNS = ('parts_total', 'labor_total', 'grand_total', 'original_parts_value')
+
+SUFFIX_BY_EXPORT_FORMAT = {'parquet': '.parquet', 'ndjson': '.ndjson'}
+PROGRESS_FILE = 'export_progress.db'
+MANIFEST_FILE = 'manifest.json'
+
+# Limite de linhas por requisição do PostgREST
+PAGE_SIZE = 1000
+PAGES_PER_PART = 50
+
+
+def page_frame(rows: List[Dict]) -> pd.DataFrame:
+    """DataFrame tipado de uma página (mesmos tipos do backup processado)"""
+    df = pd.DataFrame.from_records(rows, columns=list(EXPORT_COLUMNS))
+    df['id'] = df['id'].astype('int64')
+    df['order_number'] = df['order_number'].astype(str)
+    df['order_date'] = pd.to_datetime(df['order_date'], errors='coerce')
+    for column in NUMERIC_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors='coerce').fillna(0.0)
+    df['calculation_verified'] = df['calculation_verified'].fillna(False).astype(bool)
+    for column in DICTIONARY_COLUMNS:
+        df[column] = df[column].astype('category')
+    return df
+
+
+class ExportProgress:
+    """Fatias e partes já gravadas, persistidas em SQLite (compartilhado entre threads)"""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=FULL')
+        self._lock = threading.Lock()
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS export_info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS export_slices (
+                    slice_index INTEGER PRIMARY KEY,
+                    start_id INTEGER NOT NULL,
+                    end_id INTEGER NOT NULL,
+                    last_id INTEGER NOT NULL,
+                    rows INTEGER NOT NULL DEFAULT 0,
+                    parts INTEGER NOT NULL DEFAULT 0,
+                    done INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS export_parts (
+                    file TEXT PRIMARY KEY,
+                    slice_index INTEGER NOT NULL,
+                    rows INTEGER NOT NULL,
+                    first_id INTEGER NOT NULL,
+                    last_id INTEGER NOT NULL,
+                    bytes INTEGER NOT NULL
+                )
+            """)
+
+    def info(self) -> Dict[str, str]:
+        return {row['key']: row['value'] for row in self.conn.execute("SELECT key, value FROM export_info")}
+
+    def start(self, info: Dict[str, str], slices: List[tuple]):
+        """Registrar parâmetros e fatias ([(start_id exclusivo, end_id inclusivo)]) de uma exportação nova"""
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO export_info (key, value) VALUES (?, ?)",
+                                  [(key, str(value)) for key, value in info.items()])
+            self.conn.executemany(
+                "INSERT INTO export_slices (slice_index, start_id, end_id, last_id) VALUES (?, ?, ?, ?)",
+                [(i, start, end, start) for i, (start, end) in enumerate(slices)]
+            )
+
+    def slices(self, pending_only: bool = False) -> List[Dict]:
+        sql = "SELECT * FROM export_slices" + (" WHERE done = 0" if pending_only else "") + " ORDER BY slice_index"
+        return [dict(row) for row in self.conn.execute(sql)]
+
+    def parts(self) -> List[Dict]:
+        return [dict(row) for row in self.conn.execute("SELECT * FROM export_parts ORDER BY first_id")]
+
+    def commit_part(self, slice_index: int, file: str, rows: int, first_id: int, last_id: int, size: int):
+        """Registrar uma parte fechada e avançar a fatia (uma transação)"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO export_parts (file, slice_index, rows, first_id, last_id, bytes) VALUES (?, ?, ?, ?, ?, ?)",
+                (file, slice_index, rows, first_id, last_id, size)
+            )
+            self.conn.execute(
+                "UPDATE export_slices SET last_id = ?, rows = rows + ?, parts = parts + 1 WHERE slice_index = ?",
+                (last_id, rows, slice_index)
+            )
+
+    def finish_slice(self, slice_index: int):
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE export_slices SET done = 1 WHERE slice_index = ?", (slice_index,))
+
+    def close(self):
+        self.conn.close()
+
+
+class OrderExporter:
+    """Exporta service_orders em partes, com fatias de id percorridas em paralelo"""
+
+    def __init__(self, supabase_client, output_dir: str, table_name: str = "service_orders",
+                 export_format: str = "parquet", workers: int = 4, page_size: int = PAGE_SIZE,
+                 pages_per_part: int = PAGES_PER_PART, max_retries: int = 3, retry_backoff_seconds: float = 1.0):
+        if export_format not in SUFFIX_BY_EXPORT_FORMAT:
+            raise ValueError(f"Formato de exportação desconhecido: {export_format}")
+        self.supabase = supabase_client
+        self.output_dir = Path(output_dir)
+        self.table_name = table_name
+        self.export_format = export_format
+        self.workers = workers
+        self.page_size = page_size
+        self.pages_per_part = pages_per_part
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self._stats_lock = threading.Lock()
+        self.stats = {"pages": 0, "rows": 0, "bytes": 0, "retries": 0, "page_seconds": []}
+
+    # --- consultas --------------------------------------------------------------
+
+    def _execute(self, query):
+        """Executar uma consulta com novas tentativas e espera exponencial"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return query.execute()
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                with self._stats_lock:
+                    self.stats["retries"] += 1
+                logger.warning(f"🔁 Nova tentativa {attempt + 1}/{self.max_retries} da página: {e}")
+                time.sleep(self.retry_backoff_seconds * 2 ** attempt)
+
+    def id_bounds(self) -> Optional[tuple]:
+        """Menor e maior id da tabela (None se vazia)"""
+        first = self._execute(self.supabase.table(self.table_name).select("id").order("id").limit(1)).data
+        last = self._execute(self.supabase.table(self.table_name).select("id").order("id", desc=True).limit(1)).data
+        if not first or not last:
+            return None
+        return int(first[0]["id"]), int(last[0]["id"])
+
+    def fetch_page(self, after_id: int, end_id: int) -> List[Dict]:
+        """Uma página por keyset: id > after_id e id <= end_id, em ordem de id"""
+        start = time.perf_counter()
+        result = self._execute(
+            self.supabase.table(self.table_name)
+            .select(", ".join(EXPORT_COLUMNS))
+            .gt("id", after_id)
+            .lte("id", end_id)
+            .order("id")
+            .limit(self.page_size)
+        )
+        rows = result.data or []
+        with self._stats_lock:
+            self.stats["pages"] += 1
+            self.stats["page_seconds"].append(time.perf_counter() - start)
+        return rows
+
+    # --- partes -----------------------------------------------------------------
+
+    def _part_path(self, slice_index: int, sequence: int) -> Path:
+        suffix = SUFFIX_BY_EXPORT_FORMAT[self.export_format]
+        return self.output_dir / f"part-{slice_index:04d}-{sequence:05d}{suffix}"
+
+    def _write_part(self, path: Path, pages: List[List[Dict]]):
+        if self.export_format == 'ndjson':
+            with open(path, 'w', encoding='utf-8') as f:
+                for rows in pages:
+                    for row in rows:
+                        f.write(json.dumps(row, ensure_ascii=False, default=str))
+                        f.write('\n')
+        else:
+            with ProcessedDataWriter(str(path)) as writer:
+                for rows in pages:
+                    writer.write(page_frame(rows))
+
+    def _export_slice(self, progress: ExportProgress, slice_state: Dict) -> int:
+        """Percorrer uma fatia até o fim, gravando uma parte a cada pages_per_part páginas"""
+        slice_index = slice_state["slice_index"]
+        end_id = slice_state["end_id"]
+        last_id = slice_state["last_id"]
+        sequence = slice_state["parts"]
+        exported = 0
+
+        while True:
+            pages, exhausted = [], False
+            while len(pages) < self.pages_per_part:
+                rows = self.fetch_page(last_id, end_id)
+                if rows:
+                    pages.append(rows)
+                    last_id = int(rows[-1]["id"])
+                # Página curta não encerra a fatia: o PostgREST corta em max-rows
+                # (1000 no Supabase) mesmo com page_size maior
+                if not rows or last_id >= end_id:
+                    exhausted = True
+                    break
+
+            if pages:
+                path = self._part_path(slice_index, sequence)
+                self._write_part(path, pages)
+                rows_in_part = sum(len(rows) for rows in pages)
+                size = path.stat().st_size
+                progress.commit_part(slice_index, path.name, rows_in_part, int(pages[0][0]["id"]), last_id, size)
+                with self._stats_lock:
+                    self.stats["rows"] += rows_in_part
+                    self.stats["bytes"] += size
+                exported += rows_in_part
+                sequence += 1
+
+            if exhausted:
+                progress.finish_slice(slice_index)
+                return exported
+
+    # --- execução ---------------------------------------------------------------
+
+    def _prepare(self, progress: ExportProgress, slices_count: int) -> bool:
+        """Criar as fatias de uma exportação nova ou conferir as de uma retomada"""
+        info = progress.info()
+        if info:
+            if info.get("format") != self.export_format or info.get("table") != self.table_name:
+                raise ValueError(f"{self.output_dir} contém uma exportação {info.get('format')} de "
+                                 f"{info.get('table')}; use outro diretório ou --restart")
+            # Partes que não chegaram a ser registradas ficaram incompletas
+            known = {part["file"] for part in progress.parts()}
+            for path in self.output_dir.glob("part-*"):
+                if path.name not in known:
+                    path.unlink()
+            pending = progress.slices(pending_only=True)
+            logger.info(f"⏯️ Retomando exportação: {len(pending)} fatias pendentes, "
+                        f"{sum(s['rows'] for s in progress.slices())} linhas já gravadas")
+            return True
+
+        bounds = self.id_bounds()
+        if bounds is None:
+            slices = []
+        else:
+            min_id, max_id = bounds
+            slices_count = max(1, min(slices_count, max_id - min_id + 1))
+            width = (max_id - min_id + 1) / slices_count
+            edges = [min_id - 1] + [min_id - 1 + round(width * i) for i in range(1, slices_count)] + [max_id]
+            slices = list(zip(edges[:-1], edges[1:]))
+        progress.start({"table": self.table_name, "format": self.export_format,
+                        "page_size": self.page_size, "started_at": datetime.now().isoformat()}, slices)
+        logger.info(f"📦 Exportando {self.table_name}: ids {bounds}, {len(slices)} fatias, "
+                    f"{self.workers} threads, páginas de {self.page_size}")
+        return False
+
+    def run(self, slices_count: int = None) -> Dict:
+        """Exportar a tabela inteira (ou o que falta dela) e gravar manifest.json"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        progress = ExportProgress(str(self.output_dir / PROGRESS_FILE))
+        start = time.perf_counter()
+        try:
+            resumed = self._prepare(progress, slices_count or self.workers * 4)
+            pending = progress.slices(pending_only=True)
+
+            errors = []
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export") as executor:
+                futures = {executor.submit(self._export_slice, progress, s): s["slice_index"] for s in pending}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error(f"❌ Fatia {futures[future]} interrompida: {e}")
+                        errors.append({"slice": futures[future], "error": str(e)})
+
+            elapsed = time.perf_counter() - start
+            slices = progress.slices()
+            report = self._report(elapsed, resumed, slices, errors)
+            manifest = {**report, "format": self.export_format, "table": self.table_name,
+                        "columns": list(EXPORT_COLUMNS), "parts": progress.parts()}
+            with open(self.output_dir / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+            return report
+        finally:
+            progress.close()
+
+    def _report(self, elapsed: float, resumed: bool, slices: List[Dict], errors: List[Dict]) -> Dict:
+        """Resumo de vazão desta execução (linhas/s, MB/s e latência das páginas)"""
+        page_seconds = sorted(self.stats["page_seconds"])
+        p95 = page_seconds[int(0.95 * (len(page_seconds) - 1))] if page_seconds else 0.0
+        report = {
+            "complete": not errors and all(s["done"] for s in slices),
+            "resumed": resumed,
+            "total_rows": sum(s["rows"] for s in slices),
+            "rows_this_run": self.stats["rows"],
+            "pages": self.stats["pages"],
+            "retries": self.stats["retries"],
+            "bytes_this_run": self.stats["bytes"],
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.stats["rows"] / elapsed, 1) if elapsed else 0.0,
+            "mb_per_second": round(self.stats["bytes"] / 1024 / 1024 / elapsed, 2) if elapsed else 0.0,
+            "page_latency_ms": {
+                "mean": round(1000 * sum(page_seconds) / len(page_seconds), 1) if page_seconds else 0.0,
+                "p95": round(1000 * p95, 1),
+            },
+            "errors": errors,
+        }
+        status = "✅ Exportação concluída" if report["complete"] else "⚠️ Exportação incompleta (rode de novo para retomar)"
+        logger.info(f"{status}: {report['total_rows']} linhas ({report['rows_this_run']} nesta execução) "
+                    f"em {report['elapsed_seconds']}s, {report['rows_per_second']} linhas/s, "
+                    f"{report['mb_per_second']} MB/s, página p95 {report['page_latency_ms']['p95']} ms")
+        return report
+
+
+def read_export(output_dir: str) -> pd.DataFrame:
+    """Ler uma exportação completa de volta, em ordem de id"""
+    directory = Path(output_dir)
+    with open(directory / MANIFEST_FILE, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if not manifest.get("complete"):
+        logger.warning(f"⚠️ Exportação em {output_dir} está incompleta")
+
+    frames = []
+    for part in manifest["parts"]:
+        path = directory / part["file"]
+        if manifest["format"] == 'ndjson':
+            with open(path, encoding='utf-8') as f:
+                frames.append(page_frame([json.loads(line) for line in f if line.strip()]))
+        else:
+            frames.append(read_arrow_table(str(path)).to_pandas())
+    if not frames:
+        return page_frame([])
+    df = pd.concat(frames, ignore_index=True)
+    for column in DICTIONARY_COLUMNS:
+        df[column] = df[column].astype(object).astype('category')
+    return df.sort_values('id', kind='stable').reset_index(drop=True)
+
+
+def verify_export(supabase_client, df: pd.DataFrame) -> Dict:
+    """Comparar a impressão digital (ano x status) da exportação com a do banco"""
+    expected = dataframe_fingerprint(df)
+    actual = database_fingerprint(supabase_client.rpc("service_orders_fingerprint", {}).execute().data or [])
+    mismatches = compare_fingerprints(expected, actual)
+    if mismatches:
+        logger.warning(f"⚠️ Exportação diverge do banco em {len(mismatches)} partições (ano x status)")
+    else:
+        logger.info(f"✅ Exportação confere com o banco em {len(expected)} partições (ano x status)")
+    return {"fingerprint_match": not mismatches, "mismatched_partitions": mismatches}
+
+
+def main():
+    """Exportar service_orders pela linha de comando"""
+    from log_setup import setup_logging
+    from supabase_uploader import SupabaseUploader
+
+    parser = argparse.ArgumentParser(description='Exportar service_orders por keyset em id (Parquet ou NDJSON)')
+    parser.add_argument('--output', '-o', required=True, help='Diretório da exportação (retomada automática)')
+    parser.add_argument('--env', help='Caminho para arquivo .env')
+    parser.add_argument('--format', choices=sorted(SUFFIX_BY_EXPORT_FORMAT), default='parquet',
+                        help='Formato das partes (Parquet requer pyarrow)')
+    parser.add_argument('--workers', type=int, default=4, help='Fatias de id buscadas em paralelo')
+    parser.add_argument('--slices', type=int, help='Quantidade de fatias de id (padrão: 4 por thread)')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE,
+                        help='Linhas pedidas por página (o servidor pode devolver menos, ex. max-rows)')
+    parser.add_argument('--pages-per-part', type=int, default=PAGES_PER_PART, help='Páginas por arquivo de parte')
+    parser.add_argument('--restart', action='store_true', help='Descartar o progresso e exportar do zero')
+    parser.add_argument('--verify', action='store_true',
+                        help='Conferir a exportação com service_orders_fingerprint() ao final')
+    parser.add_argument('--mirror', help='Recarregar este espelho local (order_mirror) com a exportação')
+    args = parser.parse_args()
+
+    setup_logging()
+
+    output_dir = Path(args.output)
+    if args.restart and output_dir.exists():
+        for path in list(output_dir.glob("part-*")) + list(output_dir.glob(f"{PROGRESS_FILE}*")):
+            path.unlink()
+        (output_dir / MANIFEST_FILE).unlink(missing_ok=True)
+
+    uploader = SupabaseUploader(args.env)
+    exporter = OrderExporter(uploader.supabase, args.output, uploader.table_name, args.format,
+                             workers=args.workers, page_size=args.page_size, pages_per_part=args.pages_per_part,
+                             max_retries=uploader.max_retries, retry_backoff_seconds=uploader.retry_backoff_seconds)
+    report = exporter.run(args.slices)
+
+    if report["complete"] and (args.verify or args.mirror):
+        df = read_export(args.output)
+        if args.verify:
+            report["verification"] = verify_export(uploader.supabase, df)
+        if args.mirror:
+            from order_mirror import OrderMirror
+            mirror = OrderMirror(args.mirror)
+            try:
+                report["mirror"] = mirror.sync_dataframe(df, replace=True, source=args.output)
+            finally:
+                mirror.close()
+
+    print(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+    verified = report.get("verification", {}).get("fingerprint_match", True)
+    return 0 if report["complete"] and verified else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
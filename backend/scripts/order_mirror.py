@@ -0,0 +1,290 @@
+"""
+Espelho local (SQLite) de service_orders para leituras analíticas
+
+Relatórios e checagens de integridade consultavam o Supabase via REST a cada
+pergunta (amostras, contagens, somas). Este espelho é atualizado pelo pipeline
+a cada sincronização que confere e responde localmente, em milissegundos, a
+fatias por ano, mês, status, fabricante e modelo.
+
+Os filtros viram WHERE parametrizado sobre colunas indexadas (order_year,
+order_status, engine_manufacturer), então o SQLite lê só as faixas pedidas em
+vez de varrer a tabela. Fabricante e modelo são comparados na forma canônica
+(name_canonicalizer), a mesma gravada pelos processadores.
+
+Uso:
+    python order_mirror.py sync processed_backup_20250101_120000.parquet --replace
+    python order_mirror.py query --year 2024 --status G --manufacturer "mercedes benz"
+    python order_mirror.py totals --by order_year,order_status --year 2023 --year 2024
+    python order_mirror.py stats
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+import logging
+
+import pandas as pd
+
+# Módulos compartilhados com o processador definitivo (backend/python)
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'python'))
+
+from name_canonicalizer import NameCanonicalizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIRROR_PATH = 'service_orders_mirror.db'
+
+TEXT_COLUMNS = ('order_number', 'order_status', 'engine_manufacturer', 'engine_description',
+                'vehicle_model', 'raw_defect_description', 'responsible_mechanic')
+SUM_FIELDS = ('parts_total', 'labor_total', 'grand_total', 'original_parts_value')
+MIRROR_COLUMNS = ('order_number', 'order_date', 'order_year', 'order_month', 'order_status',
+                  'engine_manufacturer', 'engine_description', 'vehicle_model',
+                  'raw_defect_description', 'responsible_mechanic') + SUM_FIELDS + ('calculation_verified',)
+
+# Colunas aceitas em agrupamentos (totals)
+GROUP_COLUMNS = ('order_year', 'order_month', 'order_status', 'engine_manufacturer',
+                 'engine_description', 'vehicle_model', 'responsible_mechanic')
+
+
+class OrderMirror:
+    """Cópia local de service_orders com API de consulta por fatias"""
+
+    def __init__(self, mirror_path: str = DEFAULT_MIRROR_PATH):
+        self.mirror_path = mirror_path
+        self.conn = sqlite3.connect(mirror_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # Filtros de fabricante/modelo na mesma forma canônica gravada nas OS
+        self.canonicalizer = NameCanonicalizer()
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS service_orders_mirror (
+                    order_number TEXT PRIMARY KEY,
+                    order_date TEXT,
+                    order_year INTEGER,
+                    order_month INTEGER,
+                    order_status TEXT,
+                    engine_manufacturer TEXT,
+                    engine_description TEXT,
+                    vehicle_model TEXT,
+                    raw_defect_description TEXT,
+                    responsible_mechanic TEXT,
+                    parts_total REAL NOT NULL DEFAULT 0,
+                    labor_total REAL NOT NULL DEFAULT 0,
+                    grand_total REAL NOT NULL DEFAULT 0,
+                    original_parts_value REAL NOT NULL DEFAULT 0,
+                    calculation_verified INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Índices das fatias mais comuns (ano x status, fabricante x ano)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_mirror_year_status "
+                              "ON service_orders_mirror(order_year, order_status)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_mirror_manufacturer_year "
+                              "ON service_orders_mirror(engine_manufacturer, order_year)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_mirror_status "
+                              "ON service_orders_mirror(order_status)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS mirror_syncs (
+                    synced_at TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    source TEXT
+                )
+            """)
+
+    # --- sincronização --------------------------------------------------------
+
+    @staticmethod
+    def _rows_from_dataframe(df: pd.DataFrame) -> Iterable[tuple]:
+        """Tuplas na ordem de MIRROR_COLUMNS, montadas coluna a coluna"""
+        dates = pd.to_datetime(df['order_date'], errors='coerce')
+        columns = {
+            'order_date': dates.dt.strftime('%Y-%m-%d').astype(object).where(dates.notna(), None),
+            'order_year': dates.dt.year.astype('Int64').astype(object).where(dates.notna(), None),
+            'order_month': dates.dt.month.astype('Int64').astype(object).where(dates.notna(), None),
+        }
+        for column in TEXT_COLUMNS:
+            if column in df.columns:
+                values = df[column].astype(object)
+                values = values.where(values.notna(), None)
+                columns[column] = values.map(lambda v: str(v).strip() or None if v is not None else None)
+            else:
+                columns[column] = pd.Series(None, index=df.index, dtype=object)
+        for field in SUM_FIELDS:
+            values = df[field] if field in df.columns else 0.0
+            columns[field] = pd.to_numeric(values, errors='coerce').fillna(0.0)
+        verified = df['calculation_verified'] if 'calculation_verified' in df.columns else False
+        columns['calculation_verified'] = pd.Series(verified, index=df.index).fillna(False).astype(bool).astype(int)
+        return zip(*(columns[column].tolist() for column in MIRROR_COLUMNS))
+
+    def sync_dataframe(self, df: pd.DataFrame, replace: bool = False, source: str = None) -> Dict[str, int]:
+        """Gravar um DataFrame processado (replace=True: recarga completa do espelho)"""
+        placeholders = ', '.join('?' for _ in MIRROR_COLUMNS)
+        with self.conn:
+            if replace:
+                self.conn.execute("DELETE FROM service_orders_mirror")
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO service_orders_mirror ({', '.join(MIRROR_COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                self._rows_from_dataframe(df)
+            )
+            self.conn.execute(
+                "INSERT INTO mirror_syncs (synced_at, mode, row_count, source) VALUES (?, ?, ?, ?)",
+                (datetime.now().isoformat(), 'replace' if replace else 'upsert', len(df), source)
+            )
+        total = self.count()
+        logger.info(f"🪞 Espelho local: {len(df)} OS sincronizadas ({'recarga' if replace else 'upsert'}), "
+                    f"{total} no total")
+        return {'synced': len(df), 'total': total}
+
+    def sync_records(self, records: List[Dict], replace: bool = False, source: str = None) -> Dict[str, int]:
+        """Gravar registros no formato de service_orders (ex. lidos do banco)"""
+        return self.sync_dataframe(pd.DataFrame.from_records(records), replace=replace, source=source)
+
+    def remove(self, order_numbers: Iterable[str]) -> int:
+        with self.conn:
+            return self.conn.executemany(
+                "DELETE FROM service_orders_mirror WHERE order_number = ?",
+                ((str(n).strip(),) for n in order_numbers)
+            ).rowcount
+
+    # --- consulta -------------------------------------------------------------
+
+    def _where(self, years: Sequence[int] = None, months: Sequence[int] = None, statuses: Sequence[str] = None,
+               manufacturers: Sequence[str] = None, models: Sequence[str] = None,
+               date_from: str = None, date_to: str = None):
+        """Cláusula WHERE parametrizada a partir dos filtros (None = sem filtro)"""
+        clauses, params = [], []
+
+        def add_in(column: str, values):
+            if values:
+                values = list(values)
+                clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+
+        add_in('order_year', [int(y) for y in years] if years else None)
+        add_in('order_month', [int(m) for m in months] if months else None)
+        add_in('order_status', [s.strip().upper() for s in statuses] if statuses else None)
+        add_in('engine_manufacturer',
+               [self.canonicalizer.canonical(m, 'engine_manufacturer') for m in manufacturers]
+               if manufacturers else None)
+        add_in('vehicle_model',
+               [self.canonicalizer.canonical(m, 'vehicle_model') for m in models] if models else None)
+        if date_from:
+            clauses.append("order_date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("order_date <= ?")
+            params.append(date_to)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query(self, columns: Sequence[str] = None, limit: Optional[int] = None,
+              order_by: str = 'order_date', **filters) -> List[Dict]:
+        """Linhas da fatia pedida (filtros: years, months, statuses, manufacturers,
+        models, date_from, date_to)"""
+        columns = list(columns or MIRROR_COLUMNS)
+        unknown = set(columns) - set(MIRROR_COLUMNS)
+        if unknown or order_by not in MIRROR_COLUMNS:
+            raise ValueError(f"Colunas fora do espelho: {sorted(unknown | ({order_by} - set(MIRROR_COLUMNS)))}")
+        where, params = self._where(**filters)
+        sql = f"SELECT {', '.join(columns)} FROM service_orders_mirror{where} ORDER BY {order_by}, order_number"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def count(self, **filters) -> int:
+        where, params = self._where(**filters)
+        return self.conn.execute(f"SELECT COUNT(*) FROM service_orders_mirror{where}", params).fetchone()[0]
+
+    def totals(self, group_by: Sequence[str] = ('order_year',), **filters) -> List[Dict]:
+        """Contagem e somas por grupo (mesmas medidas do cubo)"""
+        group_by = list(group_by)
+        unknown = set(group_by) - set(GROUP_COLUMNS)
+        if unknown:
+            raise ValueError(f"Agrupamento não suportado: {sorted(unknown)}")
+        where, params = self._where(**filters)
+        select = ', '.join(group_by + ['COUNT(*) AS order_count'] +
+                           [f"ROUND(SUM({field}), 2) AS {field}" for field in SUM_FIELDS[:3]])
+        sql = f"SELECT {select} FROM service_orders_mirror{where}"
+        if group_by:
+            sql += f" GROUP BY {', '.join(group_by)} ORDER BY {', '.join(group_by)}"
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def sample(self, limit: int = 5) -> List[Dict]:
+        """Amostra de OS (substitui select * limit n no banco)"""
+        return self.query(limit=limit, order_by='order_number')
+
+    def stats(self) -> Dict:
+        last = self.conn.execute(
+            "SELECT synced_at, mode, row_count, source FROM mirror_syncs ORDER BY rowid DESC LIMIT 1"
+        ).fetchone()
+        return {'rows': self.count(), 'last_sync': dict(last) if last else None}
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    """Sincronizar ou consultar o espelho pela linha de comando"""
+    from log_setup import setup_logging
+
+    parser = argparse.ArgumentParser(description='Espelho local de service_orders para leituras analíticas')
+    parser.add_argument('--mirror', default=DEFAULT_MIRROR_PATH, help='Arquivo SQLite do espelho')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sync = subparsers.add_parser('sync', help='Gravar um backup processado (CSV, Parquet ou Arrow)')
+    sync.add_argument('file')
+    sync.add_argument('--replace', action='store_true', help='Substituir todo o conteúdo do espelho')
+
+    for name, help_text in (('query', 'Listar OS de uma fatia'), ('totals', 'Contagem e somas por grupo')):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('--year', type=int, action='append', dest='years')
+        sub.add_argument('--month', type=int, action='append', dest='months')
+        sub.add_argument('--status', action='append', dest='statuses')
+        sub.add_argument('--manufacturer', action='append', dest='manufacturers')
+        sub.add_argument('--model', action='append', dest='models')
+        sub.add_argument('--from', dest='date_from', help='Data inicial (AAAA-MM-DD)')
+        sub.add_argument('--to', dest='date_to', help='Data final (AAAA-MM-DD)')
+    subparsers.choices['query'].add_argument('--limit', type=int, default=50)
+    subparsers.choices['totals'].add_argument('--by', default='order_year',
+                                              help=f"Colunas separadas por vírgula: {', '.join(GROUP_COLUMNS)}")
+
+    subparsers.add_parser('stats', help='Tamanho e última sincronização')
+    args = parser.parse_args()
+
+    setup_logging()
+    mirror = OrderMirror(args.mirror)
+    try:
+        if args.command == 'sync':
+            from columnar_io import read_processed_data
+            mirror.sync_dataframe(read_processed_data(args.file), replace=args.replace, source=args.file)
+        elif args.command == 'stats':
+            print(json.dumps(mirror.stats(), indent=2, ensure_ascii=False))
+        else:
+            filters = {key: getattr(args, key) for key in
+                       ('years', 'months', 'statuses', 'manufacturers', 'models', 'date_from', 'date_to')}
+            start = time.perf_counter()
+            if args.command == 'query':
+                rows = mirror.query(limit=args.limit, **filters)
+            else:
+                rows = mirror.totals([c.strip() for c in args.by.split(',') if c.strip()], **filters)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            for row in rows:
+                print(json.dumps(row, ensure_ascii=False, default=str))
+            logger.info(f"🪞 {len(rows)} linhas em {elapsed_ms:.1f} ms (espelho local)")
+    finally:
+        mirror.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
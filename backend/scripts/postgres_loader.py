@@ -0,0 +1,360 @@
+"""
+Carga em massa via COPY direto no Postgres do Supabase
+
+Alternativa ao envio REST (um POST JSON por lote) usada pelo SupabaseUploader
+quando há uma connection string do banco (SUPABASE_DB_URL). Os registros são
+transmitidos com COPY FROM STDIN para uma tabela temporária e depois
+mesclados em service_orders numa única transação.
+
+Requer psycopg2 (pip install psycopg2-binary).
+"""
+
+import csv
+import io
+import sys
+import time
+from typing import Callable, Dict, Iterable, Iterator, List
+import logging
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+# Módulos compartilhados com o processador definitivo (backend/python)
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'python'))
+
+from log_setup import setup_logging
+from metrics import UPLOAD_BATCHES, UPLOAD_RECORDS, UPLOAD_BATCH_SECONDS, UPLOAD_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Colunas gravadas em service_orders (mesmos campos de SupabaseUploader.prepare_record)
+SERVICE_ORDER_COLUMNS = [
+    'order_number',
+    'order_date',
+    'order_status',
+    'engine_manufacturer',
+    'engine_description',
+    'vehicle_model',
+    'raw_defect_description',
+    'responsible_mechanic',
+    'parts_total',
+    'labor_total',
+    'grand_total',
+    'original_parts_value',
+    'calculation_verified',
+]
+
+
+class _CsvRecordStream:
+    """Objeto tipo arquivo que gera linhas CSV sob demanda para o COPY
+
+    Evita montar o CSV inteiro em memória: o psycopg2 chama read(size)
+    e só a parte pedida é formatada.
+    """
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buffer = ''
+        self.bytes_sent = 0
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._lines)
+            except StopIteration:
+                break
+
+        if size < 0:
+            chunk, self._buffer = self._buffer, ''
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+
+        self.bytes_sent += len(chunk.encode('utf-8'))
+        return chunk
+
+    readline = read
+
+
+def new_staging_totals() -> Dict:
+    """Totais esperados na staging (conferidos por swap_service_orders_from_staging)"""
+    return {"count": 0, "parts_total": 0.0, "labor_total": 0.0, "grand_total": 0.0}
+
+
+def add_to_staging_totals(totals: Dict, record: Dict):
+    """Acumular um registro preparado nos totais esperados
+
+    Soma os valores como são gravados, sem arredondar por registro: a função
+    de troca compara com SUM() das colunas da staging e só swap_params
+    arredonda, uma vez, o total.
+    """
+    totals["count"] += 1
+    for field in ("parts_total", "labor_total", "grand_total"):
+        totals[field] += record.get(field) or 0.0
+
+
+def swap_params(totals: Dict) -> tuple:
+    """Parâmetros da função swap_service_orders_from_staging"""
+    return (
+        totals["count"],
+        round(totals["parts_total"], 2),
+        round(totals["labor_total"], 2),
+        round(totals["grand_total"], 2),
+    )
+
+
+def _csv_lines(records: Iterable[Dict], columns: List[str]) -> Iterator[str]:
+    """Formatar registros como linhas CSV (None -> NULL)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    for record in records:
+        values = []
+        for column in columns:
+            value = record.get(column)
+            if value is None:
+                values.append('')
+            elif isinstance(value, bool):
+                values.append('true' if value else 'false')
+            else:
+                values.append(value)
+        writer.writerow(values)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+
+class PostgresBulkLoader:
+    """Carga em massa de service_orders com COPY FROM STDIN"""
+
+    def __init__(self, dsn: str, table_name: str = "service_orders",
+                 staging_table_name: str = "service_orders_staging"):
+        """Guardar parâmetros de conexão (a conexão é aberta por carga)"""
+        try:
+            import psycopg2
+        except ImportError as e:
+            raise ImportError("Backend COPY requer psycopg2: pip install psycopg2-binary") from e
+
+        self._psycopg2 = psycopg2
+        self.dsn = dsn
+        self.table_name = table_name
+        self.staging_table_name = staging_table_name
+        self.columns = list(SERVICE_ORDER_COLUMNS)
+
+    def connect(self):
+        """Abrir conexão com o banco"""
+        return self._psycopg2.connect(self.dsn)
+
+    def test_connection(self) -> bool:
+        """Testar conexão direta com o Postgres"""
+        try:
+            with self.connect() as conn, conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            logger.info("✅ Conexão direta com Postgres testada com sucesso")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Erro ao conectar no Postgres: {e}")
+            return False
+
+    def copy_into(self, cur, table: str, records: Iterable[Dict]) -> int:
+        """Transmitir registros para uma tabela com COPY; retorna bytes enviados"""
+        stream = _CsvRecordStream(_csv_lines(records, self.columns))
+        column_list = ', '.join(self.columns)
+        cur.copy_expert(
+            f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '')",
+            stream,
+            size=64 * 1024
+        )
+        return stream.bytes_sent
+
+    @staticmethod
+    def _record_metrics(stats: Dict, elapsed: float):
+        """Registrar a carga (um único lote transacional) nas métricas"""
+        status = "success" if stats["successful_uploads"] else "failure"
+        UPLOAD_BATCH_SECONDS.observe(elapsed, backend="copy")
+        UPLOAD_BYTES.inc(stats["bytes_sent"], backend="copy")
+        UPLOAD_BATCHES.inc(backend="copy", status=status)
+        UPLOAD_RECORDS.inc(stats["successful_uploads"] or stats["total_records"], backend="copy", status=status)
+
+    @staticmethod
+    def _prepared_records(df: pd.DataFrame, prepare_record: Callable[[pd.Series], Dict],
+                          stats: Dict, totals: Dict = None) -> Iterator[Dict]:
+        """Gerar registros preparados, contabilizando falhas nas estatísticas"""
+        for _, row in df.iterrows():
+            try:
+                record = prepare_record(row)
+            except Exception as e:
+                logger.error(f"❌ Erro ao preparar registro: {e}")
+                stats["failed_uploads"] += 1
+                stats["errors"].append(f"Registro {row.get('order_number', 'unknown')}: {e}")
+                continue
+            if totals is not None:
+                add_to_staging_totals(totals, record)
+            yield record
+
+    def load_dataframe(self, df: pd.DataFrame, prepare_record: Callable[[pd.Series], Dict],
+                       clear_existing: bool = False) -> Dict:
+        """Carregar DataFrame em service_orders via tabela temporária + merge
+
+        Tudo acontece numa única transação: se qualquer etapa falhar, a
+        tabela de produção fica exatamente como estava.
+        """
+        logger.info(f"🚀 Iniciando carga COPY de {len(df)} registros...")
+
+        stats = {
+            "total_records": len(df),
+            "successful_uploads": 0,
+            "failed_uploads": 0,
+            "batches_processed": 0,
+            "bytes_sent": 0,
+            "backend": "copy",
+            "errors": []
+        }
+
+        staging = f"{self.table_name}_load"
+        column_list = ', '.join(self.columns)
+        start = time.perf_counter()
+
+        try:
+            conn = self.connect()
+            try:
+                with conn, conn.cursor() as cur:
+                    cur.execute(
+                        f"CREATE TEMP TABLE {staging} "
+                        f"(LIKE {self.table_name} INCLUDING DEFAULTS) ON COMMIT DROP"
+                    )
+                    stats["bytes_sent"] = self.copy_into(cur, staging, self._prepared_records(df, prepare_record, stats))
+
+                    if clear_existing:
+                        logger.info("🗑️ Substituindo dados existentes na mesma transação...")
+                        cur.execute(f"DELETE FROM {self.table_name}")
+
+                    cur.execute(
+                        f"INSERT INTO {self.table_name} ({column_list}) "
+                        f"SELECT {column_list} FROM {staging}"
+                    )
+                    stats["successful_uploads"] = cur.rowcount
+                    stats["batches_processed"] = 1
+            finally:
+                conn.close()
+
+            elapsed = time.perf_counter() - start
+            stats["elapsed_seconds"] = round(elapsed, 3)
+            self._record_metrics(stats, elapsed)
+            logger.info(f"✅ Carga COPY concluída: {stats['successful_uploads']} registros em {elapsed:.2f}s "
+                        f"({stats['bytes_sent'] / 1024 / 1024:.1f} MB)")
+
+        except Exception as e:
+            logger.error(f"❌ Erro crítico na carga COPY: {e}")
+            stats["failed_uploads"] = len(df)
+            stats["successful_uploads"] = 0
+            stats["errors"].append(f"Erro crítico: {e}")
+            self._record_metrics(stats, time.perf_counter() - start)
+
+        return stats
+
+    def swap_dataframe(self, df: pd.DataFrame, prepare_record: Callable[[pd.Series], Dict]) -> Dict:
+        """Recarga completa: COPY para service_orders_staging, conferência e troca
+
+        A troca é feita por swap_service_orders_from_staging (ver
+        create_service_orders_staging.sql) na mesma transação do COPY.
+        """
+        logger.info(f"🚀 Iniciando recarga via staging (COPY) de {len(df)} registros...")
+
+        stats = {
+            "total_records": len(df),
+            "successful_uploads": 0,
+            "failed_uploads": 0,
+            "batches_processed": 0,
+            "bytes_sent": 0,
+            "backend": "copy",
+            "reload_mode": "swap",
+            "errors": []
+        }
+        totals = new_staging_totals()
+        start = time.perf_counter()
+
+        try:
+            conn = self.connect()
+            try:
+                with conn, conn.cursor() as cur:
+                    cur.execute(f"DELETE FROM {self.staging_table_name}")
+                    stats["bytes_sent"] = self.copy_into(
+                        cur, self.staging_table_name, self._prepared_records(df, prepare_record, stats, totals)
+                    )
+                    if stats["failed_uploads"]:
+                        raise ValueError(f"{stats['failed_uploads']} registros não puderam ser preparados")
+
+                    cur.execute("SELECT swap_service_orders_from_staging(%s, %s, %s, %s)", swap_params(totals))
+                    stats["swap"] = cur.fetchone()[0]
+                    stats["successful_uploads"] = totals["count"]
+                    stats["batches_processed"] = 1
+            finally:
+                conn.close()
+
+            stats["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+            self._record_metrics(stats, stats["elapsed_seconds"])
+            logger.info(f"✅ Troca concluída: {stats['successful_uploads']} registros em {stats['elapsed_seconds']:.2f}s")
+
+        except Exception as e:
+            logger.error(f"❌ Recarga via staging abortada, service_orders inalterada: {e}")
+            stats["failed_uploads"] = len(df)
+            stats["successful_uploads"] = 0
+            stats["errors"].append(f"Erro crítico: {e}")
+            self._record_metrics(stats, time.perf_counter() - start)
+
+        return stats
+
+
+def main():
+    """Benchmark: carregar um CSV processado via COPY e via INSERT em lotes
+
+    A carga vai para uma tabela de rascunho (service_orders_bench por padrão),
+    nunca para service_orders; a DSN precisa ser informada explicitamente.
+    """
+    from supabase_uploader import SupabaseUploader
+
+    parser = argparse.ArgumentParser(description='Benchmark de carga COPY vs INSERT em lotes')
+    parser.add_argument('csv_file', help='CSV processado (processed_backup_*.csv)')
+    parser.add_argument('--dsn', required=True, help='Connection string do Postgres (sem padrão: evita rodar contra produção por engano)')
+    parser.add_argument('--table', default='service_orders_bench', help='Tabela de rascunho do benchmark (criada com a estrutura de service_orders)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Tamanho do lote no modo INSERT')
+
+    args = parser.parse_args()
+
+    setup_logging()
+
+    if args.table in ("service_orders", "service_orders_staging"):
+        logger.error(f"❌ O benchmark não pode usar {args.table}; escolha uma tabela de rascunho")
+        return 1
+
+    df = pd.read_csv(args.csv_file)
+    df['order_date'] = pd.to_datetime(df['order_date'])
+    loader = PostgresBulkLoader(args.dsn, table_name=args.table)
+    with loader.connect() as conn, conn.cursor() as cur:
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {args.table} (LIKE service_orders INCLUDING DEFAULTS)")
+    logger.info(f"🧪 Benchmark na tabela de rascunho {args.table}")
+    records = [SupabaseUploader.prepare_record(row) for _, row in df.iterrows()]
+    column_list = ', '.join(loader.columns)
+
+    # COPY
+    copy_stats = loader.load_dataframe(df, SupabaseUploader.prepare_record, clear_existing=True)
+
+    # INSERT em lotes (equivalente ao caminho REST, sem a latência HTTP)
+    from psycopg2.extras import execute_values
+    start = time.perf_counter()
+    with loader.connect() as conn, conn.cursor() as cur:
+        cur.execute(f"TRUNCATE {args.table}")
+        for i in range(0, len(records), args.batch_size):
+            batch = [tuple(r.get(c) for c in loader.columns) for r in records[i:i + args.batch_size]]
+            execute_values(cur, f"INSERT INTO {loader.table_name} ({column_list}) VALUES %s", batch)
+    insert_seconds = time.perf_counter() - start
+
+    copy_seconds = copy_stats.get("elapsed_seconds", float('nan'))
+    print(f"COPY:   {len(df)} registros em {copy_seconds:.2f}s ({len(df) / copy_seconds:,.0f} registros/s)")
+    print(f"INSERT: {len(df)} registros em {insert_seconds:.2f}s ({len(df) / insert_seconds:,.0f} registros/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
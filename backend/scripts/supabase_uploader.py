@@ -2,29 +2,36 @@ import pandas as pd
 import os
 import sys
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterable
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
 from supabase import create_client, Client
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Módulos compartilhados com o processador definitivo (backend/python)
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'python'))
+
+from log_setup import setup_logging
+from metrics import UPLOAD_BATCHES, UPLOAD_RECORDS, UPLOAD_BATCH_SECONDS, UPLOAD_RETRIES, UPLOAD_BYTES
+from data_fingerprint import dataframe_fingerprint, database_fingerprint, compare_fingerprints
+from order_cube import cube_records
+from postgres_loader import PostgresBulkLoader, new_staging_totals, add_to_staging_totals, swap_params
+from upload_journal import UploadJournal, BATCH_COMMITTED, BATCH_PENDING, RUN_COMPLETED, RUN_FAILED
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('supabase_upload.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 class SupabaseUploader:
     """Classe para upload de dados processados para Supabase"""
     
-    def __init__(self, env_path: str = None):
-        """Inicializar cliente Supabase"""
+    def __init__(self, env_path: str = None, upload_backend: str = "rest"):
+        """Inicializar cliente Supabase
+        
+        upload_backend: "rest" (inserts via API, padrão) ou "copy" (COPY direto
+        no Postgres, requer SUPABASE_DB_URL e psycopg2)
+        """
         if env_path:
             load_dotenv(env_path)
         else:
@@ -41,7 +48,22 @@ class SupabaseUploader:
         
         # Configurações de upload
         self.batch_size = 1000  # Tamanho do lote para upload
+        self.max_retries = 2  # Novas tentativas por lote em caso de falha
+        self.retry_backoff_seconds = 1.0  # Espera inicial entre tentativas (dobra a cada uma)
         self.table_name = "service_orders"
+        self.staging_table_name = "service_orders_staging"
+        
+        # Backend de carga em massa (opcional)
+        self.upload_backend = upload_backend
+        self.bulk_loader: Optional[PostgresBulkLoader] = None
+        if upload_backend == "copy":
+            database_url = os.getenv("SUPABASE_DB_URL")
+            if not database_url:
+                raise ValueError("Backend 'copy' requer a variável SUPABASE_DB_URL")
+            self.bulk_loader = PostgresBulkLoader(database_url, self.table_name, self.staging_table_name)
+            logger.info("✅ Backend COPY (Postgres direto) habilitado")
+        elif upload_backend != "rest":
+            raise ValueError(f"Backend de upload desconhecido: {upload_backend}")
         
     def test_connection(self) -> bool:
         """Testar conexão com Supabase"""
@@ -57,19 +79,23 @@ class SupabaseUploader:
     def get_table_info(self) -> Dict:
         """Obter informações sobre a tabela"""
         try:
-            # Verificar se tabela existe e obter estrutura
-            result = self.supabase.table(self.table_name).select("*").limit(1).execute()
+            # Estrutura (amostra) e contagem são independentes: consultar em paralelo
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                sample_future = executor.submit(
+                    lambda: self.supabase.table(self.table_name).select("*").limit(1).execute()
+                )
+                count_future = executor.submit(
+                    lambda: self.supabase.table(self.table_name).select("count", count="exact").execute()
+                )
+                result = sample_future.result()
+                count_result = count_future.result()
             
             info = {
                 "table_exists": True,
                 "sample_record": result.data[0] if result.data else None,
-                "total_records": None
+                "total_records": count_result.count if hasattr(count_result, 'count') else 0
             }
             
-            # Contar registros existentes
-            count_result = self.supabase.table(self.table_name).select("count", count="exact").execute()
-            info["total_records"] = count_result.count if hasattr(count_result, 'count') else 0
-            
             logger.info(f"📋 Tabela {self.table_name}: {info['total_records']} registros existentes")
             return info
             
@@ -77,23 +103,26 @@ class SupabaseUploader:
             logger.error(f"❌ Erro ao obter informações da tabela: {e}")
             return {"table_exists": False, "error": str(e)}
     
-    def clear_table(self, confirm: bool = False) -> bool:
+    def clear_table(self, confirm: bool = False, table_name: str = None) -> bool:
         """Limpar todos os dados da tabela (usar com cuidado!)"""
         if not confirm:
             logger.warning("⚠️ clear_table() chamado sem confirmação")
             return False
+        
+        table_name = table_name or self.table_name
             
         try:
             # Deletar todos os registros
-            result = self.supabase.table(self.table_name).delete().neq('id', 0).execute()
-            logger.info(f"🗑️ Tabela {self.table_name} limpa")
+            result = self.supabase.table(table_name).delete().neq('id', 0).execute()
+            logger.info(f"🗑️ Tabela {table_name} limpa")
             return True
             
         except Exception as e:
             logger.error(f"❌ Erro ao limpar tabela: {e}")
             return False
     
-    def prepare_record(self, row: pd.Series) -> Dict:
+    @staticmethod
+    def prepare_record(row: pd.Series) -> Dict:
         """Preparar um registro para upload"""
         record = {}
         
@@ -135,27 +164,155 @@ class SupabaseUploader:
         
         return record
     
-    def upload_batch(self, records: List[Dict]) -> Dict:
-        """Upload de um lote de registros"""
+    @staticmethod
+    def approximate_payload_bytes(records: List[Dict]) -> int:
+        """Tamanho aproximado do corpo JSON do insert (primeiro registro x quantidade)"""
+        if not records:
+            return 0
+        return (len(json.dumps(records[0], default=str).encode('utf-8')) + 1) * len(records) + 1
+    
+    def id_watermark(self, table_name: str = None) -> int:
+        """Maior id da tabela (0 se vazia): linhas inseridas depois dele têm id maior"""
+        result = (
+            self.supabase.table(table_name or self.table_name)
+            .select("id").order("id", desc=True).limit(1).execute()
+        )
+        return int(result.data[0]["id"]) if result.data else 0
+    
+    def _try_id_watermark(self) -> Optional[int]:
+        """Marca d'água ou None se a consulta falhar (o lote segue, sem novas tentativas)"""
         try:
-            result = self.supabase.table(self.table_name).insert(records).execute()
-            
-            return {
-                "success": True,
-                "inserted_count": len(records),
-                "data": result.data
-            }
+            return self.id_watermark()
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível obter o maior id; lote sem novas tentativas: {e}")
+            return None
+    
+    @staticmethod
+    def next_watermark(batch_result: Dict, id_watermark: int) -> Optional[int]:
+        """Marca d'água depois de um lote confirmado (None: consultar de novo)"""
+        ids = [row["id"] for row in (batch_result.get("data") or []) if row.get("id") is not None]
+        return max(max(ids), id_watermark) if ids else None
+    
+    def _batch_landed(self, records: List[Dict], id_watermark: int, table_name: str = None) -> bool:
+        """Verificar se o insert de um lote entrou no banco apesar de ter falhado na resposta
+        
+        Só conta linhas com id acima da marca d'água tirada antes do envio, então
+        linhas já existentes com os mesmos order_numbers (--no-clear, cargas
+        anteriores) não contam. O insert é uma única instrução: ou todas as
+        linhas entraram ou nenhuma.
+        """
+        order_numbers = list({record['order_number'] for record in records})
+        result = (
+            self.supabase.table(table_name or self.table_name)
+            .select("id", count="exact")
+            .gt("id", id_watermark)
+            .in_("order_number", order_numbers)
+            .limit(1)
+            .execute()
+        )
+        found = result.count if hasattr(result, 'count') and result.count else 0
+        return found >= len(records)
+    
+    def upload_batch(self, records: List[Dict], table_name: str = None, id_watermark: int = None) -> Dict:
+        """Upload de um lote de registros
+        
+        O insert não é idempotente: uma resposta perdida depois do commit faria
+        a nova tentativa duplicar o lote. Por isso só há novas tentativas (até
+        max_retries, com espera exponencial) quando id_watermark (maior id antes
+        do envio) é informado e a consulta confirma que o lote não entrou.
+        """
+        payload_bytes = self.approximate_payload_bytes(records)
+        attempts = self.max_retries + 1 if id_watermark is not None else 1
+        last_error = None
+        
+        for attempt in range(attempts):
+            if attempt > 0:
+                try:
+                    landed = self._batch_landed(records, id_watermark, table_name)
+                except Exception as e:
+                    # Sem saber se o lote entrou, reenviar poderia duplicá-lo
+                    logger.error(f"❌ Não foi possível verificar o lote antes de reenviar: {e}")
+                    break
+                if landed:
+                    logger.info("↩️ Lote já estava no banco (resposta perdida): sem reenvio")
+                    UPLOAD_BATCHES.inc(backend="rest", status="success")
+                    UPLOAD_RECORDS.inc(len(records), backend="rest", status="success")
+                    return {"success": True, "inserted_count": len(records), "data": None}
+                UPLOAD_RETRIES.inc()
+                time.sleep(self.retry_backoff_seconds * 2 ** (attempt - 1))
+                logger.warning(f"🔁 Nova tentativa {attempt}/{self.max_retries} do lote")
             
+            start = time.perf_counter()
+            try:
+                result = self.supabase.table(table_name or self.table_name).insert(records).execute()
+                
+                UPLOAD_BATCH_SECONDS.observe(time.perf_counter() - start, backend="rest")
+                UPLOAD_BYTES.inc(payload_bytes, backend="rest")
+                UPLOAD_BATCHES.inc(backend="rest", status="success")
+                UPLOAD_RECORDS.inc(len(records), backend="rest", status="success")
+                
+                return {
+                    "success": True,
+                    "inserted_count": len(records),
+                    "data": result.data
+                }
+                
+            except Exception as e:
+                UPLOAD_BATCH_SECONDS.observe(time.perf_counter() - start, backend="rest")
+                UPLOAD_BYTES.inc(payload_bytes, backend="rest")
+                last_error = e
+        
+        logger.error(f"❌ Erro no upload do lote: {last_error}")
+        UPLOAD_BATCHES.inc(backend="rest", status="failure")
+        UPLOAD_RECORDS.inc(len(records), backend="rest", status="failure")
+        return {
+            "success": False,
+            "error": str(last_error),
+            "inserted_count": 0
+        }
+    
+    def _prepare_batch_records(self, batch_df: pd.DataFrame, upload_stats: Dict) -> List[Dict]:
+        """Preparar os registros de um lote, contabilizando falhas de preparação"""
+        batch_records = []
+        
+        for _, row in batch_df.iterrows():
+            try:
+                record = self.prepare_record(row)
+                batch_records.append(record)
+            except Exception as e:
+                logger.error(f"❌ Erro ao preparar registro: {e}")
+                upload_stats["failed_uploads"] += 1
+                upload_stats["errors"].append(f"Registro {row.get('order_number', 'unknown')}: {e}")
+        
+        return batch_records
+    
+    def _batch_already_committed(self, records: List[Dict], id_watermark: Optional[int]) -> bool:
+        """Verificar se um lote em dúvida (pendente no journal) já está no banco
+        
+        Conta só as linhas acima da marca d'água gravada no journal antes do
+        envio; linhas que já existiam com os mesmos order_numbers não contam.
+        """
+        if id_watermark is None:
+            logger.warning("⚠️ Lote pendente sem marca d'água no journal: será reenviado")
+            return False
+        try:
+            return self._batch_landed(records, id_watermark)
         except Exception as e:
-            logger.error(f"❌ Erro no upload do lote: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "inserted_count": 0
-            }
+            logger.warning(f"⚠️ Não foi possível verificar lote pendente: {e}")
+            return False
     
-    def upload_dataframe(self, df: pd.DataFrame, clear_existing: bool = False) -> Dict:
-        """Upload completo de um DataFrame"""
+    def upload_dataframe(self, df: pd.DataFrame, clear_existing: bool = False,
+                         journal: Optional[UploadJournal] = None, resume_run_id: str = None) -> Dict:
+        """Upload completo de um DataFrame
+        
+        Com um journal, cada lote é registrado antes e depois do insert. Passando
+        resume_run_id, os lotes já confirmados naquela execução são pulados.
+        """
+        if self.bulk_loader is not None:
+            if journal is not None:
+                logger.info("📒 Backend COPY é transacional: journal de lotes não utilizado")
+            return self.bulk_loader.load_dataframe(df, self.prepare_record, clear_existing)
+        
         logger.info(f"🚀 Iniciando upload de {len(df)} registros para Supabase...")
         
         upload_stats = {
@@ -163,78 +320,288 @@ class SupabaseUploader:
             "successful_uploads": 0,
             "failed_uploads": 0,
             "batches_processed": 0,
+            "skipped_batches": 0,
+            "resumed_records": 0,  # já no banco antes desta execução (lotes de uma execução retomada)
+            "run_id": None,
             "errors": []
         }
         
+        batch_size = self.batch_size
+        known_batches = {}
+        run_id = None
+        watermark = None  # maior id antes do próximo lote (novas tentativas seguras)
+        
         try:
+            if journal is not None:
+                fingerprint = UploadJournal.dataframe_fingerprint(df)
+                
+                if resume_run_id:
+                    run = journal.get_run(resume_run_id)
+                    if run is None:
+                        raise ValueError(f"Execução {resume_run_id} não encontrada no journal")
+                    if run["source_fingerprint"] != fingerprint:
+                        raise ValueError(f"Os dados não correspondem aos da execução {resume_run_id}")
+                    
+                    run_id = resume_run_id
+                    batch_size = run["batch_size"]
+                    known_batches = journal.get_batches(run_id)
+                    if clear_existing:
+                        logger.info("↩️ Retomando execução: limpeza da tabela ignorada")
+                        clear_existing = False
+                    logger.info(f"↩️ Retomando execução {run_id}: "
+                                f"{len(journal.committed_batches(run_id))} lotes já confirmados")
+                else:
+                    run_id = journal.start_run(self.table_name, len(df), batch_size, fingerprint)
+                
+                upload_stats["run_id"] = run_id
+            
             # Limpar tabela se solicitado
             if clear_existing:
                 logger.info("🗑️ Limpando dados existentes...")
                 self.clear_table(confirm=True)
             
             # Processar em lotes
-            for i in range(0, len(df), self.batch_size):
-                batch_df = df.iloc[i:i + self.batch_size]
-                batch_records = []
+            for i in range(0, len(df), batch_size):
+                batch_index = i // batch_size
+                batch_end = min(i + batch_size, len(df))
+                known = known_batches.get(batch_index)
+                
+                if known and known["status"] == BATCH_COMMITTED:
+                    upload_stats["successful_uploads"] += known["inserted_count"]
+                    upload_stats["resumed_records"] += known["inserted_count"]
+                    upload_stats["skipped_batches"] += 1
+                    upload_stats["batches_processed"] += 1
+                    continue
+                
+                batch_df = df.iloc[i:batch_end]
                 
                 # Preparar registros do lote
-                for _, row in batch_df.iterrows():
-                    try:
-                        record = self.prepare_record(row)
-                        batch_records.append(record)
-                    except Exception as e:
-                        logger.error(f"❌ Erro ao preparar registro: {e}")
-                        upload_stats["failed_uploads"] += 1
-                        upload_stats["errors"].append(f"Registro {row.get('order_number', 'unknown')}: {e}")
+                batch_records = self._prepare_batch_records(batch_df, upload_stats)
+                
+                # Lote que estava em voo quando o processo caiu
+                if known and known["status"] == BATCH_PENDING and batch_records:
+                    if self._batch_already_committed(batch_records, known.get("id_watermark")):
+                        logger.info(f"↩️ Lote {batch_index + 1} pendente já estava no banco")
+                        journal.mark_batch_committed(run_id, batch_index, i, batch_end, len(batch_records))
+                        upload_stats["successful_uploads"] += len(batch_records)
+                        upload_stats["resumed_records"] += len(batch_records)
+                        upload_stats["skipped_batches"] += 1
+                        upload_stats["batches_processed"] += 1
+                        continue
                 
                 # Upload do lote
                 if batch_records:
-                    batch_result = self.upload_batch(batch_records)
+                    if watermark is None:
+                        watermark = self._try_id_watermark()
+                    if journal is not None:
+                        journal.mark_batch_pending(run_id, batch_index, i, batch_end, watermark)
+                    
+                    batch_result = self.upload_batch(batch_records, id_watermark=watermark)
                     
                     if batch_result["success"]:
+                        watermark = self.next_watermark(batch_result, watermark)
                         upload_stats["successful_uploads"] += batch_result["inserted_count"]
+                        if journal is not None:
+                            journal.mark_batch_committed(run_id, batch_index, i, batch_end,
+                                                         batch_result["inserted_count"])
                         logger.info(f"✅ Lote {upload_stats['batches_processed'] + 1}: {batch_result['inserted_count']} registros enviados")
                     else:
+                        watermark = None  # o lote pode ter entrado: consultar de novo
                         upload_stats["failed_uploads"] += len(batch_records)
                         upload_stats["errors"].append(f"Lote {upload_stats['batches_processed'] + 1}: {batch_result['error']}")
+                        if journal is not None:
+                            journal.mark_batch_failed(run_id, batch_index, i, batch_end, batch_result["error"])
                         logger.error(f"❌ Falha no lote {upload_stats['batches_processed'] + 1}")
                 
                 upload_stats["batches_processed"] += 1
             
+            if journal is not None:
+                journal.finish_run(run_id, RUN_FAILED if upload_stats["failed_uploads"] else RUN_COMPLETED)
+            
             # Relatório final
             logger.info("📊 Upload concluído:")
             logger.info(f"   Total de registros: {upload_stats['total_records']}")
             logger.info(f"   Enviados com sucesso: {upload_stats['successful_uploads']}")
             logger.info(f"   Falhas: {upload_stats['failed_uploads']}")
             logger.info(f"   Lotes processados: {upload_stats['batches_processed']}")
+            if upload_stats["skipped_batches"]:
+                logger.info(f"   Lotes já confirmados (pulados): {upload_stats['skipped_batches']}")
             
             if upload_stats["errors"]:
                 logger.warning(f"⚠️ {len(upload_stats['errors'])} erros encontrados")
+                if run_id:
+                    logger.warning(f"   Para retomar: --resume {run_id}")
                 
             return upload_stats
             
         except Exception as e:
             logger.error(f"❌ Erro crítico no upload: {e}")
             upload_stats["errors"].append(f"Erro crítico: {e}")
+            if journal is not None and run_id:
+                journal.finish_run(run_id, RUN_FAILED)
+                logger.warning(f"   Para retomar: --resume {run_id}")
             return upload_stats
     
-    def verify_upload(self, expected_count: int) -> Dict:
-        """Verificar se o upload foi bem-sucedido"""
+    def upload_stream(self, chunks: Iterable[pd.DataFrame]) -> Dict:
+        """Upload de DataFrames que chegam aos poucos (modo streaming do pipeline)
+        
+        Cada bloco é enviado em lotes de batch_size assim que chega, então a
+        memória usada não depende do tamanho total do arquivo.
+        """
+        logger.info("🚀 Iniciando upload em streaming para Supabase...")
+        
+        upload_stats = {
+            "total_records": 0,
+            "successful_uploads": 0,
+            "failed_uploads": 0,
+            "batches_processed": 0,
+            "errors": []
+        }
+        
+        try:
+            watermark = None
+            for chunk_df in chunks:
+                upload_stats["total_records"] += len(chunk_df)
+                
+                for i in range(0, len(chunk_df), self.batch_size):
+                    batch_records = self._prepare_batch_records(chunk_df.iloc[i:i + self.batch_size], upload_stats)
+                    
+                    if batch_records:
+                        if watermark is None:
+                            watermark = self._try_id_watermark()
+                        batch_result = self.upload_batch(batch_records, id_watermark=watermark)
+                        
+                        if batch_result["success"]:
+                            watermark = self.next_watermark(batch_result, watermark)
+                            upload_stats["successful_uploads"] += batch_result["inserted_count"]
+                            logger.info(f"✅ Lote {upload_stats['batches_processed'] + 1}: {batch_result['inserted_count']} registros enviados")
+                        else:
+                            watermark = None  # o lote pode ter entrado: consultar de novo
+                            upload_stats["failed_uploads"] += len(batch_records)
+                            upload_stats["errors"].append(f"Lote {upload_stats['batches_processed'] + 1}: {batch_result['error']}")
+                            logger.error(f"❌ Falha no lote {upload_stats['batches_processed'] + 1}")
+                    
+                    upload_stats["batches_processed"] += 1
+            
+            logger.info("📊 Upload em streaming concluído:")
+            logger.info(f"   Total de registros: {upload_stats['total_records']}")
+            logger.info(f"   Enviados com sucesso: {upload_stats['successful_uploads']}")
+            logger.info(f"   Falhas: {upload_stats['failed_uploads']}")
+            logger.info(f"   Lotes processados: {upload_stats['batches_processed']}")
+            return upload_stats
+            
+        except Exception as e:
+            logger.error(f"❌ Erro crítico no upload: {e}")
+            upload_stats["errors"].append(f"Erro crítico: {e}")
+            return upload_stats
+    
+    def upload_dataframe_staged(self, df: pd.DataFrame) -> Dict:
+        """Recarga completa sem janela de tabela vazia
+        
+        Os registros vão para service_orders_staging; a função
+        swap_service_orders_from_staging confere contagem e somas e troca o
+        conteúdo de service_orders numa única transação. Se algo falhar antes
+        da troca, a produção continua intacta.
+        """
+        if self.bulk_loader is not None:
+            return self.bulk_loader.swap_dataframe(df, self.prepare_record)
+        
+        logger.info(f"🚀 Iniciando recarga via staging de {len(df)} registros...")
+        
+        upload_stats = {
+            "total_records": len(df),
+            "successful_uploads": 0,
+            "failed_uploads": 0,
+            "batches_processed": 0,
+            "reload_mode": "swap",
+            "errors": []
+        }
+        totals = new_staging_totals()
+        
+        try:
+            if not self.clear_table(confirm=True, table_name=self.staging_table_name):
+                raise RuntimeError(f"Não foi possível limpar {self.staging_table_name}")
+            
+            for i in range(0, len(df), self.batch_size):
+                batch_records = self._prepare_batch_records(df.iloc[i:i + self.batch_size], upload_stats)
+                
+                if batch_records:
+                    batch_result = self.upload_batch(batch_records, table_name=self.staging_table_name)
+                    if not batch_result["success"]:
+                        raise RuntimeError(f"Lote {upload_stats['batches_processed'] + 1}: {batch_result['error']}")
+                    
+                    for record in batch_records:
+                        add_to_staging_totals(totals, record)
+                    logger.info(f"✅ Lote {upload_stats['batches_processed'] + 1}: {len(batch_records)} registros na staging")
+                
+                upload_stats["batches_processed"] += 1
+            
+            if upload_stats["failed_uploads"]:
+                raise RuntimeError(f"{upload_stats['failed_uploads']} registros não puderam ser preparados")
+            
+            expected_count, parts_total, labor_total, grand_total = swap_params(totals)
+            logger.info("🔁 Conferindo staging e trocando service_orders...")
+            result = self.supabase.rpc("swap_service_orders_from_staging", {
+                "p_expected_count": expected_count,
+                "p_expected_parts_total": parts_total,
+                "p_expected_labor_total": labor_total,
+                "p_expected_grand_total": grand_total
+            }).execute()
+            
+            upload_stats["swap"] = result.data
+            upload_stats["successful_uploads"] = expected_count
+            logger.info(f"✅ Troca concluída: {expected_count} registros em {self.table_name}")
+            return upload_stats
+            
+        except Exception as e:
+            logger.error(f"❌ Recarga via staging abortada, {self.table_name} inalterada: {e}")
+            upload_stats["failed_uploads"] = len(df)
+            upload_stats["successful_uploads"] = 0
+            upload_stats["errors"].append(f"Erro crítico: {e}")
+            return upload_stats
+    
+    def verify_upload(self, expected_count: int, df: pd.DataFrame = None, mode: str = "count",
+                      baseline_count: int = 0) -> Dict:
+        """Verificar se o upload foi bem-sucedido
+        
+        baseline_count é o número de registros que já estavam na tabela e não
+        vieram desta carga (--no-clear): confere-se o delta, contagem final =
+        baseline_count + expected_count.
+        
+        mode="fingerprint" (com df) compara também contagem, somas e hash dos
+        order_numbers por ano x status, via service_orders_fingerprint(). Só
+        vale quando a tabela contém apenas esta carga (baseline_count == 0).
+        """
         try:
             result = self.supabase.table(self.table_name).select("count", count="exact").execute()
             actual_count = result.count if hasattr(result, 'count') else 0
+            expected_total = baseline_count + expected_count
             
             verification = {
-                "expected_count": expected_count,
+                "expected_count": expected_total,
                 "actual_count": actual_count,
-                "match": actual_count == expected_count,
-                "difference": actual_count - expected_count
+                "match": actual_count == expected_total,
+                "difference": actual_count - expected_total
             }
+            if baseline_count:
+                verification["baseline_count"] = baseline_count
+                verification["inserted_count"] = actual_count - baseline_count
             
             if verification["match"]:
-                logger.info(f"✅ Verificação bem-sucedida: {actual_count} registros na tabela")
+                if baseline_count:
+                    logger.info(f"✅ Verificação bem-sucedida: {expected_count} registros novos "
+                                f"sobre {baseline_count} existentes")
+                else:
+                    logger.info(f"✅ Verificação bem-sucedida: {actual_count} registros na tabela")
             else:
-                logger.warning(f"⚠️ Discrepância: esperado {expected_count}, encontrado {actual_count}")
+                logger.warning(f"⚠️ Discrepância: esperado {expected_total}, encontrado {actual_count}")
+            
+            if mode == "fingerprint" and df is not None and baseline_count:
+                logger.warning("⚠️ Impressão digital só confere recargas completas; com dados existentes "
+                               "a verificação foi só pela contagem")
+            elif mode == "fingerprint" and df is not None:
+                verification.update(self.verify_fingerprint(df))
+                verification["match"] = verification["match"] and verification["fingerprint_match"]
                 
             return verification
             
@@ -242,6 +609,56 @@ class SupabaseUploader:
             logger.error(f"❌ Erro na verificação: {e}")
             return {"error": str(e)}
     
+    def verify_fingerprint(self, df: pd.DataFrame) -> Dict:
+        """Comparar a impressão digital agregada do DataFrame com a do banco"""
+        expected = dataframe_fingerprint(df)
+        try:
+            result = self.supabase.rpc("service_orders_fingerprint", {}).execute()
+        except Exception as e:
+            logger.error(f"❌ Erro ao obter impressão digital do banco: {e}")
+            return {"fingerprint_match": False, "fingerprint_error": str(e), "mismatched_partitions": []}
+        actual = database_fingerprint(result.data or [])
+        mismatches = compare_fingerprints(expected, actual)
+        
+        if mismatches:
+            logger.warning(f"⚠️ Impressão digital divergente em {len(mismatches)} partições:")
+            for mismatch in mismatches:
+                fields = ', '.join(mismatch.get('fields', [])) or mismatch['reason']
+                logger.warning(f"   {mismatch['partition']}: {fields}")
+        else:
+            logger.info(f"✅ Impressão digital confere em {len(expected)} partições (ano x status)")
+        
+        return {
+            "fingerprint_match": not mismatches,
+            "partitions_checked": len(set(expected) | set(actual)),
+            "mismatched_partitions": mismatches
+        }
+    
+    def replace_cube(self, cube: pd.DataFrame) -> Dict:
+        """Substituir service_orders_cube pelo cubo calculado no pipeline (uma transação)"""
+        result = self.supabase.rpc("replace_service_orders_cube", {"p_rows": cube_records(cube)}).execute()
+        logger.info(f"🧊 Cubo publicado: {result.data}")
+        return result.data or {}
+    
+    def apply_cube_delta(self, delta: pd.DataFrame) -> Dict:
+        """Somar um cubo de deltas (build_cube_delta) ao service_orders_cube"""
+        if len(delta) == 0:
+            return {"cells_updated": 0, "cells_removed": 0}
+        result = self.supabase.rpc("apply_service_orders_cube_delta", {"p_rows": cube_records(delta)}).execute()
+        logger.info(f"🧊 Deltas aplicados ao cubo: {result.data}")
+        return result.data or {}
+    
+    def get_cube_drift(self, tolerance: float = 0.05) -> List[Dict]:
+        """Células em que o cubo persistido diverge da agregação completa"""
+        result = self.supabase.rpc("service_orders_cube_drift", {"p_tolerance": tolerance}).execute()
+        return result.data or []
+    
+    def refresh_cube(self) -> Dict:
+        """Recalcular service_orders_cube no banco a partir de service_orders"""
+        result = self.supabase.rpc("refresh_service_orders_cube", {}).execute()
+        logger.info(f"🧊 Cubo recalculado no banco: {result.data}")
+        return result.data or {}
+    
     def get_sample_data(self, limit: int = 5) -> List[Dict]:
         """Obter amostra dos dados enviados"""
         try:
@@ -253,6 +670,7 @@ class SupabaseUploader:
 
 def main():
     """Função principal para teste"""
+    setup_logging('supabase_upload.log')
     try:
         # Inicializar uploader
         uploader = SupabaseUploader()
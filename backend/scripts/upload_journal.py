@@ -0,0 +1,188 @@
+"""
+Journal local de upload (write-ahead) para SupabaseUploader
+
+Registra em SQLite cada execução de upload (run id) e o estado de cada lote
+(pendente, confirmado, falhou). Se o processo morrer no meio do
+upload_dataframe, a execução pode ser retomada com --resume <run_id>,
+pulando os lotes já confirmados em vez de limpar e reenviar tudo.
+"""
+
+import hashlib
+import sqlite3
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BATCH_PENDING = 'pending'
+BATCH_COMMITTED = 'committed'
+BATCH_FAILED = 'failed'
+
+RUN_RUNNING = 'running'
+RUN_COMPLETED = 'completed'
+RUN_FAILED = 'failed'
+
+
+class UploadJournal:
+    """Journal de lotes de upload persistido em SQLite"""
+
+    def __init__(self, journal_path: str = 'upload_journal.db'):
+        """Abrir (ou criar) o journal"""
+        self.journal_path = journal_path
+        self.conn = sqlite3.connect(journal_path)
+        self.conn.row_factory = sqlite3.Row
+        # WAL + synchronous FULL: cada commit do journal sobrevive a um crash
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=FULL')
+        self._create_schema()
+
+    def _create_schema(self):
+        """Criar tabelas do journal se não existirem"""
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS upload_runs (
+                    run_id TEXT PRIMARY KEY,
+                    table_name TEXT NOT NULL,
+                    total_records INTEGER NOT NULL,
+                    batch_size INTEGER NOT NULL,
+                    source_fingerprint TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS upload_batches (
+                    run_id TEXT NOT NULL REFERENCES upload_runs(run_id),
+                    batch_index INTEGER NOT NULL,
+                    start_row INTEGER NOT NULL,
+                    end_row INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    inserted_count INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    updated_at TEXT NOT NULL,
+                    id_watermark INTEGER,
+                    PRIMARY KEY (run_id, batch_index)
+                )
+            """)
+            # Journals criados antes da marca d'água
+            columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(upload_batches)")}
+            if 'id_watermark' not in columns:
+                self.conn.execute("ALTER TABLE upload_batches ADD COLUMN id_watermark INTEGER")
+
+    @staticmethod
+    def dataframe_fingerprint(df: pd.DataFrame) -> str:
+        """Impressão digital dos dados (quantidade + order_numbers na ordem do upload)"""
+        digest = hashlib.sha256(str(len(df)).encode('utf-8'))
+        if 'order_number' in df.columns:
+            for order_number in df['order_number'].astype(str):
+                digest.update(b'\n')
+                digest.update(order_number.strip().encode('utf-8'))
+        return digest.hexdigest()
+
+    def start_run(self, table_name: str, total_records: int, batch_size: int,
+                  source_fingerprint: str, run_id: str = None) -> str:
+        """Registrar uma nova execução e retornar seu run id"""
+        run_id = run_id or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        now = datetime.now().isoformat()
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO upload_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, table_name, total_records, batch_size, source_fingerprint, RUN_RUNNING, now, now)
+            )
+
+        logger.info(f"📒 Execução registrada no journal: {run_id}")
+        return run_id
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        """Obter dados de uma execução"""
+        row = self.conn.execute("SELECT * FROM upload_runs WHERE run_id = ?", (run_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_batches(self, run_id: str) -> Dict[int, Dict]:
+        """Obter estado de todos os lotes de uma execução, por índice"""
+        rows = self.conn.execute(
+            "SELECT * FROM upload_batches WHERE run_id = ? ORDER BY batch_index", (run_id,)
+        ).fetchall()
+        return {row['batch_index']: dict(row) for row in rows}
+
+    def committed_batches(self, run_id: str) -> Set[int]:
+        """Índices dos lotes já confirmados no banco"""
+        rows = self.conn.execute(
+            "SELECT batch_index FROM upload_batches WHERE run_id = ? AND status = ?",
+            (run_id, BATCH_COMMITTED)
+        ).fetchall()
+        return {row['batch_index'] for row in rows}
+
+    def _set_batch(self, run_id: str, batch_index: int, start_row: int, end_row: int,
+                   status: str, inserted_count: int = 0, error: str = None, id_watermark: int = None):
+        now = datetime.now().isoformat()
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO upload_batches
+                    (run_id, batch_index, start_row, end_row, status, inserted_count, error, updated_at,
+                     id_watermark)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (run_id, batch_index) DO UPDATE SET
+                    status = excluded.status,
+                    inserted_count = excluded.inserted_count,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at,
+                    id_watermark = COALESCE(excluded.id_watermark, upload_batches.id_watermark)
+                """,
+                (run_id, batch_index, start_row, end_row, status, inserted_count, error, now, id_watermark)
+            )
+            self.conn.execute("UPDATE upload_runs SET updated_at = ? WHERE run_id = ?", (now, run_id))
+
+    def mark_batch_pending(self, run_id: str, batch_index: int, start_row: int, end_row: int,
+                           id_watermark: int = None):
+        """Registrar que o lote vai ser enviado (antes do insert)
+        
+        id_watermark é o maior id da tabela antes do envio: na retomada, só
+        linhas acima dele podem ter vindo deste lote.
+        """
+        self._set_batch(run_id, batch_index, start_row, end_row, BATCH_PENDING, id_watermark=id_watermark)
+
+    def mark_batch_committed(self, run_id: str, batch_index: int, start_row: int, end_row: int,
+                             inserted_count: int):
+        """Registrar que o lote foi confirmado pelo banco"""
+        self._set_batch(run_id, batch_index, start_row, end_row, BATCH_COMMITTED, inserted_count)
+
+    def mark_batch_failed(self, run_id: str, batch_index: int, start_row: int, end_row: int, error: str):
+        """Registrar falha no envio do lote"""
+        self._set_batch(run_id, batch_index, start_row, end_row, BATCH_FAILED, error=error)
+
+    def finish_run(self, run_id: str, status: str):
+        """Marcar execução como concluída ou com falha"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE upload_runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                (status, datetime.now().isoformat(), run_id)
+            )
+
+    def list_runs(self, limit: int = 10) -> List[Dict]:
+        """Listar execuções mais recentes com resumo dos lotes"""
+        rows = self.conn.execute(
+            """
+            SELECT r.*,
+                   SUM(CASE WHEN b.status = ? THEN 1 ELSE 0 END) AS committed_batches,
+                   SUM(CASE WHEN b.status = ? THEN b.inserted_count ELSE 0 END) AS committed_records
+            FROM upload_runs r
+            LEFT JOIN upload_batches b ON b.run_id = r.run_id
+            GROUP BY r.run_id
+            ORDER BY r.created_at DESC
+            LIMIT ?
+            """,
+            (BATCH_COMMITTED, BATCH_COMMITTED, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        """Fechar conexão com o journal"""
+        self.conn.close()
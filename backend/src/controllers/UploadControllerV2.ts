@@ -65,10 +65,13 @@ class UploadControllerV2 {
 
       // 3. PROCESSAR COM PYTHON PANDAS (DEFINITIVO)
       console.log('🐍 Iniciando processamento definitivo com Python pandas...');
+      const pythonStart = Date.now();
       const processingResult = await this.pythonService.processExcelBuffer(
         req.file.buffer, 
-        req.file.originalname
+        req.file.originalname,
+        uploadId
       );
+      const pythonWallTime = (Date.now() - pythonStart) / 1000;
 
       if (!processingResult.success) {
         throw new Error(`Processamento Python falhou: ${processingResult.errors.join(', ')}`);
@@ -153,6 +156,11 @@ class UploadControllerV2 {
         pythonProcessingTime: processingResult.processing_time_seconds,
         totalProcessingTime: processingTime / 1000,
         
+        // Rastreamento (trace id = uploadId): spans das etapas Python e tempo do salto Node -> Python
+        traceId: uploadId,
+        pythonWallTime,
+        pythonSpans: processingResult.trace?.spans || [],
+        
         // Dados do Excel
         totalRowsInExcel: processingResult.total_rows_excel,
         rowsValidated: processingResult.valid_rows,
@@ -2,6 +2,21 @@ import { spawn } from 'child_process';
 import { promises as fs } from 'fs';
 import path from 'path';
 import os from 'os';
+import { Table, tableFromIPC } from 'apache-arrow';
+
+// Python logs go to stderr as JSON lines ({"level": "INFO", ...});
+// the legacy text format ("... - INFO - ...") is still accepted
+function isInfoLogLine(line: string): boolean {
+  return line.includes('- INFO -') || /"level":\s*"(INFO|DEBUG)"/.test(line);
+}
+
+interface PythonArrowHandoff {
+  format: 'arrow-ipc-file';
+  path: string;
+  rows: number;
+  bytes: number;
+  schema: Array<{ name: string; type: string }>;
+}
 
 interface PythonProcessingResult {
   success: boolean;
@@ -25,16 +40,39 @@ interface PythonProcessingResult {
   };
   errors: string[];
   warnings: string[];
+  timings?: Record<string, {
+    wall_seconds: number;
+    cpu_seconds: number;
+    calls: number;
+    peak_rss_mb: number | null;
+  }>;
+  // Presente quando o Python entrega os dados em Arrow IPC (--arrow-handoff)
+  arrow?: PythonArrowHandoff;
+  // Tabela Arrow decodificada do handoff: colunas para quem não precisa de linhas
+  arrowTable?: Table;
+  trace?: {
+    trace_id: string;
+    spans: Array<{
+      name: string;
+      trace_id: string;
+      thread: string;
+      start_time: number;
+      duration_seconds: number;
+    }>;
+  };
 }
 
 class PythonExcelService {
   private pythonScriptPath: string;
   private tempDir: string;
+  // PYTHON_RESULT_TRANSPORT=arrow: dados em arquivo Arrow IPC em vez de JSON no stdout
+  private useArrowHandoff: boolean;
 
   constructor() {
     // CAMINHO ABSOLUTO HARDCODED - USANDO BARRAS NORMAIS PARA EVITAR ESCAPING
     this.pythonScriptPath = 'S:/comp-glgarantias/r-glgarantias/backend/python/excel_processor.py';
     this.tempDir = os.tmpdir();
+    this.useArrowHandoff = process.env.PYTHON_RESULT_TRANSPORT === 'arrow';
     console.log('🐍 Caminho do script Python:', this.pythonScriptPath);
     console.log('🐍 Diretório do service:', __dirname);
     console.log('🐍 Diretório atual:', process.cwd());
@@ -46,8 +84,8 @@ class PythonExcelService {
    * Este método substitui completamente o CleanDataProcessor.ts
    * e garante leitura 100% correta dos dados Excel.
    */
-  async processExcelBuffer(buffer: Buffer, filename: string): Promise<PythonProcessingResult> {
-    console.log('🐍 Iniciando processamento definitivo com Python pandas...');
+  async processExcelBuffer(buffer: Buffer, filename: string, traceId?: string): Promise<PythonProcessingResult> {
+    console.log(`🐍 Iniciando processamento definitivo com Python pandas...${traceId ? ` (trace ${traceId})` : ''}`);
     const startTime = Date.now();
 
     try {
@@ -56,11 +94,17 @@ class PythonExcelService {
       console.log(`📁 Arquivo temporário criado: ${tempFilePath}`);
 
       // 2. EXECUTAR SCRIPT PYTHON
-      const result = await this.executePythonProcessor(tempFilePath);
+      const result = await this.executePythonProcessor(tempFilePath, traceId);
 
       // 3. LIMPAR ARQUIVO TEMPORÁRIO
       await this.cleanupTempFile(tempFilePath);
 
+      // 3b. DADOS EM ARROW IPC: ler as colunas do arquivo (sem parse de texto)
+      if (result.arrow) {
+        result.arrowTable = await this.loadArrowHandoff(result.arrow);
+        result.data = this.arrowTableToRows(result.arrowTable);
+      }
+
       // 4. VALIDAR RESULTADO
       if (!result.success) {
         throw new Error(`Processamento Python falhou: ${result.errors.join(', ')}`);
@@ -71,6 +115,17 @@ class PythonExcelService {
       console.log(`   ✅ Válidos: ${result.valid_rows}`);
       console.log(`   ❌ Rejeitados: ${result.rejected_rows}`);
       console.log(`   ⏱️ Tempo: ${result.processing_time_seconds.toFixed(2)}s`);
+      for (const [stage, timing] of Object.entries(result.timings || {})) {
+        console.log(`      ${stage}: ${timing.wall_seconds.toFixed(3)}s (CPU ${timing.cpu_seconds.toFixed(3)}s, pico RSS ${timing.peak_rss_mb ?? '?'} MB)`);
+      }
+      if (result.trace) {
+        // Spans com início em epoch: comparáveis ao relógio do Node para o mesmo upload
+        const spawnLatency = result.trace.spans.length > 0
+          ? result.trace.spans[0].start_time * 1000 - startTime
+          : null;
+        console.log(`   🔗 Trace ${result.trace.trace_id}: ${result.trace.spans.length} spans` +
+          (spawnLatency !== null ? `, primeira etapa Python ${spawnLatency.toFixed(0)}ms após início no Node` : ''));
+      }
       console.log(`   🧮 Matemática correta: ${result.summary.mathematically_correct ? '✅' : '❌'}`);
 
       return result;
@@ -101,15 +156,22 @@ class PythonExcelService {
   /**
    * EXECUTAR SCRIPT PYTHON
    */
-  private async executePythonProcessor(filePath: string): Promise<PythonProcessingResult> {
+  private async executePythonProcessor(filePath: string, traceId?: string): Promise<PythonProcessingResult> {
     return new Promise((resolve, reject) => {
       console.log(`🚀 DEBUG: pythonScriptPath = "${this.pythonScriptPath}"`);
       console.log(`🚀 DEBUG: filePath = "${filePath}"`);
       console.log(`🚀 Executando: python ${this.pythonScriptPath} "${filePath}"`);
 
-      const pythonProcess = spawn('python', [this.pythonScriptPath, filePath], {
+      const args = [this.pythonScriptPath, filePath];
+      if (this.useArrowHandoff) {
+        args.push('--arrow-handoff');
+      }
+
+      const pythonProcess = spawn('python', args, {
         stdio: ['pipe', 'pipe', 'pipe'],
-        shell: true
+        shell: true,
+        // Trace id repassado por variável de ambiente (evita problemas de escape com shell: true)
+        env: traceId ? { ...process.env, GLG_TRACE_ID: traceId } : process.env
       });
 
       let stdout = '';
@@ -120,12 +182,11 @@ class PythonExcelService {
       });
 
       pythonProcess.stderr.on('data', (data) => {
-        const logMessage = data.toString().trim();
+        const logMessage = data.toString();
         stderr += logMessage;
         // Only log non-INFO messages as errors
-        if (!logMessage.includes('- INFO -')) {
-          console.log(`🐍 Python log: ${logMessage}`);
-        }
+        logMessage.split('\n').filter(line => line.trim().length > 0 && !isInfoLogLine(line))
+          .forEach(line => console.log(`🐍 Python log: ${line.trim()}`));
       });
 
       pythonProcess.on('close', (code) => {
@@ -147,7 +208,7 @@ class PythonExcelService {
           console.error(`❌ Stderr: ${stderr}`);
           // Filter out INFO logging from stderr for cleaner error messages
           const actualErrors = stderr.split('\n').filter(line => 
-            !line.includes('- INFO -') && line.trim().length > 0
+            !isInfoLogLine(line) && line.trim().length > 0
           ).join('\n');
           reject(new Error(`Processo Python falhou (código ${code}): ${actualErrors}`));
           return;
@@ -177,6 +238,52 @@ class PythonExcelService {
     });
   }
 
+  /**
+   * LER DADOS ENTREGUES EM ARROW IPC
+   *
+   * O stdout traz só o envelope (caminho + schema); as colunas vêm do arquivo
+   * Arrow, lido de uma vez. Os vetores da Table apontam para o buffer lido,
+   * sem cópia nem parse de texto.
+   */
+  private async loadArrowHandoff(handoff: PythonArrowHandoff): Promise<Table> {
+    const start = Date.now();
+    try {
+      const table = tableFromIPC(await fs.readFile(handoff.path));
+      console.log(`📦 Arrow IPC: ${table.numRows} linhas (${(handoff.bytes / 1024 / 1024).toFixed(1)} MB) lidas em ${Date.now() - start}ms`);
+      return table;
+    } finally {
+      await this.cleanupTempFile(handoff.path);
+    }
+  }
+
+  /**
+   * MONTAR LINHAS A PARTIR DA TABELA ARROW
+   *
+   * Os controllers de upload trabalham com objetos por linha (filtros,
+   * proteção de edições, detecção de duplicatas), então a cópia para
+   * linhas ainda acontece aqui, uma coluna por vez.
+   */
+  private arrowTableToRows(table: Table): any[] {
+    const start = Date.now();
+    const rows: any[] = Array.from({ length: table.numRows }, () => ({}));
+    for (const field of table.schema.fields) {
+      const column = table.getChild(field.name);
+      if (!column) continue;
+      let i = 0;
+      for (const value of column) {
+        rows[i++][field.name] = value;
+      }
+    }
+    // Timestamps chegam como epoch em ms; o JSON do Python usava ISO (AAAA-MM-DDTHH:MM:SS)
+    for (const row of rows) {
+      if (row.order_date !== null && row.order_date !== undefined) {
+        row.order_date = new Date(Number(row.order_date)).toISOString().slice(0, 19);
+      }
+    }
+    console.log(`📦 Arrow IPC: ${rows.length} linhas montadas em ${Date.now() - start}ms`);
+    return rows;
+  }
+
   /**
    * LIMPAR ARQUIVO TEMPORÁRIO
    */
@@ -262,4 +369,4 @@ class PythonExcelService {
   }
 }
 
-export { PythonExcelService, PythonProcessingResult };
\ No newline at end of file
+export { PythonExcelService, PythonProcessingResult, PythonArrowHandoff };
\ No newline at end of file